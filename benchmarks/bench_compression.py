@@ -0,0 +1,129 @@
+# benchmarks/bench_compression.py
+# Bytes y CPU de comprimir respuestas típicas:
+#   - una página de 200 UserOut y una de 200 NoteOut (el JSON que sale de fetch_page)
+#   - /openapi.json de la app
+# para gzip y br en varios niveles, más el costo por request de /openapi.json
+# serializado en cada request (ruta de FastAPI) frente a PrecompressedDocument.
+# Uso: python -m benchmarks.bench_compression [iteraciones]
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+# La app no se conecta a SQL Server aquí
+os.environ.setdefault("SQLSERVER_URL", "sqlite://")
+
+from fastapi.responses import JSONResponse
+from starlette.requests import Request
+
+from core.compression import PrecompressedDocument, brotli, compress
+from core.responses import dumps
+
+LEVELS = [("gzip", 1), ("gzip", 6), ("gzip", 9), ("br", 1), ("br", 4), ("br", 6), ("br", 11)]
+
+
+def _users(rnd: random.Random, n: int) -> list:
+    start = datetime(2023, 1, 1)
+    return [
+        {
+            "id_user": uuid.UUID(int=rnd.getrandbits(128), version=4),
+            "name": f"Nombre{i}",
+            "last_name": f"Apellido{i}",
+            "id_role": 2,
+            "birthdate": date(rnd.randint(1990, 2006), rnd.randint(1, 12), rnd.randint(1, 28)),
+            "is_active": True,
+            "create_date": start + timedelta(seconds=rnd.randrange(700 * 86400), microseconds=rnd.randrange(1000) * 1000),
+            "modify_date": None,
+        }
+        for i in range(n)
+    ]
+
+
+def _notes(rnd: random.Random, n: int) -> list:
+    start = datetime(2023, 1, 1)
+    users = [uuid.UUID(int=rnd.getrandbits(128), version=4) for _ in range(20)]
+    subjects = [uuid.UUID(int=rnd.getrandbits(128), version=4) for _ in range(200)]
+    return [
+        {
+            "id": i,
+            "id_user": rnd.choice(users),
+            "id_subj": rnd.choice(subjects),
+            "grade": Decimal(rnd.randint(100, 500)) / 100,
+            "is_active": True,
+            "create_date": start + timedelta(seconds=rnd.randrange(700 * 86400), microseconds=rnd.randrange(1000) * 1000),
+            "modify_date": None,
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def _timed(fn, iterations: int) -> float:
+    """Microsegundos por llamada (mejor de 3 rondas)."""
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        best = min(best, time.perf_counter() - start)
+    return best / iterations * 1e6
+
+
+def _request(accept_encoding: str) -> Request:
+    return Request({
+        "type": "http", "method": "GET", "path": "/openapi.json", "query_string": b"",
+        "headers": [(b"accept-encoding", accept_encoding.encode())],
+    })
+
+
+def run(iterations: int = 200) -> dict:
+    from main import app
+
+    rnd = random.Random(1234)
+    openapi = app.openapi()
+    payloads = {
+        "users_200": dumps(_users(rnd, 200)),
+        "notes_200": dumps(_notes(rnd, 200)),
+        "openapi": dumps(openapi),
+    }
+
+    result = {}
+    for name, body in payloads.items():
+        rows = {"identity_bytes": len(body)}
+        for encoding, level in LEVELS:
+            if encoding == "br" and brotli is None:
+                continue
+            args = {"gzip_level": level} if encoding == "gzip" else {"brotli_quality": level}
+            data = compress(body, encoding, **args)
+            n = max(5, iterations // 20) if (encoding, level) in (("br", 11), ("gzip", 9)) else iterations
+            rows[f"{encoding}-{level}"] = {
+                "bytes": len(data),
+                "ratio": round(len(body) / len(data), 2),
+                "us": round(_timed(lambda: compress(body, encoding, **args), n), 1),
+            }
+        result[name] = rows
+
+    # /openapi.json: ruta de FastAPI (JSONResponse del dict en cada request) frente a la variante precomprimida
+    start = time.perf_counter()
+    document = PrecompressedDocument(payloads["openapi"])
+    build = time.perf_counter() - start
+    gzip_request = _request("gzip, deflate, br")
+    result["openapi_per_request"] = {
+        "build_once_ms": round(build * 1000, 2),
+        "sizes": document.sizes(),
+        "fastapi_route_us": round(_timed(lambda: JSONResponse(openapi).body, iterations), 1),
+        "fastapi_route_plus_gzip6_us": round(_timed(
+            lambda: compress(JSONResponse(openapi).body, "gzip", gzip_level=6), iterations), 1),
+        "precompressed_us": round(_timed(lambda: document.response(gzip_request), iterations), 1),
+    }
+    return result
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    for name, rows in run(iterations).items():
+        print(name)
+        for k, v in rows.items():
+            print(f"  {k:>28}: {v}")
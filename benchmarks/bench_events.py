@@ -0,0 +1,97 @@
+# benchmarks/bench_events.py
+# Costo de GET /notes/events con muchas conexiones ociosas (LocalPubSub, sin red):
+#   - memoria por conexión esperando eventos (Subscription + la tarea que la espera,
+#     que hace de la respuesta SSE; sin contar el socket ni la tarea de Starlette)
+#   - publicar una nota a una materia seguida por N conexiones (fan-out) y a un
+#     estudiante entre N conectados (el caso típico: 1 destinatario)
+#   - publicar sin nadie suscrito (costo agregado a cada escritura de notas)
+# Uso: python -m benchmarks.bench_events [conexiones]
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+# La app no se conecta a SQL Server aquí
+os.environ.setdefault("SQLSERVER_URL", "sqlite://")
+
+from core.events import EventBroker, LocalPubSub, subject_topic, user_topic
+
+
+def _note(id_user: str, id_subj: str) -> dict:
+    return {
+        "id": 1, "id_user": id_user, "id_subj": id_subj, "grade": Decimal("4.50"),
+        "is_active": True, "create_date": datetime(2024, 6, 1, 10, 0), "modify_date": None,
+    }
+
+
+async def _idle(broker: EventBroker, topics: list) -> None:
+    subscription = broker.subscribe(topics)
+    try:
+        while True:
+            await subscription.next(3600)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+async def _run(connections: int, iterations: int) -> dict:
+    broker = EventBroker(LocalPubSub())
+    subject = subject_topic(uuid.uuid4())
+    users = [str(uuid.uuid4()) for _ in range(connections)]
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    tasks = [asyncio.create_task(_idle(broker, [user_topic(u)])) for u in users]
+    await asyncio.sleep(0)
+    per_user = (tracemalloc.get_traced_memory()[0] - before) / connections
+    tracemalloc.stop()
+
+    # Los mismos N también siguen una materia (como N profesores/pantallas en un aula)
+    teachers = [asyncio.create_task(_idle(broker, [subject])) for _ in range(connections)]
+    await asyncio.sleep(0)
+
+    payload = {"op": "update", "note": _note(users[0], "x")}
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await broker.publish([subject], "note", payload)
+        await asyncio.sleep(0)  # las conexiones vacían su cola
+    fan_out = (time.perf_counter() - start) / iterations
+    await asyncio.sleep(0.1)  # las N conexiones de la materia vuelven a esperar
+
+    start = time.perf_counter()
+    for i in range(iterations):
+        await broker.publish([user_topic(users[i % connections])], "note", payload)
+        await asyncio.sleep(0)
+    single = (time.perf_counter() - start) / iterations
+
+    empty = EventBroker(LocalPubSub())
+    start = time.perf_counter()
+    for i in range(iterations * 10):
+        await empty.publish([user_topic(users[i % connections]), subject], "note", payload)
+    nobody = (time.perf_counter() - start) / (iterations * 10)
+
+    for task in tasks + teachers:
+        task.cancel()
+    await asyncio.gather(*tasks, *teachers, return_exceptions=True)
+    return {
+        "connections": connections,
+        "bytes_per_idle_connection": round(per_user),
+        "fan_out_subject_ms": round(fan_out * 1000, 2),
+        "fan_out_us_per_connection": round(fan_out * 1e6 / connections, 2),
+        "single_user_us": round(single * 1e6, 1),
+        "no_subscribers_us": round(nobody * 1e6, 2),
+        "after_close": broker.stats(),
+    }
+
+
+def run(connections: int = 10000, iterations: int = 50) -> dict:
+    return asyncio.run(_run(connections, iterations))
+
+
+if __name__ == "__main__":
+    connections = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    for k, v in run(connections).items():
+        print(f"{k:>28}: {v}")
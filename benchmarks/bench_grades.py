@@ -0,0 +1,121 @@
+# benchmarks/bench_grades.py
+# Latencia de los promedios sobre un cuerpo de notas (SQLite como sustituto):
+#   - cliente: pagina /notes (20 por página) y cruza créditos de subjects en Python
+#   - transcript/reporte en SQL (agregado en vivo)
+#   - transcript/reporte desde grade_summary (resumen precalculado)
+# Uso: python -m benchmarks.bench_grades [notas] [estudiantes]
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from decimal import Decimal
+
+# La app no se conecta a SQL Server aquí; usamos nuestro propio engine SQLite
+os.environ.setdefault("SQLSERVER_URL", "sqlite://")
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from core import grades
+from deps.db import ThreadedSession
+
+DDL = [
+    "CREATE TABLE users (id_user TEXT PRIMARY KEY, id_role INTEGER)",
+    "CREATE TABLE area (id_area INTEGER PRIMARY KEY, name TEXT)",
+    "CREATE TABLE subjects (id_subj TEXT PRIMARY KEY, credits INTEGER, id_area INTEGER)",
+    """CREATE TABLE notes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, id_user TEXT, id_subj TEXT, grade NUMERIC,
+        is_active INTEGER DEFAULT 1, create_date TEXT DEFAULT CURRENT_TIMESTAMP
+    )""",
+    "CREATE INDEX IX_notes_id_user ON notes (id_user, create_date DESC)",
+    """CREATE TABLE grade_summary (
+        id_user TEXT, id_area INTEGER, notes_count INTEGER, credits INTEGER,
+        grade_sum NUMERIC, weighted_sum NUMERIC, modify_date TEXT
+    )""",
+    "CREATE INDEX IX_grade_summary_id_user ON grade_summary (id_user, id_area)",
+]
+
+
+def _seed(engine, n_notes: int, n_students: int):
+    rnd = random.Random(42)
+    students = [str(uuid.uuid4()) for _ in range(n_students)]
+    subjects = [(str(uuid.uuid4()), rnd.randint(1, 6), rnd.randint(1, 5)) for _ in range(40)]
+    with engine.begin() as conn:
+        for q in DDL:
+            conn.execute(text(q))
+        conn.execute(text("INSERT INTO users VALUES (:id, 2)"), [{"id": s} for s in students])
+        conn.execute(text("INSERT INTO area VALUES (:id, :name)"), [{"id": i, "name": f"Área {i}"} for i in range(1, 6)])
+        conn.execute(text("INSERT INTO subjects VALUES (:id, :credits, :area)"),
+                     [{"id": s, "credits": c, "area": a} for s, c, a in subjects])
+        conn.execute(text("INSERT INTO notes (id_user, id_subj, grade) VALUES (:u, :s, :g)"), [
+            {"u": rnd.choice(students), "s": rnd.choice(subjects)[0], "g": str(Decimal(rnd.randint(100, 500)) / 100)}
+            for _ in range(n_notes)
+        ])
+        conn.execute(text(f"INSERT INTO grade_summary ({grades.SUMMARY_COLUMNS}) "
+                          + grades.GRADE_AGGREGATE.format(where="")))
+    return students
+
+
+async def _client_transcript(db, id_user: str, size: int = 20):
+    # Lo que hacía el frontend: todas las páginas de notas + créditos de cada materia
+    notes, page = [], 1
+    while True:
+        rows = (await db.execute(text("""
+            SELECT id, id_subj, grade FROM notes WHERE id_user = :u AND is_active = 1
+            ORDER BY create_date DESC, id DESC LIMIT :size OFFSET :offset
+        """), {"u": id_user, "size": size, "offset": (page - 1) * size})).mappings().all()
+        notes += rows
+        if len(rows) < size:
+            break
+        page += 1
+    credits = {}
+    for note in notes:
+        if note["id_subj"] not in credits:
+            credits[note["id_subj"]] = (await db.execute(
+                text("SELECT credits FROM subjects WHERE id_subj = :s"), {"s": note["id_subj"]}
+            )).scalar()
+    total = sum(credits[n["id_subj"]] for n in notes)
+    return sum(Decimal(str(n["grade"])) * credits[n["id_subj"]] for n in notes) / total if total else None
+
+
+async def _timed(fn, args_list) -> float:
+    start = time.perf_counter()
+    for args in args_list:
+        await fn(*args)
+    return (time.perf_counter() - start) / len(args_list) * 1000
+
+
+async def _run(n_notes: int, n_students: int) -> dict:
+    path = os.path.join(tempfile.gettempdir(), "p1sw_bench_grades.db")
+    if os.path.exists(path):
+        os.remove(path)
+    engine = create_engine(f"sqlite:///{path}")
+    students = _seed(engine, n_notes, n_students)
+    db = ThreadedSession(Session(engine))
+    sample = [(db, s) for s in students[:50]]
+
+    result = {"notes": n_notes, "students": n_students}
+    result["client_transcript_ms"] = round(await _timed(_client_transcript, sample), 2)
+    for mode, enabled in (("live", False), ("summary", True)):
+        grades.GRADE_SUMMARY_ENABLED = enabled
+        result[f"{mode}_transcript_ms"] = round(await _timed(grades.transcript, sample), 2)
+        result[f"{mode}_report_ms"] = round(await _timed(grades.grade_report, [(db,)] * 10), 2)
+
+    await db.close()
+    engine.dispose()
+    os.remove(path)
+    return result
+
+
+def run(n_notes: int = 10000, n_students: int = 500) -> dict:
+    return asyncio.run(_run(n_notes, n_students))
+
+
+if __name__ == "__main__":
+    n_notes = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    n_students = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    for k, v in run(n_notes, n_students).items():
+        print(f"{k:>22}: {v}")
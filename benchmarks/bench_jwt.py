@@ -0,0 +1,38 @@
+# benchmarks/bench_jwt.py
+# Uso: python -m benchmarks.bench_jwt [iteraciones]
+import sys
+import time
+
+from jose import jwt
+
+from core.config import SECRET_KEY, ALGORITHM
+from core.security import create_access_token, decode_token, token_cache
+
+
+def run(n: int = 20000) -> dict:
+    token = create_access_token({"sub": "2209F6FC-D474-4F02-98F5-9BEB5E849652"})
+
+    start = time.perf_counter()
+    for _ in range(n):
+        jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    cold = time.perf_counter() - start
+
+    token_cache.clear()
+    decode_token(token)  # calienta la caché
+    start = time.perf_counter()
+    for _ in range(n):
+        decode_token(token)
+    cached = time.perf_counter() - start
+
+    return {
+        "iterations": n,
+        "cold_ops_per_s": round(n / cold),
+        "cached_ops_per_s": round(n / cached),
+        "speedup": round(cold / cached, 1),
+    }
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    for k, v in run(n).items():
+        print(f"{k:>18}: {v}")
@@ -0,0 +1,80 @@
+# benchmarks/bench_metrics.py
+# Costo de la instrumentación (MetricsMiddleware + TimedRoute + hooks de SQLAlchemy):
+#   - request ASGI a un endpoint trivial, con y sin métricas
+#   - SELECT 1 sobre SQLite en memoria, con y sin hooks de consulta
+# Uso: python -m benchmarks.bench_metrics [requests] [consultas]
+import asyncio
+import os
+import sys
+import time
+
+# La app no se conecta a SQL Server aquí
+os.environ.setdefault("SQLSERVER_URL", "sqlite://")
+
+import httpx
+from fastapi import APIRouter, FastAPI
+from fastapi.routing import APIRoute
+from sqlalchemy import create_engine, text
+
+from core.instrumentation import MetricsMiddleware, TimedRoute, instrument_queries
+
+
+def _app(instrumented: bool) -> FastAPI:
+    app = FastAPI()
+    router = APIRouter(route_class=TimedRoute if instrumented else APIRoute)
+
+    @router.get("/items/{id}")
+    async def get_item(id: int):
+        return [{"id": id, "n": i} for i in range(20)]
+
+    app.include_router(router)
+    if instrumented:
+        app.add_middleware(MetricsMiddleware)
+    return app
+
+
+async def _requests(app: FastAPI, n: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for i in range(50):  # calentamiento
+            await client.get(f"/items/{i}")
+        start = time.perf_counter()
+        for i in range(n):
+            await client.get(f"/items/{i}")
+        return (time.perf_counter() - start) / n * 1e6
+
+
+def _queries(instrumented: bool, n: int) -> float:
+    engine = create_engine("sqlite://")
+    if instrumented:
+        instrument_queries(engine)
+    q = text("SELECT 1")
+    with engine.connect() as conn:
+        start = time.perf_counter()
+        for _ in range(n):
+            conn.execute(q).scalar()
+        elapsed = time.perf_counter() - start
+    engine.dispose()
+    return elapsed / n * 1e6
+
+
+def run(n_requests: int = 3000, n_queries: int = 20000) -> dict:
+    plain = asyncio.run(_requests(_app(False), n_requests))
+    timed = asyncio.run(_requests(_app(True), n_requests))
+    q_plain = _queries(False, n_queries)
+    q_timed = _queries(True, n_queries)
+    return {
+        "request_us": round(plain, 1),
+        "request_metrics_us": round(timed, 1),
+        "request_overhead_us": round(timed - plain, 1),
+        "query_us": round(q_plain, 2),
+        "query_hooks_us": round(q_timed, 2),
+        "query_overhead_us": round(q_timed - q_plain, 2),
+    }
+
+
+if __name__ == "__main__":
+    n_requests = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    n_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    for k, v in run(n_requests, n_queries).items():
+        print(f"{k:>20}: {v}")
@@ -0,0 +1,110 @@
+# benchmarks/bench_notes_bulk.py
+# POST /notes/ fila a fila contra POST /notes/bulk, por los endpoints reales: la app en
+# proceso (httpx.ASGITransport) sobre la base de sustituto de benchmarks/standin.py, como
+# benchmarks/loadtest.py. Entra todo el camino: validación, FKs por conjunto, INSERT por
+# lotes, grade_summary y eventos.
+#   - per_row: N × POST /notes/ (una transacción por request)
+#   - bulk: POST /notes/bulk con las mismas N filas (lotes de NOTES_BULK_MAX_ROWS)
+#   - bulk_with_errors: igual con 1 de cada 10 filas con una materia inexistente
+# Uso: python -m benchmarks.bench_notes_bulk [filas] [usuarios] [notas]
+import asyncio
+import os
+import sqlite3
+import sys
+import time
+import uuid
+from typing import List
+
+import httpx
+
+from benchmarks import standin
+
+
+def _ids(path: str, query: str) -> List[str]:
+    conn = sqlite3.connect(path)
+    try:
+        return [row[0] for row in conn.execute(query)]
+    finally:
+        conn.close()
+
+
+async def _post_all(client: httpx.AsyncClient, headers: dict, items: list) -> float:
+    start = time.perf_counter()
+    for item in items:
+        response = await client.post("/notes/", json=item, headers=headers)
+        if response.status_code != 201:
+            raise RuntimeError(f"POST /notes/ → {response.status_code}: {response.text}")
+    return time.perf_counter() - start
+
+
+async def _post_bulk(client: httpx.AsyncClient, headers: dict, items: list, max_rows: int) -> float:
+    start = time.perf_counter()
+    for i in range(0, len(items), max_rows):
+        chunk = items[i:i + max_rows]
+        response = await client.post("/notes/bulk", json={"items": chunk}, headers=headers)
+        if response.status_code != 201:
+            raise RuntimeError(f"POST /notes/bulk → {response.status_code}: {response.text[:500]}")
+    return time.perf_counter() - start
+
+
+async def _measure(app, users: List[str], subjects: List[str], n: int, max_rows: int) -> dict:
+    items = [
+        {"id_user": users[i % len(users)], "id_subj": subjects[i % len(subjects)], "grade": f"{(i % 401 + 100) / 100:.2f}"}
+        for i in range(n)
+    ]
+    # Materia inexistente: la fila se rechaza en la comprobación de FKs, el resto se inserta
+    with_errors = [dict(item, id_subj=str(uuid.uuid4())) if i % 10 == 0 else item for i, item in enumerate(items)]
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+        token = await client.post("/auth/token", json={"username": "user0", "password": standin.PASSWORD})
+        headers = {"Authorization": f"Bearer {token.json()['access_token']}"}
+        # Calentamiento: pool, sentencias compiladas y cachés antes de medir
+        await _post_all(client, headers, items[:10])
+        await _post_bulk(client, headers, items[:10], max_rows)
+
+        per_row = await _post_all(client, headers, items)
+        bulk = await _post_bulk(client, headers, items, max_rows)
+        bulk_errors = await _post_bulk(client, headers, with_errors, max_rows)
+
+    return {
+        "rows": n,
+        "per_row_rows_per_s": round(n / per_row),
+        "bulk_rows_per_s": round(n / bulk),
+        "bulk_with_errors_rows_per_s": round(n / bulk_errors),
+        "speedup": round(per_row / bulk, 1),
+    }
+
+
+def run(n: int = 2000, users: int = 1000, notes: int = 10000) -> dict:
+    # Antes de importar la app: el engine (y el dialecto) salen de la URL al importar
+    path = standin.work_path()
+    os.environ["SQLSERVER_URL"] = f"sqlite:///{path}?timeout=30"
+    os.environ["ASYNC_SQLSERVER_URL"] = f"sqlite+aiosqlite:///{path}?timeout=30"
+    # N POST /notes/ de un mismo cliente superan RATE_LIMIT_DEFAULT: se mide la carga, no el limitador
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    standin.prepare(users, notes, work=path)
+
+    from core.config import NOTES_BULK_MAX_ROWS
+    from database import connection
+    from main import app
+
+    try:
+        return asyncio.run(_measure(
+            app,
+            _ids(path, "SELECT id_user FROM users ORDER BY id_user"),
+            _ids(path, "SELECT id_subj FROM subjects ORDER BY id_subj"),
+            n,
+            NOTES_BULK_MAX_ROWS,
+        ))
+    finally:
+        connection.engine.dispose()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:4]]
+    for k, v in run(*args).items():
+        print(f"{k:>28}: {v}")
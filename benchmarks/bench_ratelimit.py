@@ -0,0 +1,92 @@
+# benchmarks/bench_ratelimit.py
+# Costo por request de RateLimitMiddleware (backend en memoria) sobre una app ASGI mínima:
+#   - sin middleware (base), anónimo (clave = IP) y con Bearer (clave = sub del JWT,
+#     decode_token con caché)
+#   - take() del backend solo, con pocos clientes y con más clientes que RATE_LIMIT_MAX_KEYS
+#     (LRU expulsando en cada request)
+#   - rechazo por rate limit (429) y por concurrencia (503)
+# Uso: python -m benchmarks.bench_ratelimit [iteraciones]
+import asyncio
+import os
+import sys
+import time
+
+# La app no se conecta a SQL Server aquí
+os.environ.setdefault("SQLSERVER_URL", "sqlite://")
+
+from core.ratelimit import Budget, InMemoryRateLimit, RateLimiter, RateLimitMiddleware
+from core.security import create_access_token
+
+UNLIMITED = "1000000000/1"
+
+
+async def _app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+def _scope(path: str = "/notes/", token: str = None, ip: str = "10.0.0.1") -> dict:
+    headers = [(b"host", b"test")]
+    if token:
+        headers.append((b"authorization", f"Bearer {token}".encode()))
+    return {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "root_path": "", "headers": headers, "client": (ip, 1234), "server": ("test", 80),
+    }
+
+
+async def _receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def _send(message):
+    pass
+
+
+async def _timed(app, scopes: list, iterations: int) -> float:
+    n = len(scopes)
+    start = time.perf_counter()
+    for i in range(iterations):
+        await app(scopes[i % n], _receive, _send)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+async def _run(iterations: int) -> dict:
+    token = create_access_token({"sub": "cdf4edbe-6240-4bdd-a8ce-576b6653d563"})
+    limited = RateLimitMiddleware(_app, RateLimiter(InMemoryRateLimit(), default=UNLIMITED, routes=""))
+    result = {
+        "baseline_us": await _timed(_app, [_scope()], iterations),
+        "anonymous_ip_us": await _timed(limited, [_scope()], iterations),
+        "bearer_sub_us": await _timed(limited, [_scope(token=token)], iterations),
+        "bearer_sub_1000_clients_us": await _timed(
+            limited, [_scope(token=create_access_token({"sub": f"user-{i}"})) for i in range(1000)], iterations),
+    }
+
+    budget = Budget("default", UNLIMITED)
+    for name, clients, max_keys in (("take_10_clients_us", 10, 100000), ("take_lru_evicting_us", 20000, 10000)):
+        backend = InMemoryRateLimit(max_keys=max_keys)
+        keys = [f"default:ip:10.0.{i // 256}.{i % 256}" for i in range(clients)]
+        start = time.perf_counter()
+        for i in range(iterations):
+            await backend.take(keys[i % clients], budget)
+        result[name] = (time.perf_counter() - start) / iterations * 1e6
+
+    # Rechazos: bucket vacío (429) y tope de concurrencia alcanzado (503)
+    rejecting = RateLimiter(InMemoryRateLimit(), default="1/3600", routes="")
+    result["rejected_429_us"] = await _timed(RateLimitMiddleware(_app, rejecting), [_scope()], iterations)
+    shedding = RateLimiter(InMemoryRateLimit(), default=UNLIMITED, routes="", max_in_flight=1)
+    shedding.in_flight = 1
+    result["shed_503_us"] = await _timed(RateLimitMiddleware(_app, shedding), [_scope()], iterations)
+    result["overhead_bearer_us"] = result["bearer_sub_us"] - result["baseline_us"]
+    return {k: round(v, 2) for k, v in result.items()}
+
+
+def run(iterations: int = 20000) -> dict:
+    return asyncio.run(_run(iterations))
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    for k, v in run(iterations).items():
+        print(f"{k:>28}: {v}")
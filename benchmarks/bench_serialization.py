@@ -0,0 +1,72 @@
+# benchmarks/bench_serialization.py
+# Compara la serialización de una página de 200 notas:
+#   - camino normal: validación con response_model (Pydantic) + JSONResponse
+#   - camino rápido: FastJSONResponse directo desde las filas
+# Uso: python -m benchmarks.bench_serialization [filas] [iteraciones]
+import asyncio
+import sys
+import time
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from core.responses import FastJSONResponse, orjson
+from schemas.notes import NoteOut
+
+
+def _rows(n: int):
+    now = datetime.now()
+    return [
+        {
+            "id": i,
+            "id_user": uuid.uuid4(),
+            "id_subj": uuid.uuid4(),
+            "grade": Decimal("4.25"),
+            "is_active": True,
+            "create_date": now,
+            "modify_date": None,
+        }
+        for i in range(n)
+    ]
+
+
+async def _pydantic_path(field, rows):
+    content = await serialize_response(field=field, response_content=rows)
+    return JSONResponse(content).body
+
+
+def run(n: int = 200, iterations: int = 300) -> dict:
+    rows = _rows(n)
+    field = create_response_field("Response_list_notes", List[NoteOut])
+    loop = asyncio.new_event_loop()
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        loop.run_until_complete(_pydantic_path(field, rows))
+    slow = time.perf_counter() - start
+    loop.close()
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        FastJSONResponse(rows).body
+    fast = time.perf_counter() - start
+
+    return {
+        "rows_per_page": n,
+        "encoder": "orjson" if orjson is not None else "json",
+        "pydantic_ms_per_page": round(slow / iterations * 1000, 3),
+        "fast_ms_per_page": round(fast / iterations * 1000, 3),
+        "speedup": round(slow / fast, 1),
+    }
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    for k, v in run(n, iterations).items():
+        print(f"{k:>22}: {v}")
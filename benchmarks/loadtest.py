@@ -0,0 +1,340 @@
+# benchmarks/loadtest.py
+# Prueba de carga reproducible de los endpoints calientes.
+#   - Sin --url: levanta la app en proceso sobre la base local de sustituto
+#     (benchmarks/standin.py, SQLite sembrado con semilla fija) y la llama por ASGI.
+#   - Con --url: ataca un servidor ya levantado (los ids se muestrean desde la API).
+# Cada escenario corre --requests llamadas con --concurrency workers y reporta
+# RPS, p50/p95/p99 y status; el resultado queda en un JSON comparable con --compare.
+#
+# Uso:
+#   python -m benchmarks.loadtest                              # 100k usuarios, 1M notas
+#   python -m benchmarks.loadtest --users 1000 --notes 10000 --requests 200
+#   python -m benchmarks.loadtest --compare benchmarks/results/anterior.json
+#   python -m benchmarks.loadtest --url http://localhost:8000 --username admin --password ...
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+class Context:
+    """Ids de muestra, token y generador aleatorio compartidos por los escenarios."""
+
+    def __init__(self, seed: int):
+        self.rnd = random.Random(seed)
+        self.headers: Dict[str, str] = {}
+        self.username = ""
+        self.password = ""
+        self.users: List[str] = []
+        self.subjects: List[str] = []
+        self.notes: List[int] = []
+        self.areas: List[int] = []
+        self.roles: List[int] = []
+        self.logins: List[int] = []
+
+    def pick(self, values: list):
+        return self.rnd.choice(values)
+
+
+def _request(method: str, path: Callable[[Context], str], body: Optional[Callable[[Context], dict]] = None, auth=True):
+    async def call(client: httpx.AsyncClient, ctx: Context) -> httpx.Response:
+        return await client.request(
+            method, path(ctx), json=body(ctx) if body else None, headers=ctx.headers if auth else None,
+        )
+    return call
+
+
+async def _token(client: httpx.AsyncClient, ctx: Context) -> httpx.Response:
+    return await client.post("/auth/token", json={"username": ctx.username, "password": ctx.password})
+
+
+SCENARIOS = {
+    "auth_token": _token,
+    "users_list": _request("GET", lambda c: "/users/?size=50"),
+    "users_get": _request("GET", lambda c: f"/users/{c.pick(c.users)}"),
+    "users_update": _request(
+        "PUT", lambda c: f"/users/{c.pick(c.users)}", lambda c: {"last_name": f"Carga{c.rnd.randint(0, 999)}"},
+    ),
+    "users_transcript": _request("GET", lambda c: f"/users/{c.pick(c.users)}/transcript"),
+    "notes_list": _request("GET", lambda c: "/notes/?size=50"),
+    "notes_list_by_user": _request("GET", lambda c: f"/notes/?id_user={c.pick(c.users)}"),
+    "notes_get": _request("GET", lambda c: f"/notes/{c.pick(c.notes)}"),
+    "notes_create": _request(
+        "POST", lambda c: "/notes/",
+        lambda c: {"id_user": c.pick(c.users), "id_subj": c.pick(c.subjects), "grade": f"{c.rnd.randint(100, 500) / 100:.2f}"},
+    ),
+    "notes_update": _request(
+        "PUT", lambda c: f"/notes/{c.pick(c.notes)}", lambda c: {"grade": f"{c.rnd.randint(100, 500) / 100:.2f}"},
+    ),
+    "subjects_list": _request("GET", lambda c: "/subjects/?size=50"),
+    "subjects_get": _request("GET", lambda c: f"/subjects/{c.pick(c.subjects)}"),
+    "areas_list": _request("GET", lambda c: "/areas/"),
+    "areas_get": _request("GET", lambda c: f"/areas/{c.pick(c.areas)}"),
+    "roles_list": _request("GET", lambda c: "/roles/"),
+    "roles_get": _request("GET", lambda c: f"/roles/{c.pick(c.roles)}"),
+    "login_list": _request("GET", lambda c: "/login/?size=50"),
+    "login_get": _request("GET", lambda c: f"/login/{c.pick(c.logins)}"),
+}
+
+
+def _percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_scenario(client: httpx.AsyncClient, ctx: Context, call, requests: int, concurrency: int) -> dict:
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    errors: Counter = Counter()
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                response = await call(client, ctx)
+                statuses[str(response.status_code)] += 1
+            except Exception as exc:
+                errors[type(exc).__name__] += 1
+                continue
+            if response.status_code in (429, 503):
+                # Rechazadas por el rate limit o el tope de concurrencia: no son latencias de la API
+                errors[f"HTTP {response.status_code}"] += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    ms = [v * 1000 for v in latencies]
+    return {
+        "requests": requests,
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(requests / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(_percentile(ms, 50), 2),
+        "p95_ms": round(_percentile(ms, 95), 2),
+        "p99_ms": round(_percentile(ms, 99), 2),
+        "mean_ms": round(sum(ms) / len(ms), 2) if ms else 0.0,
+        "max_ms": round(ms[-1], 2) if ms else 0.0,
+        "status": dict(sorted(statuses.items())),
+        "errors": dict(errors),
+    }
+
+
+def _sample_standin(path: str, ctx: Context, size: int = 2000) -> None:
+    conn = sqlite3.connect(path)
+    # Muestreo determinista: un id cada N filas, en orden de clave
+    def sample(query: str) -> list:
+        values = [row[0] for row in conn.execute(query)]
+        step = max(1, len(values) // size)
+        return values[::step][:size]
+
+    ctx.users = sample("SELECT id_user FROM users ORDER BY id_user")
+    ctx.subjects = sample("SELECT id_subj FROM subjects ORDER BY id_subj")
+    ctx.areas = sample("SELECT id_area FROM area ORDER BY id_area")
+    ctx.roles = sample("SELECT id FROM roles ORDER BY id")
+    ctx.logins = sample("SELECT id FROM login ORDER BY id")
+    max_note = conn.execute("SELECT MAX(id) FROM notes").fetchone()[0] or 0
+    ctx.notes = [ctx.rnd.randint(1, max_note) for _ in range(size)] if max_note else []
+    conn.close()
+
+
+async def _sample_api(client: httpx.AsyncClient, ctx: Context) -> None:
+    async def ids(path: str, key: str, size: int = 200) -> list:
+        response = await client.get(path, params={"size": size}, headers=ctx.headers)
+        response.raise_for_status()
+        rows = response.json()
+        # Página corta con X-Next-Cursor: el servidor no aplicó `size` y la muestra serían
+        # las mismas pocas filas calientes de la página por defecto
+        if not rows or (len(rows) < size and response.headers.get("X-Next-Cursor")):
+            raise RuntimeError(f"Muestra de {path}: {len(rows)} filas con size={size}")
+        return [row[key] for row in rows]
+
+    ctx.users = await ids("/users/", "id_user")
+    ctx.subjects = await ids("/subjects/", "id_subj")
+    ctx.notes = await ids("/notes/", "id")
+    ctx.areas = await ids("/areas/", "id_area")
+    ctx.roles = await ids("/roles/", "id")
+    ctx.logins = await ids("/login/", "id")
+
+
+async def _drive(client: httpx.AsyncClient, ctx: Context, args, sample_api: bool) -> Dict[str, dict]:
+    response = await _token(client, ctx)
+    response.raise_for_status()
+    ctx.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    if sample_api:
+        await _sample_api(client, ctx)
+
+    results = {}
+    for name in args.scenarios:
+        call = SCENARIOS[name]
+        # /auth/token está acotado por bcrypt (~250 ms por hash): corre menos requests
+        requests = args.auth_requests if name == "auth_token" else args.requests
+        # Calentamiento: cachés, compiled cache y pool antes de medir
+        await run_scenario(client, ctx, call, min(args.warmup, requests), args.concurrency)
+        results[name] = await run_scenario(client, ctx, call, requests, args.concurrency)
+        row = results[name]
+        print(f"{name:>20}: {row['rps']:>8} rps  p50 {row['p50_ms']:>8} ms  p95 {row['p95_ms']:>8} ms"
+              f"  p99 {row['p99_ms']:>8} ms  {row['status']}{'  ' + str(row['errors']) if row['errors'] else ''}")
+    return results
+
+
+def _in_process(args, ctx: Context) -> Dict[str, dict]:
+    from benchmarks import standin
+
+    # Antes de importar la app: el engine (y el dialecto) salen de la URL al importar
+    path = standin.work_path()
+    os.environ["SQLSERVER_URL"] = f"sqlite:///{path}?timeout=30"
+    os.environ["ASYNC_SQLSERVER_URL"] = f"sqlite+aiosqlite:///{path}?timeout=30"
+    # Se mide la API, no el limitador (un solo cliente haría casi todo 429/503);
+    # su costo se mide con python -m benchmarks.bench_ratelimit
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    standin.prepare(args.users, args.notes, fresh=args.fresh, work=path)
+
+    from database import connection
+    from main import app
+
+    ctx.username, ctx.password = "user0", standin.PASSWORD
+    _sample_standin(path, ctx)
+
+    async def main():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=60) as client:
+            return await _drive(client, ctx, args, sample_api=False)
+
+    try:
+        return asyncio.run(main())
+    finally:
+        connection.engine.dispose()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+
+def _remote(args, ctx: Context) -> Dict[str, dict]:
+    ctx.username, ctx.password = args.username, args.password
+
+    async def main():
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=args.url, timeout=60, limits=limits) as client:
+            return await _drive(client, ctx, args, sample_api=True)
+
+    return asyncio.run(main())
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: dict, baseline: dict) -> None:
+    print(f"\nComparación con {baseline['meta'].get('commit')} ({baseline['meta'].get('timestamp')}):")
+    for name, row in current["scenarios"].items():
+        old = baseline["scenarios"].get(name)
+        if not old:
+            continue
+        deltas = []
+        for key in ("rps", "p50_ms", "p95_ms", "p99_ms"):
+            if old[key]:
+                deltas.append(f"{key} {(row[key] - old[key]) / old[key] * 100:+6.1f}%")
+        print(f"{name:>20}: " + "  ".join(deltas))
+
+
+def run(
+    users: int = 100_000,
+    notes: int = 1_000_000,
+    concurrency: int = 16,
+    requests: int = 1000,
+    scenarios: Optional[List[str]] = None,
+    **options,
+) -> dict:
+    args = argparse.Namespace(
+        users=users, notes=notes, concurrency=concurrency, requests=requests,
+        scenarios=scenarios or list(SCENARIOS), warmup=options.get("warmup", 50), fresh=options.get("fresh", False),
+        auth_requests=options.get("auth_requests", 100),
+        url=options.get("url"), username=options.get("username"), password=options.get("password"),
+        seed=options.get("seed", 1234),
+    )
+    ctx = Context(args.seed)
+    results = _remote(args, ctx) if args.url else _in_process(args, ctx)
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "target": args.url or "standin",
+            "users": None if args.url else users,
+            "notes": None if args.url else notes,
+            "concurrency": concurrency,
+            "requests": requests,
+            "auth_requests": args.auth_requests,
+            "seed": args.seed,
+        },
+        "scenarios": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prueba de carga de los endpoints calientes")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--notes", type=int, default=1_000_000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=1000, help="requests medidos por escenario")
+    parser.add_argument("--auth-requests", type=int, default=100, help="requests medidos para auth_token")
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="lista separada por comas")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--fresh", action="store_true", help="volver a sembrar la base de sustituto")
+    parser.add_argument("--url", help="servidor ya levantado (sin esto se usa la base de sustituto)")
+    parser.add_argument("--username", default=os.getenv("LOADTEST_USERNAME"))
+    parser.add_argument("--password", default=os.getenv("LOADTEST_PASSWORD"))
+    parser.add_argument("--out", help="archivo JSON (por defecto benchmarks/results/loadtest-<fecha>.json)")
+    parser.add_argument("--compare", help="JSON de una corrida anterior")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"escenarios desconocidos: {', '.join(unknown)} (disponibles: {', '.join(SCENARIOS)})")
+    if args.url and not (args.username and args.password):
+        parser.error("--url requiere --username y --password (o LOADTEST_USERNAME / LOADTEST_PASSWORD)")
+
+    result = run(
+        args.users, args.notes, args.concurrency, args.requests, names,
+        warmup=args.warmup, auth_requests=args.auth_requests, fresh=args.fresh, url=args.url,
+        username=args.username, password=args.password, seed=args.seed,
+    )
+
+    out = args.out
+    if not out:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        out = os.path.join(RESULTS_DIR, f"loadtest-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"\nResultado: {out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(result, json.load(f))
@@ -0,0 +1,115 @@
+# benchmarks/standin.py
+# Base de datos local de sustituto para benchmarks: SQLite con el esquema e índices
+# de migrate/database.py (dialecto SQLite de database/dialect.py), sembrada con
+# semilla fija: el mismo tamaño produce siempre los mismos datos.
+# La app debe apuntar a SQLite (SQLSERVER_URL=sqlite:///...) antes de llamar a prepare().
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+SEED = 1234
+PASSWORD = "bench-password"
+
+
+def work_path() -> str:
+    """Copia de trabajo de esta corrida (la app escribe aquí, la base sembrada no se toca)."""
+    return os.path.join(tempfile.gettempdir(), f"p1sw_standin_run_{os.getpid()}.db")
+
+
+def _uuid(rnd: random.Random) -> str:
+    return str(uuid.UUID(int=rnd.getrandbits(128), version=4))
+
+
+def _timestamp(rnd: random.Random, start: datetime, days: int) -> str:
+    return (start + timedelta(seconds=rnd.randrange(days * 86400))).isoformat(" ", "milliseconds")
+
+
+def seed(path: str, users: int, notes: int, password_hash: str) -> None:
+    """Crea la base en `path` con `users` usuarios (cada uno con login) y `notes` notas."""
+    from database.dialect import DIALECTS
+    from migrate.database import index_statements, table_statements
+
+    sqlite_dialect = DIALECTS["sqlite"]
+    rnd = random.Random(SEED)
+    start = datetime(2023, 1, 1)
+    admin = _uuid(rnd)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    with conn:
+        for statement in table_statements(sqlite_dialect):
+            conn.execute(statement)
+        conn.executemany(
+            "INSERT INTO roles (name, id_user_create) VALUES (?, ?)",
+            [("Administrador", admin), ("Estudiante", admin)],
+        )
+        conn.executemany(
+            "INSERT INTO area (name, id_user_create, create_date) VALUES (?, ?, ?)",
+            [(f"Área {i}", admin, _timestamp(rnd, start, 30)) for i in range(1, 11)],
+        )
+        subjects = [_uuid(rnd) for _ in range(200)]
+        conn.executemany(
+            "INSERT INTO subjects (id_subj, name, credits, id_area, id_user_create, create_date) VALUES (?, ?, ?, ?, ?, ?)",
+            [(s, f"Materia {i}", rnd.randint(1, 6), rnd.randint(1, 10), admin, _timestamp(rnd, start, 60))
+             for i, s in enumerate(subjects)],
+        )
+
+        user_ids = [_uuid(rnd) for _ in range(users)]
+        conn.executemany(
+            "INSERT INTO users (id_user, name, last_name, id_role, birthdate, id_user_create, create_date) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(u, f"Nombre{i}", f"Apellido{i}", 1 if i == 0 else 2,
+              f"{rnd.randint(1990, 2006)}-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+              admin, _timestamp(rnd, start, 700))
+             for i, u in enumerate(user_ids)],
+        )
+        conn.executemany(
+            "INSERT INTO login (username, password_hash, id_user, id_user_create, create_date) VALUES (?, ?, ?, ?, ?)",
+            [(f"user{i}", password_hash, u, admin, _timestamp(rnd, start, 700)) for i, u in enumerate(user_ids)],
+        )
+
+        batch = 50000
+        for offset in range(0, notes, batch):
+            conn.executemany(
+                "INSERT INTO notes (id_user, id_subj, grade, id_user_create, create_date) VALUES (?, ?, ?, ?, ?)",
+                [(rnd.choice(user_ids), rnd.choice(subjects), f"{rnd.randint(100, 500) / 100:.2f}",
+                  admin, _timestamp(rnd, start, 700))
+                 for _ in range(offset, min(offset + batch, notes))],
+            )
+        for statement in index_statements(sqlite_dialect):
+            conn.execute(statement)
+        conn.execute("""
+            INSERT INTO grade_summary (id_user, id_area, notes_count, credits, grade_sum, weighted_sum)
+            SELECT n.id_user, s.id_area, COUNT(*), SUM(s.credits), SUM(n.grade), SUM(n.grade * s.credits)
+            FROM notes n INNER JOIN subjects s ON s.id_subj = n.id_subj
+            WHERE n.is_active = 1
+            GROUP BY n.id_user, s.id_area
+        """)
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+def prepare(users: int, notes: int, fresh: bool = False, work: str = "") -> str:
+    """
+    Devuelve una copia de trabajo de la base sembrada (en `work` o work_path()).
+    La base sembrada se guarda por tamaño en el directorio temporal y se reutiliza entre corridas.
+    """
+    from core.security import pwd_context
+
+    pristine = os.path.join(tempfile.gettempdir(), f"p1sw_standin_{users}_{notes}_{SEED}.db")
+    if fresh or not os.path.exists(pristine):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(pristine + suffix):
+                os.remove(pristine + suffix)
+        start = time.perf_counter()
+        seed(pristine + ".tmp", users, notes, pwd_context.hash(PASSWORD))
+        os.replace(pristine + ".tmp", pristine)
+        print(f"Base sembrada en {time.perf_counter() - start:.1f} s: {pristine}")
+
+    work = work or work_path()
+    shutil.copyfile(pristine, work)
+    return work
@@ -0,0 +1,127 @@
+# core/batch.py
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+from core.cache import VersionedCache
+from core.config import BATCH_PATCH_MAX_ITEMS
+from database.dialect import dialect
+from database.queries import queries, sql
+from deps.db import DBSession, is_replica
+
+# SQL Server admite como máximo 2100 parámetros por sentencia
+IN_CHUNK_SIZE = 1000
+
+
+def batch_key(value: Any) -> str:
+    # Los UNIQUEIDENTIFIER pueden volver en mayúsculas: comparamos en minúsculas
+    return str(value).lower()
+
+
+async def fetch_many(
+    db: DBSession,
+    *,
+    table: str,
+    columns: str,
+    pk: str,
+    ids: Iterable[Any],
+    cache: Optional[VersionedCache] = None,
+) -> Dict[str, dict]:
+    """
+    Trae muchas filas por id con WHERE pk IN (...) (por bloques) en vez de una
+    consulta por id. Devuelve {id: fila}; los ids inexistentes no aparecen.
+    Con `cache` (datos de referencia) solo se consultan los ids que no estén en caché.
+    """
+    wanted = {batch_key(i): i for i in ids if i is not None}
+    found: Dict[str, dict] = {}
+    if cache is not None:
+        # Versión leída antes de la consulta (ver VersionedCache.set)
+        version = await cache.version()
+        for key in wanted:
+            cached = await cache.get(key, version)
+            if cached is not None:
+                found[key] = cached
+
+    missing = [value for key, value in wanted.items() if key not in found]
+    # Lo leído de la réplica puede venir atrasado: se usa, pero no se guarda en caché
+    fill = cache if cache is not None and not is_replica(db) else None
+    q = sql(f"SELECT {columns} FROM {table} WHERE {pk} IN :ids", expanding=("ids",))
+    for i in range(0, len(missing), IN_CHUNK_SIZE):
+        rows = (await db.execute(q, {"ids": missing[i:i + IN_CHUNK_SIZE]})).mappings().all()
+        for row in rows:
+            key = batch_key(row[pk])
+            found[key] = dict(row)
+            if fill is not None:
+                await fill.set(key, found[key], version)
+    return found
+
+
+async def update_many(
+    db: DBSession,
+    *,
+    table: str,
+    pk: str,
+    pk_type: str,
+    columns: Dict[str, str],
+    rows: List[dict],
+    returning: str,
+) -> List[dict]:
+    """
+    Aplica muchos updates parciales con SQL por conjunto, dentro de la transacción
+    del que llama (el commit lo hace el router):
+    1) tabla temporal con pk + `columns` ({columna: tipo}; los tipos admiten {uuid}, {text}, {bool}...)
+    2) INSERT de `rows` con executemany (None = no tocar la columna)
+    3) un UPDATE ... FROM que devuelve las filas afectadas (`returning`)
+    Los pk que no existen simplemente no aparecen en el resultado.
+    """
+    staging = f"batch_{table}"
+    names = [pk, *columns]
+    body = ", ".join(f"{name} {kind}" for name, kind in {pk: f"{pk_type} PRIMARY KEY", **columns}.items())
+    create = sql(dialect.create_temp_table(staging, body.format(**dialect.types)))
+    insert = sql(f"""
+        INSERT INTO {dialect.temp_table(staging)} ({", ".join(names)})
+        VALUES ({", ".join(f":{name}" for name in names)})
+    """)
+    drop = sql(dialect.drop_temp_table(staging))
+
+    await db.execute(drop)
+    await db.execute(create)
+    await db.execute(insert, [{name: row.get(name) for name in names} for row in rows])
+    result = (await db.execute(
+        queries.update_many(table, list(columns), pk=pk, staging=staging, returning=returning)
+    )).mappings().all()
+    await db.execute(drop)
+    return [dict(row) for row in result]
+
+
+
+def patch_rows(items: List[BaseModel], pk: str) -> List[dict]:
+    """
+    Ítems de un PATCH por lote (XUpdate + pk + delete) → filas para update_many.
+    delete=true es el soft delete de DELETE (is_active = false).
+    """
+    if len(items) > BATCH_PATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Máximo {BATCH_PATCH_MAX_ITEMS} filas por petición")
+    rows, seen = [], set()
+    for i, item in enumerate(items):
+        row = item.model_dump(exclude={"delete"})
+        key = batch_key(row[pk])
+        if key in seen:
+            raise HTTPException(status_code=400, detail=f"items[{i}]: {pk} repetido en el lote")
+        seen.add(key)
+        if item.delete:
+            row["is_active"] = False
+        elif all(value is None for name, value in row.items() if name != pk):
+            raise HTTPException(status_code=400, detail=f"items[{i}]: nada para actualizar")
+        row[pk] = str(row[pk])
+        rows.append(row)
+    return rows
+
+
+def batch_result(rows: List[dict], pk: str, updated: List[dict]) -> Tuple[List[dict], List[Any]]:
+    """(filas actualizadas en el orden pedido, pk pedidos que no existen)."""
+    by_key = {batch_key(row[pk]): row for row in updated}
+    ordered = [by_key[batch_key(row[pk])] for row in rows if batch_key(row[pk]) in by_key]
+    not_found = [row[pk] for row in rows if batch_key(row[pk]) not in by_key]
+    return ordered, not_found
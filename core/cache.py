@@ -0,0 +1,345 @@
+# core/cache.py
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from core.config import CACHE_BACKEND_URL, CACHE_LOCAL_TTL, CACHE_MEMORY_MAX_KEYS, CACHE_MEMORY_SWEEP_SECONDS
+from core.responses import dumps
+
+
+# --- Backends compartidos (entre workers) ---
+class CacheBackend:
+    """
+    Interfaz mínima de un backend compartido (valores serializados a str).
+    Asíncrona: se llama desde handlers y dependencias, la red no bloquea el event loop.
+    """
+
+    async def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        raise NotImplementedError
+
+    async def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    async def incr(self, key: str) -> int:
+        raise NotImplementedError
+
+    async def add(self, key: str, value: str, ttl: float) -> bool:
+        """set solo si la clave no existe (atómico); True si se guardó."""
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {}
+
+
+class InMemoryBackend(CacheBackend):
+    """
+    Fake en memoria del backend compartido (pruebas / un solo proceso).
+    Acotado: como mucho `max_keys` claves (se expulsa la menos usada) y cada
+    `sweep_every` segundos se borran las expiradas aunque nadie las vuelva a leer.
+    Los contadores (incr: versiones de VersionedCache) van aparte y no se expulsan.
+    """
+
+    def __init__(self, max_keys: int = CACHE_MEMORY_MAX_KEYS, sweep_every: float = CACHE_MEMORY_SWEEP_SECONDS):
+        self.max_keys = max_keys
+        self.sweep_every = sweep_every
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + sweep_every
+        self.evictions = 0
+        self.expired = 0
+
+    def _store(self, key: str, value: str, ttl: float, now: float) -> None:
+        # Con el lock tomado
+        self._data[key] = (value, now + ttl)
+        self._data.move_to_end(key)
+        if now >= self._next_sweep:
+            self._sweep(now)
+        while len(self._data) > self.max_keys:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def _sweep(self, now: float) -> None:
+        expired = [key for key, (_, expires) in self._data.items() if expires < now]
+        for key in expired:
+            del self._data[key]
+        self.expired += len(expired)
+        self._next_sweep = now + self.sweep_every
+
+    async def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            if key in self._counters:
+                return str(self._counters[key])
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                self.expired += 1
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        with self._lock:
+            self._store(key, value, ttl, time.monotonic())
+
+    async def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+            self._counters.pop(key, None)
+
+    async def incr(self, key: str) -> int:
+        # Los contadores no expiran
+        with self._lock:
+            value = self._counters[key] = self._counters.get(key, 0) + 1
+            return value
+
+    async def add(self, key: str, value: str, ttl: float) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            item = self._data.get(key)
+            if item is not None and item[1] >= now:
+                return False
+            self._store(key, value, ttl, now)
+            return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "keys": len(self._data),
+                "max_keys": self.max_keys,
+                "counters": len(self._counters),
+                "evictions": self.evictions,
+                "expired": self.expired,
+            }
+
+
+class RedisBackend(CacheBackend):
+    def __init__(self, url: str):
+        import redis.asyncio as redis  # pip install redis (opcional)
+
+        self._client = redis.Redis.from_url(url, decode_responses=True)
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._client.get(key)
+
+    async def set(self, key: str, value: str, ttl: float) -> None:
+        await self._client.set(key, value, px=max(1, int(ttl * 1000)))
+
+    async def delete(self, key: str) -> None:
+        await self._client.delete(key)
+
+    async def incr(self, key: str) -> int:
+        return int(await self._client.incr(key))
+
+    async def add(self, key: str, value: str, ttl: float) -> bool:
+        return bool(await self._client.set(key, value, px=max(1, int(ttl * 1000)), nx=True))
+
+
+def shared_backend() -> Optional[CacheBackend]:
+    """
+    Backend compartido según CACHE_BACKEND_URL:
+    - vacío: sin backend (solo caché local por worker)
+    - memory://: InMemoryBackend
+    - redis://...: RedisBackend (requiere el paquete redis)
+    """
+    if not CACHE_BACKEND_URL:
+        return None
+    if CACHE_BACKEND_URL.startswith("memory://"):
+        return InMemoryBackend()
+    return RedisBackend(CACHE_BACKEND_URL)
+
+
+# --- Caché local TTL + LRU ---
+_MISSING = object()
+_caches: Dict[str, "TTLCache"] = {}
+
+
+class TTLCache:
+    """
+    Caché en proceso con expiración (TTL) y desalojo LRU.
+    Si hay backend compartido, se consulta en los fallos locales y las
+    entradas locales viven como mucho CACHE_LOCAL_TTL segundos, así una
+    invalidación en otro worker se ve en ese tiempo. get/set/invalidate solo
+    tocan la caché local; aget/aset/ainvalidate también el backend.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        maxsize: int,
+        ttl: float,
+        backend: Optional[CacheBackend] = None,
+        dumps: Callable[[Any], str] = json.dumps,
+        loads: Callable[[str], Any] = json.loads,
+    ):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.backend = backend
+        self.local_ttl = min(ttl, CACHE_LOCAL_TTL) if backend else ttl
+        self._dumps = dumps
+        self._loads = loads
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        _caches[name] = self
+
+    def _key(self, key: str) -> str:
+        return f"{self.name}:{key}"
+
+    def _set_local(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.local_ttl if ttl is None else min(ttl, self.local_ttl)
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def _get_local(self, key: str) -> Any:
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING:
+                value, expires = item
+                if expires >= time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+        return _MISSING
+
+    def _miss(self, default: Any) -> Any:
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Solo la caché local: para cachés sin backend usadas desde código síncrono."""
+        value = self._get_local(key)
+        return self._miss(default) if value is _MISSING else value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Solo la caché local. ttl opcional por entrada (nunca mayor que el TTL de la caché)."""
+        self._set_local(key, value, ttl)
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    async def aget(self, key: str, default: Any = None) -> Any:
+        """Como get(); en un fallo local consulta el backend compartido."""
+        value = self._get_local(key)
+        if value is not _MISSING:
+            return value
+
+        if self.backend is not None:
+            raw = await self.backend.get(self._key(key))
+            if raw is not None:
+                value = self._loads(raw)
+                self._set_local(key, value)
+                with self._lock:
+                    self.shared_hits += 1
+                return value
+        return self._miss(default)
+
+    async def aset(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Como set(), también en el backend compartido."""
+        self._set_local(key, value, ttl)
+        if self.backend is not None:
+            await self.backend.set(self._key(key), self._dumps(value), self.ttl if ttl is None else min(ttl, self.ttl))
+
+    async def ainvalidate(self, key: str) -> None:
+        self.invalidate(key)
+        if self.backend is not None:
+            await self.backend.delete(self._key(key))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.shared_hits) / lookups, 4) if lookups else 0.0,
+                "backend": type(self.backend).__name__ if self.backend else None,
+            }
+
+
+class VersionedCache:
+    """
+    Caché de un namespace (p. ej. una tabla de referencia) con versión.
+    Invalidar sube la versión: todas las claves anteriores (items y páginas)
+    quedan obsoletas de golpe. Con backend compartido la versión vive ahí y
+    cada worker la relee cada CACHE_LOCAL_TTL segundos.
+    Uso: version = await cache.version(); await cache.get(key, version); consulta;
+    await cache.set(key, fila, version).
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float, backend: Optional[CacheBackend] = None):
+        self.name = name
+        self.backend = backend
+        self._cache = TTLCache(
+            name, maxsize, ttl, backend=backend,
+            dumps=lambda value: dumps(value).decode("utf-8"),
+        )
+        self._version = 0
+        self._version_checked = 0.0
+        self.invalidations = 0
+        _caches[name] = self
+
+    def _version_key(self) -> str:
+        return f"{self.name}:version"
+
+    async def version(self) -> int:
+        if self.backend is None:
+            return self._version
+        now = time.monotonic()
+        if now - self._version_checked >= CACHE_LOCAL_TTL:
+            self._version = int(await self.backend.get(self._version_key()) or 0)
+            self._version_checked = now
+        return self._version
+
+    async def get(self, key: str, version: int, default: Any = None) -> Any:
+        return await self._cache.aget(f"v{version}:{key}", default)
+
+    async def set(self, key: str, value: Any, version: int) -> None:
+        """
+        `version` es la leída con version() ANTES de consultar la BD: si una escritura
+        invalida mientras tanto, la fila vieja queda bajo la versión ya obsoleta.
+        """
+        await self._cache.aset(f"v{version}:{key}", value)
+
+    async def invalidate(self) -> None:
+        if self.backend is not None:
+            self._version = await self.backend.incr(self._version_key())
+            self._version_checked = time.monotonic()
+        else:
+            self._version += 1
+        self.invalidations += 1
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return {**self._cache.stats(), "version": self._version, "invalidations": self.invalidations}
+
+
+def cache_stats() -> dict:
+    return {name: cache.stats() for name, cache in _caches.items()}
@@ -0,0 +1,114 @@
+# core/changes.py
+import heapq
+from datetime import datetime, timedelta
+from typing import Any, List, Optional, Sequence, Tuple
+
+from core.config import CHANGES_SAFETY_LAG_SECONDS
+from core.pagination import CURSOR_VALUE, decode_cursor, encode_cursor
+from database.dialect import dialect
+from database.queries import sql
+from deps.db import DBSession
+
+# (tabla, pk, columnas): el orden fija el desempate entre tablas con el mismo change_date
+Feed = Tuple[str, str, str]
+
+
+def operation(row) -> str:
+    if not row["is_active"]:
+        return "delete"  # soft delete (is_active = false)
+    return "update" if row["modify_date"] is not None else "insert"
+
+
+def _query(table: str, pk: str, columns: str, position: Optional[str]):
+    """
+    Siguientes filas de `table` en orden (change_date, pk) respecto al cursor:
+    position = "after" (tabla posterior en el desempate: change_date >= ts),
+    "before" (change_date > ts), "same" (mismo ts y pk mayor) o None (sin cursor).
+    """
+    cd = dialect.change_date
+    exact = dialect.exact_datetime(cd)
+    where = [f"{cd} <= :until"]
+    if position == "after":
+        where.append(f"{cd} >= :ts")
+    elif position == "before":
+        where.append(f"{cd} > :ts")
+    elif position == "same":
+        # Rango por change_date (seek en el índice) y desempate por pk
+        where.append(f"{cd} >= :ts AND ({cd} > :ts OR {pk} > :pk)")
+    return sql(f"""
+        SELECT {columns}, {cd} AS changed_at{f", {exact} AS {CURSOR_VALUE}" if exact else ""}
+        FROM {table}
+        WHERE {" AND ".join(where)}
+        ORDER BY {cd}, {pk}
+        {dialect.limit_offset(":size", "0")}
+    """)
+
+
+def _parse_since(since: Optional[str], scope: str) -> Tuple[Any, Optional[str], Any]:
+    """(ts, tabla, pk) del punto de partida: token de una respuesta anterior o fecha ISO."""
+    if not since:
+        return None, None, None
+    try:
+        return datetime.fromisoformat(since), None, None
+    except ValueError:
+        pass
+    ts, position = decode_cursor("changes", scope, since)
+    table, _, pk = str(position).partition(":")
+    # Las pk enteras (notes, roles, area) vuelven a int: PostgreSQL no compara INT con texto
+    return ts, table, int(pk) if pk.isdigit() else pk
+
+
+async def fetch_changes(
+    db: DBSession,
+    feeds: Sequence[Feed],
+    *,
+    since: Optional[str] = None,
+    limit: int = 500,
+) -> dict:
+    """
+    Inserciones, actualizaciones y soft deletes de `feeds` posteriores a `since`, en orden
+    (COALESCE(modify_date, create_date), tabla, pk). Una lectura keyset por tabla
+    (índices IX_<tabla>_change_date) y un merge de los resultados.
+    No devuelve cambios de los últimos CHANGES_SAFETY_LAG_SECONDS: una transacción más
+    lenta puede confirmar después un change_date anterior y el cursor ya lo habría pasado.
+    """
+    scope = ",".join(table for table, _, _ in feeds)
+    ts, cursor_table, cursor_pk = _parse_since(since, scope)
+    rank = {table: i for i, (table, _, _) in enumerate(feeds)}
+    cursor_rank = rank.get(cursor_table, -1)
+    # Reloj de la BD (el que llena modify_date/create_date), no el del worker; uno para
+    # todas las tablas: si cada consulta tuviera su límite, el merge saltaría filas
+    now = (await db.execute(sql(f"SELECT {dialect.now} AS now"))).scalar()
+    if isinstance(now, str):  # SQLite: texto
+        now = datetime.fromisoformat(now)
+    until = now - timedelta(seconds=CHANGES_SAFETY_LAG_SECONDS)
+    exact = dialect.exact_datetime(dialect.change_date) is not None
+
+    streams = []
+    for i, (table, pk, columns) in enumerate(feeds):
+        if ts is None:
+            position = None
+        elif i == cursor_rank:
+            position = "same"
+        else:
+            position = "after" if i > cursor_rank else "before"
+        params = {"until": until, "ts": ts, "pk": cursor_pk, "size": limit + 1}
+        rows = (await db.execute(_query(table, pk, columns, position), params)).mappings().all()
+        # Cada tabla ya viene ordenada por la BD (el orden del pk es el del motor). Merge y
+        # cursor con el valor exacto si el driver trunca la fecha (ver dialect.exact_datetime)
+        streams.append([(row[CURSOR_VALUE] if exact else row["changed_at"], i, table, pk, row) for row in rows])
+
+    merged = list(heapq.merge(*streams, key=lambda item: (item[0], item[1])))
+    has_more = len(merged) > limit
+    changes: List[dict] = []
+    for key, _, table, pk, row in merged[:limit]:
+        data = {k: v for k, v in row.items() if k not in ("changed_at", CURSOR_VALUE)}
+        changes.append({"table": table, "op": operation(row), "id": str(row[pk]), "changed_at": row["changed_at"], "row": data})
+
+    if changes:
+        last = changes[-1]
+        next_token = encode_cursor("changes", scope, key, f"{last['table']}:{last['id']}")
+    else:
+        # Sin cambios nuevos: el mismo punto de partida
+        next_token = since
+    return {"changes": changes, "next": next_token, "has_more": has_more}
@@ -0,0 +1,220 @@
+# core/compression.py
+import hashlib
+import zlib
+from typing import Dict, Iterable, Optional
+
+from fastapi import Request, Response
+
+from core.conditional import check_conditional
+from core.config import (
+    COMPRESSION_BROTLI_QUALITY,
+    COMPRESSION_ENCODINGS,
+    COMPRESSION_GZIP_LEVEL,
+    COMPRESSION_MIN_SIZE,
+    COMPRESSION_TYPES,
+)
+
+try:
+    import brotli  # pip install brotli (opcional, menos bytes y CPU que gzip en JSON)
+except ImportError:  # pragma: no cover - depende del entorno
+    brotli = None
+
+
+def available_encodings(preferred: Iterable[str]) -> list:
+    """Codificaciones configuradas que este proceso puede producir (br requiere `brotli`)."""
+    return [e for e in preferred if e == "gzip" or (e == "br" and brotli is not None)]
+
+
+def negotiate(accept_encoding: Optional[str], encodings: Iterable[str]) -> Optional[str]:
+    """
+    Primera codificación de `encodings` (orden de preferencia del servidor) que el
+    cliente acepta con q > 0 en Accept-Encoding; None = enviar sin comprimir.
+    """
+    if not accept_encoding:
+        return None
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip()] = q
+    wildcard = accepted.get("*", 0.0)
+    for encoding in encodings:
+        if accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return None
+
+
+class _Compressor:
+    """Compresor incremental: gzip (zlib con cabecera gzip) o br."""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+            self._zlib = None
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def chunk(self, data: bytes) -> bytes:
+        """Comprime y vacía lo pendiente, así cada bloque de un stream llega al cliente sin esperar al siguiente."""
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self._brotli is not None:
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._zlib.compress(data) + self._zlib.flush()
+
+
+def compress(data: bytes, encoding: str, gzip_level: int = COMPRESSION_GZIP_LEVEL,
+             brotli_quality: int = COMPRESSION_BROTLI_QUALITY) -> bytes:
+    return _Compressor(encoding, gzip_level, brotli_quality).finish(data)
+
+
+def _media_type(headers: list) -> str:
+    for key, value in headers:
+        if key == b"content-type":
+            return value.split(b";", 1)[0].strip().decode("latin-1").lower()
+    return ""
+
+
+class CompressionMiddleware:
+    """
+    Middleware ASGI (como MetricsMiddleware, sin BaseHTTPMiddleware) que comprime con
+    gzip o br según Accept-Encoding. No comprime:
+    - cuerpos completos menores a `minimum_size` (no compensa la CPU ni la cabecera)
+    - tipos fuera de `content_types` (p. ej. imágenes ya comprimidas)
+    - respuestas que ya traen Content-Encoding (como /openapi.json precomprimido)
+    - text/event-stream (GET /notes/events)
+    Los streams (exportaciones NDJSON/CSV) se comprimen bloque a bloque.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = COMPRESSION_MIN_SIZE,
+        content_types: Iterable[str] = COMPRESSION_TYPES,
+        encodings: Iterable[str] = COMPRESSION_ENCODINGS,
+        gzip_level: int = COMPRESSION_GZIP_LEVEL,
+        brotli_quality: int = COMPRESSION_BROTLI_QUALITY,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.content_types = frozenset(t.lower() for t in content_types)
+        self.encodings = available_encodings(encodings)
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _allowed(self, media_type: str) -> bool:
+        # SSE: conexiones largas y casi ociosas; un compresor por conexión (cientos de KB
+        # de ventana) cuesta más memoria de la que ahorra en eventos de unos cientos de bytes
+        if media_type == "text/event-stream":
+            return False
+        return media_type in self.content_types or (
+            media_type.partition("/")[0] + "/*" in self.content_types
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept = None
+        for key, value in scope["headers"]:
+            if key == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = negotiate(accept, self.encodings)
+
+        start_message = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                # Se retiene hasta ver el primer bloque del cuerpo (tamaño y si es stream)
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is not None:
+                data = compressor.chunk(body) if more_body else compressor.finish(body)
+                await send({"type": "http.response.body", "body": data, "more_body": more_body})
+                return
+
+            headers = list(start_message.get("headers", []))
+            eligible = (
+                start_message["status"] not in (204, 206, 304)
+                and not any(k == b"content-encoding" for k, _ in headers)
+                and self._allowed(_media_type(headers))
+            )
+            if eligible:
+                # La representación depende de Accept-Encoding aunque esta vez no se comprima
+                _add_vary(headers)
+            if not eligible or encoding is None or (not more_body and len(body) < self.minimum_size):
+                passthrough = True
+                await send({**start_message, "headers": headers})
+                await send(message)
+                return
+
+            compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+            headers = [(k, v) for k, v in headers if k != b"content-length"]
+            headers.append((b"content-encoding", encoding.encode("latin-1")))
+            if more_body:
+                data = compressor.chunk(body)
+            else:
+                data = compressor.finish(body)
+                headers.append((b"content-length", str(len(data)).encode("latin-1")))
+            await send({**start_message, "headers": headers})
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+def _add_vary(headers: list) -> None:
+    for i, (key, value) in enumerate(headers):
+        if key == b"vary":
+            if b"accept-encoding" not in value.lower():
+                headers[i] = (key, value + b", Accept-Encoding")
+            return
+    headers.append((b"vary", b"Accept-Encoding"))
+
+
+class PrecompressedDocument:
+    """
+    Cuerpo fijo (p. ej. el OpenAPI) serializado y comprimido una sola vez, al máximo
+    nivel porque el costo se paga al arrancar; cada request solo elige la variante.
+    """
+
+    def __init__(self, body: bytes, media_type: str = "application/json", encodings: Iterable[str] = COMPRESSION_ENCODINGS):
+        self.media_type = media_type
+        self.encodings = available_encodings(encodings)
+        self.variants = {"identity": body}
+        for encoding in self.encodings:
+            self.variants[encoding] = compress(body, encoding, gzip_level=9, brotli_quality=11)
+        self.etag = 'W/"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+
+    def sizes(self) -> dict:
+        return {encoding: len(data) for encoding, data in self.variants.items()}
+
+    def response(self, request: Request) -> Response:
+        headers = {"Vary": "Accept-Encoding"}
+        encoding = negotiate(request.headers.get("accept-encoding"), self.encodings)
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        response = Response(self.variants[encoding or "identity"], media_type=self.media_type, headers=headers)
+        not_modified = check_conditional(request, response, self.etag)
+        return not_modified or response
@@ -0,0 +1,83 @@
+# core/conditional.py
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Optional
+from zoneinfo import ZoneInfo
+
+from fastapi import Request, Response, status
+
+from core.config import DB_TIMEZONE
+from core.responses import dumps
+
+# Zona de las fechas sin zona que salen de la BD (None = la local del proceso)
+_DB_TZ = ZoneInfo(DB_TIMEZONE) if DB_TIMEZONE else None
+
+
+def row_version(row) -> Any:
+    """Versión de una fila: modify_date si fue modificada, si no create_date."""
+    return row.get("modify_date") or row.get("create_date")
+
+
+def make_etag(parts) -> str:
+    # ETag débil: depende de la versión de las filas, no de los bytes exactos
+    return 'W/"' + hashlib.sha1(dumps(parts)).hexdigest()[:20] + '"'
+
+
+def _as_datetime(value) -> Optional[datetime]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is None:
+        # Hora local de la BD → UTC (Last-Modified va en GMT)
+        value = value.replace(tzinfo=_DB_TZ) if _DB_TZ is not None else value.astimezone()
+    return value.astimezone(timezone.utc)
+
+
+def _weak(tag: str) -> str:
+    return tag.strip()[2:] if tag.strip().startswith("W/") else tag.strip()
+
+
+def check_conditional(request: Request, response: Response, etag: str, last_modified=None) -> Optional[Response]:
+    """
+    Pone ETag/Last-Modified en `response`. Si el cliente ya tiene esa versión
+    (If-None-Match / If-Modified-Since) devuelve un 304 listo para retornar,
+    así el handler no serializa el cuerpo.
+    """
+    response.headers["ETag"] = etag
+    modified = _as_datetime(last_modified)
+    if modified is not None:
+        response.headers["Last-Modified"] = format_datetime(modified, usegmt=True)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {_weak(t) for t in if_none_match.split(",")}
+        matched = "*" in tags or _weak(etag) in tags
+    else:
+        if_modified_since = request.headers.get("if-modified-since")
+        if not if_modified_since or modified is None:
+            return None
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return None
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        matched = modified.replace(microsecond=0) <= since
+
+    if not matched:
+        return None
+    headers = {k: v for k, v in response.headers.items() if k != "content-length"}
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+
+def check_row(request: Request, response: Response, table: str, pk: str, row) -> Optional[Response]:
+    """check_conditional para un GET por id."""
+    version = row_version(row)
+    return check_conditional(request, response, make_etag([table, row[pk], version]), version)
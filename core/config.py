@@ -5,6 +5,136 @@ SECRET_KEY = os.getenv("SECRET_KEY", "cambia-esto-en-produccion")
 ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
 
+# Acceso a BD: "sync" (pyodbc en threadpool) o "async" (AsyncEngine, sin bloquear el event loop)
+DB_MODE = os.getenv("DB_MODE", "sync").lower()
+
+# El dialecto SQL (SQL Server, PostgreSQL o SQLite) sale del esquema de la URL
+SQLSERVER_URL = os.getenv(
+    "SQLSERVER_URL",
+    "mssql+pyodbc://localhost?driver=ODBC+Driver+17+for+SQL+Server&trusted_connection=yes&database=P1SW"
+)
+# Driver async: aioodbc para SQL Server, asyncpg para PostgreSQL o sqlite+aiosqlite:///./p1sw.db
+ASYNC_SQLSERVER_URL = os.getenv(
+    "ASYNC_SQLSERVER_URL",
+    "mssql+aioodbc://localhost?driver=ODBC+Driver+17+for+SQL+Server&trusted_connection=yes&database=P1SW"
+)
+# Zona horaria de las fechas de la BD (SYSDATETIME()/LOCALTIMESTAMP guardan hora local sin zona),
+# p. ej. "America/Bogota"; vacío = la del proceso (BD en la misma zona que la app)
+DB_TIMEZONE = os.getenv("DB_TIMEZONE", "")
+
+# Réplica de solo lectura (opcional, mismo motor que SQLSERVER_URL): los GET se leen de ahí,
+# salvo durante REPLICA_READ_YOUR_WRITES_SECONDS tras una escritura del mismo cliente; si falla,
+# se vuelve al primario y se reintenta cada REPLICA_RETRY_SECONDS
+REPLICA_URL = os.getenv("REPLICA_URL", "")
+ASYNC_REPLICA_URL = os.getenv("ASYNC_REPLICA_URL", "")
+REPLICA_READ_YOUR_WRITES_SECONDS = float(os.getenv("REPLICA_READ_YOUR_WRITES_SECONDS", "5"))
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+
+# Pool de conexiones (ajustar con los tiempos de espera de /admin/pool)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # segundos; -1 = nunca
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+# Métricas por ruta en GET /metrics (Prometheus) y log de consultas lentas
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "500"))
+
+# Sentencias compiladas en caché (compiled cache de SQLAlchemy y registro de database/queries.py)
+DB_QUERY_CACHE_SIZE = int(os.getenv("DB_QUERY_CACHE_SIZE", "500"))
+
+# Cachés en proceso; CACHE_BACKEND_URL (memory:// o redis://...) las comparte entre workers
+CACHE_BACKEND_URL = os.getenv("CACHE_BACKEND_URL", "")
+CACHE_LOCAL_TTL = float(os.getenv("CACHE_LOCAL_TTL", "5"))
+# Backend en memoria (memory:// o idempotencia sin CACHE_BACKEND_URL): máximo de claves (LRU)
+# y cada cuánto se barren las expiradas
+CACHE_MEMORY_MAX_KEYS = int(os.getenv("CACHE_MEMORY_MAX_KEYS", "100000"))
+CACHE_MEMORY_SWEEP_SECONDS = float(os.getenv("CACHE_MEMORY_SWEEP_SECONDS", "60"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+# Datos de referencia (roles, áreas, materias): se invalidan al escribir
+REFERENCE_CACHE_TTL = float(os.getenv("REFERENCE_CACHE_TTL", "300"))
+REFERENCE_CACHE_SIZE = int(os.getenv("REFERENCE_CACHE_SIZE", "1000"))
+# Claims de JWT ya verificados (cada entrada vive hasta el exp del token)
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "10000"))
+
+# bcrypt: "thread" (bcrypt libera el GIL) o "process"; tareas pendientes por encima de
+# BCRYPT_WORKERS + BCRYPT_MAX_QUEUE se rechazan con 429
+BCRYPT_POOL_KIND = os.getenv("BCRYPT_POOL_KIND", "thread").lower()
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", str(max(2, (os.cpu_count() or 2) // 2))))
+BCRYPT_MAX_QUEUE = int(os.getenv("BCRYPT_MAX_QUEUE", "32"))
+
+# Carga masiva de notas (POST /notes/bulk)
+NOTES_BULK_MAX_ROWS = int(os.getenv("NOTES_BULK_MAX_ROWS", "5000"))
+NOTES_BULK_BATCH_SIZE = int(os.getenv("NOTES_BULK_BATCH_SIZE", "1000"))
+
+# Alta masiva de usuarios + login desde CSV (POST /users/import o python -m core.user_import):
+# filas por transacción (y por tanda de bcrypt en el pool de hashing)
+USER_IMPORT_BATCH_SIZE = int(os.getenv("USER_IMPORT_BATCH_SIZE", "500"))
+
+# Actualizaciones por lote (PATCH /<recurso>/batch): máximo de filas por petición.
+# Con Idempotency-Key la respuesta se guarda IDEMPOTENCY_TTL_SECONDS (compartida con CACHE_BACKEND_URL)
+BATCH_PATCH_MAX_ITEMS = int(os.getenv("BATCH_PATCH_MAX_ITEMS", "1000"))
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+
+# Feed de cambios (GET /changes): no se entregan cambios más recientes que este margen,
+# para no saltar transacciones que confirman tarde con un modify_date anterior
+CHANGES_SAFETY_LAG_SECONDS = float(os.getenv("CHANGES_SAFETY_LAG_SECONDS", "5"))
+CHANGES_MAX_LIMIT = int(os.getenv("CHANGES_MAX_LIMIT", "1000"))
+
+# Notas en vivo (GET /notes/events, Server-Sent Events). EVENTS_BACKEND_URL=redis://... reparte
+# los eventos entre workers (vacío o memory://: solo este proceso). Por conexión se guardan como
+# mucho EVENTS_QUEUE_SIZE eventos sin enviar; si se llena el cliente recibe "resync"
+EVENTS_BACKEND_URL = os.getenv("EVENTS_BACKEND_URL", "")
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+EVENTS_MAX_CONNECTIONS = int(os.getenv("EVENTS_MAX_CONNECTIONS", "10000"))
+# Rol que solo puede seguir sus propias notas (el resto puede seguir una materia con ?id_subj=)
+EVENTS_STUDENT_ROLE = os.getenv("EVENTS_STUDENT_ROLE", "Estudiante")
+
+# Límite de peticiones por cliente (sub del JWT o IP) con token bucket. "N/S" = ráfaga de N
+# peticiones que se recupera a N/S por segundo. RATE_LIMIT_ROUTES: presupuestos por
+# "MÉTODO /prefijo" (gana el prefijo más largo; * = cualquier método), el resto usa
+# RATE_LIMIT_DEFAULT. RATE_LIMIT_BACKEND_URL=redis://... comparte los buckets entre workers
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+RATE_LIMIT_DEFAULT = os.getenv("RATE_LIMIT_DEFAULT", "300/60")
+RATE_LIMIT_ROUTES = os.getenv("RATE_LIMIT_ROUTES", "POST /auth/token=10/60,POST /users/import=10/3600")
+RATE_LIMIT_BACKEND_URL = os.getenv("RATE_LIMIT_BACKEND_URL", "")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+RATE_LIMIT_EXEMPT_PATHS = [p.strip() for p in os.getenv("RATE_LIMIT_EXEMPT_PATHS", "/metrics").split(",") if p.strip()]
+# Requests en curso por worker; por encima → 503 + Retry-After en vez de esperar (hasta
+# DB_POOL_TIMEOUT) por una conexión del pool. 0 = sin tope. Las conexiones SSE no cuentan
+MAX_IN_FLIGHT = int(os.getenv("MAX_IN_FLIGHT", str(DB_POOL_SIZE + DB_MAX_OVERFLOW)))
+CONCURRENCY_EXEMPT_PATHS = [p.strip() for p in os.getenv("CONCURRENCY_EXEMPT_PATHS", "/notes/events,/metrics").split(",") if p.strip()]
+
+# Lecturas por lote (POST /<recurso>/batch-get): máximo de ids por petición
+BATCH_GET_MAX_IDS = int(os.getenv("BATCH_GET_MAX_IDS", "500"))
+
+# Exportaciones en streaming (filas por bloque leído de la BD)
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# Listados serializados directo desde la BD (orjson) sin validar fila a fila con Pydantic.
+# Las filas deben traer ya los tipos del schema (SQL Server/pyodbc lo cumple).
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "false").lower() in ("1", "true", "yes")
+
+# Resumen precalculado de promedios (tabla grade_summary), actualizado al escribir notas.
+# Al activarlo, reconstruirlo con: python -m migrate.database
+GRADE_SUMMARY_ENABLED = os.getenv("GRADE_SUMMARY_ENABLED", "false").lower() in ("1", "true", "yes")
+
+# Compresión de respuestas (gzip/br según Accept-Encoding); br requiere `pip install brotli`.
+# Solo cuerpos >= COMPRESSION_MIN_SIZE bytes y de los tipos listados ("text/*" cubre todo text/).
+# Niveles medidos con python -m benchmarks.bench_compression: en una página de 200 filas br 1
+# deja menos bytes que gzip 6 con ~1/5 de la CPU; subir la calidad de br casi no reduce bytes
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() in ("1", "true", "yes")
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_TYPES = [t.strip() for t in os.getenv(
+    "COMPRESSION_TYPES", "application/json,application/x-ndjson,text/*"
+).split(",") if t.strip()]
+COMPRESSION_ENCODINGS = [e.strip() for e in os.getenv("COMPRESSION_ENCODINGS", "br,gzip").split(",") if e.strip()]
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "1"))
+
 # CORS permitido SOLAMENTE para tu frontend
 CORS_ORIGINS = [
     "http://localhost:5500"
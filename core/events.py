@@ -0,0 +1,297 @@
+# core/events.py
+# Notas en vivo (GET /notes/events, Server-Sent Events). Los handlers de routers/notes
+# publican cada nota escrita en los temas "user:<id_user>" y "subject:<id_subj>"; cada
+# conexión abierta es una Subscription a uno de esos temas.
+#
+# Entre workers los eventos pasan por un PubSubBackend: LocalPubSub (un solo proceso y
+# pruebas) o RedisPubSub (EVENTS_BACKEND_URL=redis://...). Cada worker recibe todos los
+# eventos y los entrega solo a sus suscriptores locales (un dict por tema).
+import asyncio
+import logging
+from collections import deque
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Set
+
+from core.changes import operation
+from core.config import EVENTS_BACKEND_URL, EVENTS_QUEUE_SIZE
+from core.responses import dumps
+from schemas.notes import NoteOut
+
+logger = logging.getLogger("p1sw.events")
+
+# El cliente perdió eventos (cola llena o backend reconectado): debe volver a leer GET /notes/
+RESYNC = b"event: resync\ndata: {}\n\n"
+PING = b": ping\n\n"
+
+
+def _frame(event: str, payload: dict) -> bytes:
+    return b"event: " + event.encode("utf-8") + b"\ndata: " + dumps(payload) + b"\n\n"
+
+
+def _wake(waiter: asyncio.Future) -> None:
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class Subscription:
+    """
+    Una conexión SSE. En reposo solo ocupa este objeto y un deque vacío: el future
+    existe mientras espera y los eventos son los mismos bytes para todas las conexiones.
+    """
+
+    __slots__ = ("topics", "pending", "waiter", "max_pending", "dropped")
+
+    def __init__(self, topics: tuple, max_pending: int):
+        self.topics = topics
+        self.pending: deque = deque()
+        self.waiter: Optional[asyncio.Future] = None
+        self.max_pending = max_pending
+        self.dropped = 0
+
+    def push(self, frame: bytes) -> bool:
+        """Encola `frame`; si la cola está llena la descarta entera y deja solo RESYNC."""
+        overflow = len(self.pending) >= self.max_pending
+        if overflow:
+            self.dropped += len(self.pending)
+            self.pending.clear()
+            self.pending.append(RESYNC)
+        self.pending.append(frame)
+        if self.waiter is not None:
+            _wake(self.waiter)
+        return not overflow
+
+    async def next(self, timeout: float) -> List[bytes]:
+        """Eventos pendientes; lista vacía si pasaron `timeout` segundos sin ninguno."""
+        if not self.pending:
+            # Future + timer y no asyncio.wait_for: en 3.11 wait_for puede tragarse la
+            # cancelación (cliente desconectado) si el evento llega en el mismo ciclo
+            loop = asyncio.get_running_loop()
+            self.waiter = loop.create_future()
+            timer = loop.call_later(timeout, _wake, self.waiter)
+            try:
+                await self.waiter
+            finally:
+                timer.cancel()
+                self.waiter = None
+        frames = list(self.pending)
+        self.pending.clear()
+        return frames
+
+
+Deliver = Callable[[bytes], None]
+
+
+class PubSubBackend:
+    """
+    Transporte de eventos entre workers. `deliver` recibe cada mensaje publicado (también
+    los propios); `resync` se llama si el backend pudo perder mensajes (reconexión).
+    """
+
+    # True: los mensajes no salen del proceso (se puede omitir publicar si no hay suscriptores)
+    local = False
+
+    def bind(self, deliver: Deliver, resync: Callable[[], None]) -> None:
+        self.deliver = deliver
+        self.resync = resync
+
+    async def start(self) -> None:
+        pass
+
+    async def publish(self, message: bytes) -> None:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class LocalPubSub(PubSubBackend):
+    """Un solo proceso (y pruebas): entrega directa, sin red."""
+
+    local = True
+
+    async def publish(self, message: bytes) -> None:
+        self.deliver(message)
+
+
+class RedisPubSub(PubSubBackend):
+    """Un canal de Redis compartido por todos los workers."""
+
+    def __init__(self, url: str, channel: str = "p1sw:events"):
+        import redis.asyncio as redis  # pip install redis (opcional)
+
+        self._client = redis.Redis.from_url(url)
+        self.channel = channel
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def _listen(self) -> None:
+        connected_before = False
+        while True:
+            try:
+                pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+                await pubsub.subscribe(self.channel)
+                if connected_before:
+                    # Los eventos publicados mientras estuvo caída se perdieron
+                    self.resync()
+                connected_before = True
+                async for message in pubsub.listen():
+                    self.deliver(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("Suscripción a Redis caída (%s), reintentando", exc)
+                await asyncio.sleep(1)
+
+    async def publish(self, message: bytes) -> None:
+        await self._client.publish(self.channel, message)
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self._client.aclose()
+
+
+def events_backend() -> PubSubBackend:
+    """Según EVENTS_BACKEND_URL: vacío o memory:// → LocalPubSub; redis://... → RedisPubSub."""
+    if not EVENTS_BACKEND_URL or EVENTS_BACKEND_URL.startswith("memory://"):
+        return LocalPubSub()
+    return RedisPubSub(EVENTS_BACKEND_URL)
+
+
+class EventBroker:
+    """
+    Pub/sub en proceso por temas. Publicar serializa el evento una vez; entregarlo a N
+    conexiones es agregar la misma referencia a N deques (sin copias ni tareas por evento).
+    """
+
+    def __init__(self, backend: Optional[PubSubBackend] = None, queue_size: int = EVENTS_QUEUE_SIZE):
+        self.backend = backend or LocalPubSub()
+        self.backend.bind(self._deliver, self.resync_all)
+        self.queue_size = queue_size
+        self.topics: Dict[str, Set[Subscription]] = {}
+        self.connections = 0
+        self.published = 0
+        self.delivered = 0
+        self.overflows = 0
+        self.publish_errors = 0
+
+    def subscribe(self, topics: Iterable[str]) -> Subscription:
+        subscription = Subscription(tuple(topics), self.queue_size)
+        for topic in subscription.topics:
+            self.topics.setdefault(topic, set()).add(subscription)
+        self.connections += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        for topic in subscription.topics:
+            subscribers = self.topics.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.topics[topic]
+        self.connections -= 1
+
+    def listening(self, topics: Iterable[str]) -> bool:
+        """False si nadie puede recibir el evento (backend local y sin suscriptores en esos temas)."""
+        return not self.backend.local or any(t in self.topics for t in topics)
+
+    async def publish(self, topics: Iterable[str], event: str, payload: dict) -> None:
+        """
+        Publica después del commit. Un fallo del backend no falla la escritura: los
+        clientes que se pierdan el evento lo recuperan con GET /notes/ o /changes/.
+        """
+        topics = [t for t in topics if t]
+        if not self.listening(topics):
+            return
+        message = " ".join(topics).encode("utf-8") + b"\n" + _frame(event, payload)
+        try:
+            await self.backend.publish(message)
+            self.published += 1
+        except Exception as exc:
+            self.publish_errors += 1
+            logger.warning("No se pudo publicar el evento %s: %s", event, exc)
+
+    def _deliver(self, message: bytes) -> None:
+        header, _, frame = message.partition(b"\n")
+        seen: Set[Subscription] = set()
+        for topic in header.decode("utf-8").split():
+            for subscription in self.topics.get(topic, ()):
+                # Una conexión suscrita a dos temas del mismo evento lo recibe una vez
+                if subscription in seen:
+                    continue
+                seen.add(subscription)
+                if not subscription.push(frame):
+                    self.overflows += 1
+        self.delivered += len(seen)
+
+    def resync_all(self) -> None:
+        for subscribers in list(self.topics.values()):
+            for subscription in subscribers:
+                subscription.push(RESYNC)
+
+    async def start(self) -> None:
+        await self.backend.start()
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__,
+            "connections": self.connections,
+            "topics": len(self.topics),
+            "published": self.published,
+            "delivered": self.delivered,
+            "overflows": self.overflows,
+            "publish_errors": self.publish_errors,
+        }
+
+
+broker = EventBroker(events_backend())
+
+
+def user_topic(id_user) -> str:
+    # SQL Server devuelve los GUID en mayúsculas y UUID los formatea en minúsculas
+    return f"user:{str(id_user).lower()}"
+
+
+def subject_topic(id_subj) -> str:
+    return f"subject:{str(id_subj).lower()}"
+
+
+async def publish_notes(rows: Iterable) -> None:
+    """Filas de notes ya confirmadas (RETURNING/OUTPUT con NOTE_COLUMNS) → evento "note" por fila."""
+    for row in rows:
+        topics = (user_topic(row["id_user"]), subject_topic(row["id_subj"]))
+        if not broker.listening(topics):
+            continue
+        # Mismo JSON que GET /notes/{id}
+        note = NoteOut.model_validate(row).model_dump(mode="json")
+        await broker.publish(topics, "note", {"op": operation(row), "note": note})
+
+
+async def resync_notes(params: Iterable[dict]) -> None:
+    """Escrituras sin filas devueltas (POST /notes/bulk): un "resync" a los usuarios y materias afectados."""
+    topics = set()
+    for note in params:
+        topics.add(user_topic(note["id_user"]))
+        topics.add(subject_topic(note["id_subj"]))
+    await broker.publish(sorted(topics), "resync", {})
+
+
+async def stream(topics: Iterable[str], heartbeat: float) -> AsyncIterator[bytes]:
+    """
+    Cuerpo de la respuesta SSE: eventos en cuanto llegan y un comentario cada `heartbeat` s.
+    La suscripción se crea al empezar a enviar (si el cliente se va antes, no queda colgada).
+    """
+    subscription = broker.subscribe(topics)
+    try:
+        yield b"retry: 5000\n\n"
+        while True:
+            frames = await subscription.next(heartbeat)
+            yield b"".join(frames) if frames else PING
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,75 @@
+# core/export.py
+import csv
+import io
+from datetime import date, datetime
+from typing import List, Optional
+
+from fastapi.responses import StreamingResponse
+
+from core.config import EXPORT_BATCH_SIZE
+from core.responses import dumps
+from database.queries import sql
+from deps.db import open_db, stream_partitions
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def export_response(
+    *,
+    table: str,
+    columns: List[str],
+    pk: str,
+    fmt: str = "ndjson",
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+) -> StreamingResponse:
+    """
+    Exporta una tabla completa en NDJSON o CSV con memoria constante:
+    las filas se leen por bloques (cursor del servidor) y se escriben al vuelo.
+    date_from/date_to filtran por create_date (rango [desde, hasta)).
+    """
+    where, params = [], {}
+    if date_from is not None:
+        where.append("create_date >= :date_from")
+        params["date_from"] = date_from
+    if date_to is not None:
+        where.append("create_date < :date_to")
+        params["date_to"] = date_to
+    q = sql(f"""
+        SELECT {", ".join(columns)}
+        FROM {table}
+        {"WHERE " + " AND ".join(where) if where else ""}
+        ORDER BY {pk}
+    """)
+
+    async def body():
+        # Sesión propia: vive lo que dure el streaming, no el request
+        # Lectura larga: a la réplica si hay y está sana
+        async with open_db(replica=True) as db:
+            if fmt == "csv":
+                buf = io.StringIO()
+                writer = csv.writer(buf)
+                writer.writerow(columns)
+                yield buf.getvalue()
+            async for partition in stream_partitions(db, q, params, EXPORT_BATCH_SIZE):
+                if fmt == "csv":
+                    buf.seek(0)
+                    buf.truncate()
+                    writer.writerows([_csv_value(row[c]) for c in columns] for row in partition)
+                    yield buf.getvalue()
+                else:
+                    yield b"".join(dumps(dict(row)) + b"\n" for row in partition)
+
+    return StreamingResponse(
+        body(),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{table}.{fmt}"'},
+    )
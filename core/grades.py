@@ -0,0 +1,189 @@
+# core/grades.py
+from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Iterable, Optional
+
+from core.config import GRADE_SUMMARY_ENABLED
+from database.dialect import dialect
+from database.queries import sql
+from deps.db import DBSession
+
+# Agregado por (estudiante, área) de las notas activas. Es la misma forma que
+# la tabla grade_summary, así transcript y reporte leen de una u otra igual.
+GRADE_AGGREGATE = f"""
+    SELECT n.id_user, s.id_area,
+           COUNT(*) AS notes_count,
+           SUM(s.credits) AS credits,
+           SUM(n.grade) AS grade_sum,
+           SUM(n.grade * s.credits) AS weighted_sum
+    FROM notes n
+    INNER JOIN subjects s ON s.id_subj = n.id_subj
+    WHERE n.is_active = {dialect.true} {{where}}
+    GROUP BY n.id_user, s.id_area
+"""
+
+SUMMARY_COLUMNS = "id_user, id_area, notes_count, credits, grade_sum, weighted_sum"
+
+_CENT = Decimal("0.01")
+
+
+def _ratio(total, count) -> Optional[Decimal]:
+    if not count:
+        return None
+    return (Decimal(str(total)) / Decimal(count)).quantize(_CENT, rounding=ROUND_HALF_UP)
+
+
+def _averages(row) -> dict:
+    return {
+        "notes_count": int(row["notes_count"] or 0),
+        "credits": int(row["credits"] or 0),
+        "average": _ratio(row["grade_sum"] or 0, row["notes_count"]),
+        "weighted_average": _ratio(row["weighted_sum"] or 0, row["credits"]),
+    }
+
+
+def _totals(rows) -> dict:
+    # Los promedios globales salen de las sumas por área (no promedio de promedios)
+    return _averages({
+        "notes_count": sum(r["notes_count"] or 0 for r in rows),
+        "credits": sum(r["credits"] or 0 for r in rows),
+        "grade_sum": sum(Decimal(str(r["grade_sum"] or 0)) for r in rows),
+        "weighted_sum": sum(Decimal(str(r["weighted_sum"] or 0)) for r in rows),
+    })
+
+
+def _breakdown(row) -> dict:
+    return {"id_area": row["id_area"], "area_name": row["area_name"], **_averages(row)}
+
+
+async def transcript(db: DBSession, id_user: str) -> Optional[dict]:
+    """
+    Promedios de un estudiante (simple y ponderado por créditos), en total y por área,
+    en una sola consulta. None si el usuario no existe.
+    """
+    if GRADE_SUMMARY_ENABLED:
+        source = f"SELECT {SUMMARY_COLUMNS} FROM grade_summary WHERE id_user = :id_user"
+    else:
+        source = GRADE_AGGREGATE.format(where="AND n.id_user = :id_user")
+    q = sql(f"""
+        SELECT g.id_area, a.name AS area_name, g.notes_count, g.credits, g.grade_sum, g.weighted_sum
+        FROM ({source}) g
+        LEFT JOIN area a ON a.id_area = g.id_area
+        ORDER BY a.name
+    """)
+    rows = (await db.execute(q, {"id_user": id_user})).mappings().all()
+    if not rows:
+        # Sin notas: solo aquí distinguimos "no existe" de "aún sin notas"
+        exists = (await db.execute(
+            sql("SELECT 1 FROM users WHERE id_user = :id_user"), {"id_user": id_user}
+        )).first()
+        if not exists:
+            return None
+    return {"id_user": id_user, **_totals(rows), "areas": [_breakdown(r) for r in rows]}
+
+
+async def grade_report(
+    db: DBSession,
+    *,
+    id_area: Optional[int] = None,
+    id_role: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+) -> dict:
+    """
+    Reporte de cohorte: estudiantes, notas, créditos y promedios por área y en total.
+    Con el resumen activo se lee de grade_summary, salvo que se filtre por fecha
+    (el resumen no guarda fechas).
+    """
+    params = {}
+    if GRADE_SUMMARY_ENABLED and date_from is None and date_to is None:
+        source = f"SELECT {SUMMARY_COLUMNS} FROM grade_summary"
+    else:
+        where = []
+        if date_from is not None:
+            where.append("AND n.create_date >= :date_from")
+            params["date_from"] = date_from
+        if date_to is not None:
+            where.append("AND n.create_date < :date_to")
+            params["date_to"] = date_to
+        source = GRADE_AGGREGATE.format(where=" ".join(where))
+
+    where = []
+    if id_area is not None:
+        where.append("src.id_area = :id_area")
+        params["id_area"] = id_area
+    if id_role is not None:
+        where.append("src.id_user IN (SELECT id_user FROM users WHERE id_role = :id_role)")
+        params["id_role"] = id_role
+
+    # Una fila por área + una fila total (is_total = 1); los estudiantes distintos
+    # del total no se pueden sumar desde las áreas
+    q = sql(f"""
+        WITH g AS (
+            SELECT * FROM ({source}) src
+            {"WHERE " + " AND ".join(where) if where else ""}
+        )
+        SELECT 0 AS is_total, g.id_area, a.name AS area_name, COUNT(DISTINCT g.id_user) AS students,
+               SUM(g.notes_count) AS notes_count, SUM(g.credits) AS credits,
+               SUM(g.grade_sum) AS grade_sum, SUM(g.weighted_sum) AS weighted_sum
+        FROM g
+        LEFT JOIN area a ON a.id_area = g.id_area
+        GROUP BY g.id_area, a.name
+        UNION ALL
+        SELECT 1, NULL, NULL, COUNT(DISTINCT g.id_user),
+               SUM(g.notes_count), SUM(g.credits), SUM(g.grade_sum), SUM(g.weighted_sum)
+        FROM g
+        ORDER BY is_total, area_name
+    """)
+    rows = (await db.execute(q, params)).mappings().all()
+    total = next(r for r in rows if r["is_total"])
+    return {
+        "students": int(total["students"] or 0),
+        **_averages(total),
+        "areas": [
+            {**_breakdown(r), "students": int(r["students"])}
+            for r in rows if not r["is_total"]
+        ],
+    }
+
+
+async def refresh_grade_summary(
+    db: DBSession,
+    *,
+    id_users: Iterable[str] = (),
+    id_subj: Optional[str] = None,
+) -> None:
+    """
+    Recalcula grade_summary solo para los estudiantes afectados, dentro de la
+    transacción del que escribe (el commit lo hace el router). Sin resumen activo no hace nada.
+    Bloquea antes las filas de users de esos estudiantes: dos escrituras concurrentes del
+    mismo estudiante harían DELETE + INSERT a la vez y dejarían (id_user, id_area) duplicados;
+    así la segunda espera al commit de la primera y recalcula sobre sus notas.
+    - id_users: estudiantes cuyas notas cambiaron
+    - id_subj: materia cuyos créditos/área cambiaron (todos sus estudiantes)
+    """
+    if not GRADE_SUMMARY_ENABLED:
+        return
+
+    if id_subj is not None:
+        selection = "(SELECT id_user FROM notes WHERE id_subj = :id_subj)"
+        await _refresh(db, selection, {"id_subj": id_subj})
+
+    ids = sorted({str(i).lower() for i in id_users})
+    # SQL Server admite como máximo 2100 parámetros por sentencia
+    for i in range(0, len(ids), 1000):
+        await _refresh(db, ":ids", {"ids": ids[i:i + 1000]}, expanding=True)
+
+
+async def _refresh(db: DBSession, selection: str, params: dict, expanding: bool = False) -> None:
+    binds = ("ids",) if expanding else ()
+    lock = dialect.lock_rows("users", "id_user", f"id_user IN {selection}")
+    if lock is not None:
+        await db.execute(sql(lock, expanding=binds), params)
+    delete = sql(f"DELETE FROM grade_summary WHERE id_user IN {selection}", expanding=binds)
+    insert = sql(f"""
+        INSERT INTO grade_summary ({SUMMARY_COLUMNS})
+        {GRADE_AGGREGATE.format(where=f"AND n.id_user IN {selection}")}
+    """, expanding=binds)
+    await db.execute(delete, params)
+    await db.execute(insert, params)
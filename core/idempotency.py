@@ -0,0 +1,108 @@
+# core/idempotency.py
+import hashlib
+import json
+import threading
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi import HTTPException, Request, Response, status
+from pydantic import BaseModel
+
+from core.cache import CacheBackend, InMemoryBackend, shared_backend
+from core.config import IDEMPOTENCY_TTL_SECONDS
+from core.responses import dumps
+from deps.db import client_key
+
+# Una escritura en curso reserva la clave como mucho este tiempo (si el worker muere, se libera)
+PENDING_TTL = 60.0
+
+
+def _as_json(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    return json.loads(dumps(value))
+
+
+class IdempotencyStore:
+    """
+    Respuestas de escrituras con cabecera Idempotency-Key. La primera petición reserva
+    la clave (add atómico, también entre workers con CACHE_BACKEND_URL) y guarda su
+    respuesta; un reintento con la misma clave, cliente y ruta la recibe tal cual sin
+    volver a escribir (con Idempotent-Replayed: true).
+    - misma clave con otro cuerpo → 422
+    - la petición original sigue en curso → 409 + Retry-After
+    Si la escritura falla se libera la clave: el reintento se ejecuta de nuevo.
+    """
+
+    def __init__(self, ttl: float, backend: Optional[CacheBackend] = None):
+        self.ttl = ttl
+        self.backend = backend or InMemoryBackend()
+        self.stored = 0
+        self.replayed = 0
+        self.conflicts = 0
+        self._lock = threading.Lock()
+
+    def _count(self, field: str) -> None:
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    async def run(
+        self,
+        request: Request,
+        response: Response,
+        key: Optional[str],
+        payload: Any,
+        write: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        if not key:
+            return await write()
+
+        scope = f"idempotency:{client_key(request)}:{request.method}:{request.url.path}:{key}"
+        fingerprint = hashlib.sha256(dumps(_as_json(payload))).hexdigest()
+        reserved = await self.backend.add(scope, json.dumps({"fingerprint": fingerprint}), PENDING_TTL)
+        raw = None if reserved else await self.backend.get(scope)
+        if not reserved and raw is None:
+            # La clave expiró (o se liberó) entre add y get: no hay nada en curso, reintentar una vez
+            reserved = await self.backend.add(scope, json.dumps({"fingerprint": fingerprint}), PENDING_TTL)
+            raw = None if reserved else await self.backend.get(scope)
+        if not reserved:
+            record = json.loads(raw) if raw is not None else {}
+            if record.get("fingerprint", fingerprint) != fingerprint:
+                self._count("conflicts")
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail="Idempotency-Key ya usada con otro cuerpo",
+                )
+            if "body" not in record:
+                self._count("conflicts")
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Hay una petición en curso con esta Idempotency-Key",
+                    headers={"Retry-After": "1"},
+                )
+            self._count("replayed")
+            response.headers["Idempotent-Replayed"] = "true"
+            return record["body"]
+
+        try:
+            result = await write()
+        except BaseException:
+            await self.backend.delete(scope)
+            raise
+        body = _as_json(result)
+        await self.backend.set(scope, json.dumps({"fingerprint": fingerprint, "body": body}), self.ttl)
+        self._count("stored")
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "ttl": self.ttl,
+                "backend": type(self.backend).__name__,
+                "store": self.backend.stats(),
+                "stored": self.stored,
+                "replayed": self.replayed,
+                "conflicts": self.conflicts,
+            }
+
+
+idempotency = IdempotencyStore(IDEMPOTENCY_TTL_SECONDS, shared_backend())
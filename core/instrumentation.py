@@ -0,0 +1,231 @@
+# core/instrumentation.py
+import asyncio
+import functools
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+from core.cache import cache_stats
+from core.config import SLOW_QUERY_MS
+from core.metrics import Histogram, render_counter, render_gauge, render_histogram
+from database.pool import pool_metrics, pool_status
+
+logger = logging.getLogger("p1sw.sql")
+
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class RequestStats:
+    """Tiempos de un request en curso (se llenan desde los hooks de SQLAlchemy y la ruta)."""
+
+    __slots__ = ("db_time", "queries", "endpoint_done", "handler_done")
+
+    def __init__(self):
+        self.db_time = 0.0
+        self.queries = 0
+        self.endpoint_done: Optional[float] = None
+        self.handler_done: Optional[float] = None
+
+
+# Mutable y compartido con el threadpool (run_in_threadpool copia el contexto)
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+class RouteMetrics:
+    def __init__(self):
+        self.total = Histogram()
+        self.db = Histogram()
+        self.serialization = Histogram()
+        self.queries = Histogram(QUERY_COUNT_BUCKETS)
+
+
+class RequestMetrics:
+    """Histogramas por (método, ruta) y contadores por status."""
+
+    def __init__(self):
+        self._routes: Dict[Tuple[str, str], RouteMetrics] = {}
+        self._responses: Dict[Tuple[str, str, int], int] = {}
+        self.slow_queries = 0
+        self._lock = threading.Lock()
+
+    def route(self, method: str, path: str) -> RouteMetrics:
+        key = (method, path)
+        metrics = self._routes.get(key)
+        if metrics is None:
+            with self._lock:
+                metrics = self._routes.setdefault(key, RouteMetrics())
+        return metrics
+
+    def observe(self, scope, status_code: int, elapsed: float, stats: RequestStats) -> None:
+        route = scope.get("route")
+        # Solo la plantilla de la ruta (/users/{id_user}), nunca la URL: cardinalidad acotada
+        path = getattr(route, "path_format", None) or "unmatched"
+        metrics = self.route(scope["method"], path)
+        metrics.total.observe(elapsed)
+        metrics.db.observe(stats.db_time)
+        metrics.queries.observe(stats.queries)
+        if stats.endpoint_done is not None and stats.handler_done is not None:
+            metrics.serialization.observe(stats.handler_done - stats.endpoint_done)
+        key = (scope["method"], path, status_code)
+        with self._lock:
+            self._responses[key] = self._responses.get(key, 0) + 1
+
+    def incr_slow(self) -> None:
+        with self._lock:
+            self.slow_queries += 1
+
+    def render(self) -> list:
+        with self._lock:
+            routes = sorted(self._routes.items())
+            responses = sorted(self._responses.items())
+        labels = [({"method": m, "route": r}, metrics) for (m, r), metrics in routes]
+        lines = []
+        lines += render_counter(
+            "http_requests_total", "Requests por ruta y status",
+            [({"method": m, "route": r, "status": s}, n) for (m, r, s), n in responses],
+        )
+        lines += render_histogram(
+            "http_request_duration_seconds", "Latencia total del request",
+            [(l, metrics.total) for l, metrics in labels],
+        )
+        lines += render_histogram(
+            "http_request_db_seconds", "Tiempo en la BD por request",
+            [(l, metrics.db) for l, metrics in labels],
+        )
+        lines += render_histogram(
+            "http_response_serialization_seconds", "Validación/serialización de la respuesta",
+            [(l, metrics.serialization) for l, metrics in labels],
+        )
+        lines += render_histogram(
+            "http_request_db_queries", "Consultas a la BD por request",
+            [(l, metrics.queries) for l, metrics in labels],
+        )
+        lines += render_counter(
+            "db_slow_queries_total", f"Consultas de más de {SLOW_QUERY_MS:g} ms", [({}, self.slow_queries)],
+        )
+        return lines
+
+
+request_metrics = RequestMetrics()
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI (sin BaseHTTPMiddleware, que agrega una tarea por request).
+    Mide hasta el último byte de la respuesta, sin contar las background tasks.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        status_code = 500
+        recorded = False
+
+        async def send_timed(message):
+            nonlocal status_code, recorded
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body") and not recorded:
+                recorded = True
+                request_metrics.observe(scope, status_code, time.perf_counter() - start, stats)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        except Exception:
+            if not recorded:
+                request_metrics.observe(scope, 500, time.perf_counter() - start, stats)
+            raise
+        finally:
+            _current.reset(token)
+
+
+class TimedRoute(APIRoute):
+    """
+    APIRoute que marca cuándo termina el endpoint y cuándo termina el handler:
+    la diferencia es la validación con response_model + render del JSON.
+    """
+
+    def get_route_handler(self):
+        call = self.dependant.call
+        if asyncio.iscoroutinefunction(call):
+            @functools.wraps(call)
+            async def timed_call(*args, **kwargs):
+                try:
+                    return await call(*args, **kwargs)
+                finally:
+                    stats = _current.get()
+                    if stats is not None:
+                        stats.endpoint_done = time.perf_counter()
+
+            self.dependant.call = timed_call
+
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            response = await handler(request)
+            stats = _current.get()
+            if stats is not None:
+                stats.handler_done = time.perf_counter()
+            return response
+
+        return timed_handler
+
+
+def instrument_queries(engine) -> None:
+    """Hooks de SQLAlchemy: tiempo y número de consultas del request actual + log de lentas."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    slow = SLOW_QUERY_MS / 1000
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._query_start = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_query_start", None)
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        stats = _current.get()
+        if stats is not None:
+            stats.db_time += elapsed
+            stats.queries += 1
+        if elapsed >= slow:
+            request_metrics.incr_slow()
+            # Sin parámetros en el log (pueden llevar contraseñas/hashes)
+            logger.warning("Consulta lenta (%.1f ms): %s", elapsed * 1000, " ".join(statement.split())[:500])
+
+
+def render_metrics() -> str:
+    """Todas las métricas en formato de texto de Prometheus (GET /metrics)."""
+    lines = request_metrics.render()
+    pools = pool_status()
+    lines += render_gauge(
+        "db_pool_checked_out", "Conexiones en uso",
+        [({"pool": name}, status["checkedout"]) for name, status in pools.items() if "checkedout" in status],
+    )
+    lines += render_histogram(
+        "db_pool_wait_seconds", "Espera para obtener una conexión del pool",
+        [({"pool": name}, metrics.wait_time) for name, metrics in pool_metrics().items()],
+    )
+    lines += render_gauge(
+        "cache_hit_ratio", "Aciertos de las cachés en proceso",
+        [({"cache": name}, stats["hit_rate"]) for name, stats in cache_stats().items()],
+    )
+    return "\n".join(lines) + "\n"
+
@@ -0,0 +1,71 @@
+# core/metrics.py
+import threading
+from typing import Iterable, List
+
+# Buckets en segundos (de 1 ms a 10 s)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Histograma acumulado simple (estilo Prometheus), seguro entre hilos."""
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * len(self.buckets)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self._counts[i] += 1
+                    break
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            cumulative, acc = {}, 0
+            for bound, n in zip(self.buckets, self._counts):
+                acc += n
+                cumulative[str(bound)] = acc
+            cumulative["+Inf"] = self.count
+            return {"count": self.count, "sum": round(self.sum, 6), "buckets": cumulative}
+
+
+# --- Formato de texto de Prometheus ---
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def render_counter(name: str, help_text: str, series: Iterable) -> List[str]:
+    """series: [(labels, valor)]"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+    lines += [f"{name}{_labels(labels)} {value}" for labels, value in series]
+    return lines
+
+
+def render_gauge(name: str, help_text: str, series: Iterable) -> List[str]:
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    lines += [f"{name}{_labels(labels)} {value}" for labels, value in series]
+    return lines
+
+
+def render_histogram(name: str, help_text: str, series: Iterable) -> List[str]:
+    """series: [(labels, Histogram)]"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for labels, histogram in series:
+        snap = histogram.snapshot()
+        for bound, count in snap["buckets"].items():
+            lines.append(f"{name}_bucket{_labels({**labels, 'le': bound})} {count}")
+        lines.append(f"{name}_sum{_labels(labels)} {snap['sum']}")
+        lines.append(f"{name}_count{_labels(labels)} {snap['count']}")
+    return lines
@@ -0,0 +1,192 @@
+# core/pagination.py
+import base64
+import hashlib
+import hmac
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException, Request, Response, status
+
+from core.cache import VersionedCache
+from core.conditional import check_conditional, make_etag, row_version
+from core.config import SECRET_KEY, FAST_JSON_RESPONSES
+from core.responses import dumps, rows_response
+from database.dialect import dialect
+from database.queries import sql
+from deps.db import DBSession, is_replica
+
+# Header donde devolvemos el cursor de la siguiente página
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Órdenes datetime: el cursor lleva el valor exacto del motor (dialect.exact_datetime)
+DATETIME_SORT_KEYS = ("create_date", "modify_date")
+CURSOR_VALUE = "cursor_value"
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _sign(raw: bytes) -> str:
+    digest = hmac.new(SECRET_KEY.encode("utf-8"), raw, hashlib.sha256).digest()
+    return _b64(digest[:16])
+
+
+def _encode_value(value: Any) -> list:
+    # El cursor es JSON: guardamos el tipo para restaurarlo al decodificar
+    if isinstance(value, datetime):
+        return ["dt", value.isoformat()]
+    if isinstance(value, date):
+        return ["d", value.isoformat()]
+    if isinstance(value, Decimal):
+        return ["dec", str(value)]
+    if value is None or isinstance(value, (int, float, str)):
+        return ["v", value]
+    return ["v", str(value)]  # UUID, etc.
+
+
+def _decode_value(tagged: list) -> Any:
+    tag, value = tagged
+    if tag == "dt":
+        return datetime.fromisoformat(value)
+    if tag == "d":
+        return date.fromisoformat(value)
+    if tag == "dec":
+        return Decimal(value)
+    return value
+
+
+def encode_cursor(table: str, sort: str, sort_value: Any, pk: Any) -> str:
+    """
+    Genera un cursor opaco y firmado a partir de (valor del orden, pk).
+    Tabla y orden van dentro de la firma para que no se reutilice en otro listado.
+    """
+    payload = [table, sort, _encode_value(sort_value), _encode_value(pk)]
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return f"{_b64(raw)}.{_sign(raw)}"
+
+
+def decode_cursor(table: str, sort: str, cursor: str) -> Tuple[Any, Any]:
+    try:
+        body, sig = cursor.split(".", 1)
+        raw = base64.urlsafe_b64decode(body + "=" * (-len(body) % 4))
+        if not hmac.compare_digest(sig, _sign(raw)):
+            raise ValueError("firma")
+        cursor_table, cursor_sort, sort_value, pk = json.loads(raw)
+        if cursor_table != table or cursor_sort != sort:
+            raise ValueError("tabla/orden")
+        return _decode_value(sort_value), _decode_value(pk)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor inválido",
+        )
+
+
+async def fetch_page(
+    db: DBSession,
+    response: Response,
+    *,
+    table: str,
+    columns: str,
+    pk: str,
+    page: int,
+    size: int,
+    cursor: Optional[str] = None,
+    filters: Optional[Dict[str, Any]] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    sort: str = "-create_date",
+    sort_keys: Iterable[str] = ("create_date",),
+    cache: Optional[VersionedCache] = None,
+    request: Optional[Request] = None,
+    expand: Optional[Callable[[List[Any]], Awaitable[List[dict]]]] = None,
+):
+    """
+    Pagina por `sort` (p. ej. "-create_date" = DESC) y pk como desempate.
+    - Sin cursor: OFFSET clásico con page/size (compatibilidad).
+    - Con cursor: keyset, salta directo a la siguiente página sin recorrer las anteriores.
+    `filters` son igualdades columna = valor (None se ignora) y date_from/date_to
+    acotan create_date; solo se aceptan columnas/órdenes definidos por el router.
+    Si la página viene llena, devuelve el siguiente cursor en X-Next-Cursor (en los órdenes
+    por fecha, con el valor exacto de la BD: DATETIME2 tiene más precisión que datetime).
+    Con FAST_JSON_RESPONSES las filas se serializan directo (sin response_model).
+    Con `cache` (datos de referencia) la página y su cursor se guardan en caché.
+    Con `request` responde ETag/Last-Modified y 304 si el cliente ya tiene la página.
+    `expand` recibe las filas de la página y devuelve las filas con objetos embebidos
+    (las versiones de esos objetos también entran en el ETag).
+    """
+    sort_col = sort.lstrip("-")
+    if sort_col not in sort_keys:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Orden no permitido")
+    direction, op = ("DESC", "<") if sort.startswith("-") else ("ASC", ">")
+    exact = dialect.exact_datetime(sort_col) if sort_col in DATETIME_SORT_KEYS else None
+
+    where, params = [], {"size": size}
+    for column, value in (filters or {}).items():
+        if value is not None:
+            where.append(f"{column} = :f_{column}")
+            params[f"f_{column}"] = value
+    if date_from is not None:
+        where.append("create_date >= :date_from")
+        params["date_from"] = date_from
+    if date_to is not None:
+        where.append("create_date < :date_to")
+        params["date_to"] = date_to
+
+    if cursor:
+        c_val, c_pk = decode_cursor(table, sort, cursor)
+        where.append(f"({sort_col} {op} :c_val OR ({sort_col} = :c_val AND {pk} {op} :c_pk))")
+        params.update({"c_val": c_val, "c_pk": c_pk, "offset": 0})
+    else:
+        params["offset"] = (page - 1) * size
+
+    q = sql(f"""
+        SELECT {columns}{f", {exact} AS {CURSOR_VALUE}" if exact else ""}
+        FROM {table}
+        {"WHERE " + " AND ".join(where) if where else ""}
+        ORDER BY {sort_col} {direction}, {pk} {direction}
+        {dialect.limit_offset()}
+    """)
+
+    cached = None
+    if cache is not None:
+        cache_key = "page:" + hashlib.sha1(dumps([sort, sorted(params.items())])).hexdigest()
+        # Versión leída antes de la consulta (ver VersionedCache.set)
+        version = await cache.version()
+        cached = await cache.get(cache_key, version)
+
+    if cached is not None:
+        rows, next_cursor = cached["rows"], cached["next"]
+    else:
+        rows = (await db.execute(q, params)).mappings().all()
+        next_cursor = None
+        if len(rows) == size and rows[-1][sort_col] is not None:
+            last = rows[-1]
+            next_cursor = encode_cursor(table, sort, last[CURSOR_VALUE] if exact else last[sort_col], last[pk])
+        if exact:
+            rows = [{k: v for k, v in row.items() if k != CURSOR_VALUE} for row in rows]
+        if cache is not None and not is_replica(db):
+            await cache.set(cache_key, {"rows": [dict(row) for row in rows], "next": next_cursor}, version)
+
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    if expand is not None:
+        rows = await expand(rows)
+    if request is not None:
+        # ETag de la página = versiones de sus filas y embebidos (+ cursor); 304 sin serializar
+        versions = [
+            row_version(item)
+            for row in rows
+            for item in (row, *(v for v in row.values() if isinstance(v, dict)))
+        ]
+        etag = make_etag([table, [row[pk] for row in rows], versions, next_cursor])
+        last_modified = max((v for v in versions if v is not None), default=None, key=str)
+        not_modified = check_conditional(request, response, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+    if FAST_JSON_RESPONSES:
+        return rows_response(rows, response)
+    return rows
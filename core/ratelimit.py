@@ -0,0 +1,273 @@
+# core/ratelimit.py
+# Límites por cliente y por worker, antes de llegar a los routers:
+#   - token bucket por (presupuesto, cliente): cliente = sub del JWT o IP (client_key);
+#     presupuesto = el de la ruta en RATE_LIMIT_ROUTES o RATE_LIMIT_DEFAULT → 429
+#   - tope de requests en curso en el worker (MAX_IN_FLIGHT): por encima se responde
+#     503 en vez de hacer esperar a la request por una conexión del pool
+# Ambos con Retry-After. Los buckets viven en el worker o, con RATE_LIMIT_BACKEND_URL=redis://,
+# en Redis (compartidos entre workers; si Redis falla se deja pasar).
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+from core.config import (
+    CONCURRENCY_EXEMPT_PATHS, MAX_IN_FLIGHT, RATE_LIMIT_BACKEND_URL, RATE_LIMIT_DEFAULT,
+    RATE_LIMIT_EXEMPT_PATHS, RATE_LIMIT_MAX_KEYS, RATE_LIMIT_ROUTES,
+)
+from deps.db import client_key
+
+logger = logging.getLogger("p1sw.ratelimit")
+
+
+class Budget:
+    """Token bucket: ráfaga de `capacity` peticiones que se recupera a `rate` por segundo."""
+
+    __slots__ = ("name", "capacity", "rate")
+
+    def __init__(self, name: str, spec: str):
+        # "N/S": N peticiones cada S segundos
+        requests, _, seconds = spec.partition("/")
+        self.name = name
+        self.capacity = float(requests)
+        self.rate = self.capacity / float(seconds or 1)
+
+    def retry_after(self, tokens: float) -> int:
+        """Segundos hasta tener un token (para Retry-After)."""
+        return max(1, math.ceil((1 - tokens) / self.rate))
+
+
+def parse_routes(spec: str) -> List[Tuple[str, str, Budget]]:
+    """'POST /auth/token=10/60,...' → [(método, prefijo, Budget)], el prefijo más largo primero."""
+    routes = []
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        route, _, budget = item.strip().rpartition("=")
+        method, _, prefix = route.strip().partition(" ")
+        routes.append((method.upper(), prefix.strip(), Budget(route.strip(), budget.strip())))
+    return sorted(routes, key=lambda r: len(r[1]), reverse=True)
+
+
+class RateLimitBackend:
+    """Estado de los buckets. take() consume un token: (permitido, tokens que quedan)."""
+
+    async def take(self, key: str, budget: Budget) -> Tuple[bool, float]:
+        raise NotImplementedError
+
+    def size(self) -> Optional[int]:
+        return None
+
+    async def close(self) -> None:
+        pass
+
+
+class InMemoryRateLimit(RateLimitBackend):
+    """
+    Buckets del worker: [tokens, último acceso] por clave, LRU acotado a `max_keys`
+    (expulsar un bucket lo deja lleno de nuevo: solo pasa con clientes inactivos).
+    Se usa solo desde el event loop, sin lock.
+    """
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+
+    async def take(self, key: str, budget: Budget) -> Tuple[bool, float]:
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [budget.capacity, now]
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(budget.capacity, bucket[0] + (now - bucket[1]) * budget.rate)
+            bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return True, bucket[0]
+        return False, bucket[0]
+
+    def size(self) -> Optional[int]:
+        return len(self._buckets)
+
+
+# Recarga y consumo atómicos en Redis (hora del servidor de Redis: igual para todos los workers)
+_TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+  allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisRateLimit(RateLimitBackend):
+    """Buckets compartidos entre workers: un script Lua (una ida y vuelta) por request."""
+
+    def __init__(self, url: str, prefix: str = "p1sw:ratelimit:"):
+        import redis.asyncio as redis  # pip install redis (opcional)
+
+        self._client = redis.Redis.from_url(url)
+        self._take = self._client.register_script(_TAKE_SCRIPT)
+        self.prefix = prefix
+
+    async def take(self, key: str, budget: Budget) -> Tuple[bool, float]:
+        allowed, tokens = await self._take(keys=[self.prefix + key], args=[budget.capacity, budget.rate])
+        return bool(allowed), float(tokens)
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+def rate_limit_backend() -> RateLimitBackend:
+    """Según RATE_LIMIT_BACKEND_URL: vacío o memory:// → por worker; redis://... → RedisRateLimit."""
+    if not RATE_LIMIT_BACKEND_URL or RATE_LIMIT_BACKEND_URL.startswith("memory://"):
+        return InMemoryRateLimit()
+    return RedisRateLimit(RATE_LIMIT_BACKEND_URL)
+
+
+def _prefixes(paths: Iterable[str]) -> Tuple[str, ...]:
+    return tuple(p for p in paths if p)
+
+
+class RateLimiter:
+    """Presupuestos, backend y contadores; lo usa RateLimitMiddleware (uno por app)."""
+
+    def __init__(
+        self,
+        backend: Optional[RateLimitBackend] = None,
+        default: str = RATE_LIMIT_DEFAULT,
+        routes: str = RATE_LIMIT_ROUTES,
+        max_in_flight: int = MAX_IN_FLIGHT,
+        exempt: Iterable[str] = RATE_LIMIT_EXEMPT_PATHS,
+        concurrency_exempt: Iterable[str] = CONCURRENCY_EXEMPT_PATHS,
+    ):
+        self.backend = backend or InMemoryRateLimit()
+        self.default = Budget("default", default)
+        self.routes = parse_routes(routes)
+        self.max_in_flight = max_in_flight
+        self.exempt = _prefixes(exempt)
+        self.concurrency_exempt = _prefixes(concurrency_exempt)
+        self.in_flight = 0
+        self.max_seen = 0
+        self.allowed = 0
+        self.limited: Dict[str, int] = {}
+        self.shed = 0
+        self.backend_errors = 0
+
+    def budget(self, method: str, path: str) -> Budget:
+        for route_method, prefix, budget in self.routes:
+            if (route_method == method or route_method == "*") and path.startswith(prefix):
+                return budget
+        return self.default
+
+    async def check(self, scope) -> Optional[JSONResponse]:
+        """None si la request puede seguir; si no, la respuesta 429."""
+        path = scope["path"]
+        if scope["method"] == "OPTIONS" or path.startswith(self.exempt):
+            return None
+        budget = self.budget(scope["method"], path)
+        try:
+            allowed, tokens = await self.backend.take(f"{budget.name}:{client_key(Request(scope))}", budget)
+        except Exception as exc:
+            # Sin backend no se limita: mejor dejar pasar que tumbar la API con Redis
+            self.backend_errors += 1
+            logger.warning("Rate limit sin backend (%s), se deja pasar", exc)
+            return None
+        if allowed:
+            self.allowed += 1
+            return None
+        self.limited[budget.name] = self.limited.get(budget.name, 0) + 1
+        retry_after = budget.retry_after(tokens)
+        return JSONResponse(
+            {"detail": f"Demasiadas solicitudes, intenta de nuevo en {retry_after} s"},
+            status_code=429,
+            headers={
+                "Retry-After": str(retry_after),
+                "RateLimit-Limit": str(int(budget.capacity)),
+                "RateLimit-Remaining": "0",
+            },
+        )
+
+    def counts_in_flight(self, path: str) -> bool:
+        # Conexiones largas (SSE) no ocupan el pool mientras esperan: no cuentan para el tope
+        return self.max_in_flight > 0 and not path.startswith(self.concurrency_exempt)
+
+    def stats(self) -> dict:
+        return {
+            "backend": type(self.backend).__name__,
+            "keys": self.backend.size(),
+            "default": f"{int(self.default.capacity)}/{self.default.capacity / self.default.rate:g}s",
+            "routes": {
+                budget.name: f"{int(budget.capacity)}/{budget.capacity / budget.rate:g}s"
+                for _, _, budget in self.routes
+            },
+            "allowed": self.allowed,
+            "limited": dict(self.limited),
+            "backend_errors": self.backend_errors,
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "max_in_flight_seen": self.max_seen,
+            "shed": self.shed,
+        }
+
+
+_OVERLOADED = JSONResponse(
+    {"detail": "Servidor ocupado, intenta de nuevo"}, status_code=503, headers={"Retry-After": "1"},
+)
+
+rate_limiter = RateLimiter(rate_limit_backend())
+
+
+class RateLimitMiddleware:
+    """
+    Middleware ASGI (como MetricsMiddleware): bucket del cliente y luego tope de
+    concurrencia del worker. Las rechazadas no llegan a los routers ni a la BD.
+    """
+
+    def __init__(self, app, limiter: RateLimiter = rate_limiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limiter = self.limiter
+        rejected = await limiter.check(scope)
+        if rejected is not None:
+            await rejected(scope, receive, send)
+            return
+
+        if not limiter.counts_in_flight(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        # Comprobar e incrementar sin await de por medio: el tope no se puede pasar
+        if limiter.in_flight >= limiter.max_in_flight:
+            limiter.shed += 1
+            await _OVERLOADED(scope, receive, send)
+            return
+        limiter.in_flight += 1
+        limiter.max_seen = max(limiter.max_seen, limiter.in_flight)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.in_flight -= 1
@@ -0,0 +1,52 @@
+# core/responses.py
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Optional
+from uuid import UUID
+
+from fastapi import Response
+
+try:
+    import orjson  # pip install orjson (opcional, bastante más rápido)
+except ImportError:  # pragma: no cover - depende del entorno
+    orjson = None
+
+
+def json_default(value):
+    """Tipos que salen de la BD y json/orjson no saben serializar."""
+    if isinstance(value, Decimal):
+        return str(value)  # igual que Pydantic v2
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=json_default)
+    return json.dumps(content, default=json_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """
+    Respuesta JSON para filas de confianza (RowMapping/dict): se serializan
+    directo, sin pasar por response_model. El schema de OpenAPI no cambia.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, list):
+            content = [dict(row) for row in content]
+        return dumps(content)
+
+
+def rows_response(rows, response: Optional[Response] = None) -> FastJSONResponse:
+    # Si devolvemos un Response, FastAPI ignora los headers del parámetro `response`
+    headers = None
+    if response is not None:
+        headers = {k: v for k, v in response.headers.items() if k != "content-length"}
+    return FastJSONResponse(rows, headers=headers)
@@ -2,9 +2,20 @@
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 from jose import jwt  # pip install "python-jose[cryptography]"
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import asyncio
 import hashlib
+import threading
+import time
 
-from core.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from fastapi import HTTPException, status
+
+from core.cache import TTLCache
+from core.config import (
+    SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, JWT_CACHE_SIZE,
+    BCRYPT_POOL_KIND, BCRYPT_WORKERS, BCRYPT_MAX_QUEUE,
+)
+from core.metrics import Histogram
 
 # --- Passlib (bcrypt) + compatibilidad con hashes antiguos ---
 try:
@@ -64,6 +75,116 @@ except Exception:
         # No podemos mejorar sin passlib
         return False
 
+# --- Pool dedicado para bcrypt ---
+def _timed_call(fn, submitted_at: float, *args):
+    # time.time() y no perf_counter: debe ser comparable entre procesos
+    return time.time() - submitted_at, fn(*args)
+
+class HashingPool:
+    """
+    Ejecuta bcrypt (~250 ms de CPU) fuera del event loop con concurrencia acotada.
+    Si ya hay `workers + max_queue` tareas pendientes responde 429 en vez de
+    encolar, así una avalancha de logins no acapara la API.
+    """
+
+    def __init__(self, kind: str = "thread", workers: int = 4, max_queue: int = 32):
+        self.kind = kind
+        self.workers = workers
+        self.max_queue = max_queue
+        self.wait_time = Histogram()
+        self.in_flight = 0
+        self.max_queued = 0
+        self.completed = 0
+        self.rejected = 0
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> Executor:
+        # Se crea al primer uso para no lanzar procesos al importar
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def run(self, fn, *args):
+        with self._lock:
+            if self.in_flight >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Demasiados inicios de sesión simultáneos, intenta de nuevo",
+                    headers={"Retry-After": "1"},
+                )
+            self.in_flight += 1
+            self.max_queued = max(self.max_queued, self.in_flight - self.workers)
+
+        loop = asyncio.get_running_loop()
+        try:
+            waited, result = await loop.run_in_executor(
+                self._get_executor(), _timed_call, fn, time.time(), *args
+            )
+            self.wait_time.observe(max(waited, 0.0))
+            return result
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.completed += 1
+
+    async def map(self, fn, items: list) -> list:
+        """
+        Trabajo por lotes (importaciones): como máximo `workers` tareas a la vez y sin
+        rechazo por cola llena. Los logins siguen entrando a la cola y esperan como mucho
+        una tanda del lote, no el lote completo.
+        """
+        loop = asyncio.get_running_loop()
+        results = []
+        for i in range(0, len(items), self.workers):
+            window = items[i:i + self.workers]
+            with self._lock:
+                self.in_flight += len(window)
+            try:
+                done = await asyncio.gather(*(
+                    loop.run_in_executor(self._get_executor(), _timed_call, fn, time.time(), item)
+                    for item in window
+                ))
+            finally:
+                with self._lock:
+                    self.in_flight -= len(window)
+                    self.completed += len(window)
+            for waited, result in done:
+                self.wait_time.observe(max(waited, 0.0))
+                results.append(result)
+        return results
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "kind": self.kind,
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "in_flight": self.in_flight,
+                "queued": max(self.in_flight - self.workers, 0),
+                "max_queued": self.max_queued,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "wait_time": self.wait_time.snapshot(),
+            }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+hashing_pool = HashingPool(BCRYPT_POOL_KIND, BCRYPT_WORKERS, BCRYPT_MAX_QUEUE)
+
+async def verify_password_async(raw: str, stored: str) -> bool:
+    return await hashing_pool.run(verify_password, raw, stored)
+
+async def hash_password_async(raw: str) -> str:
+    return await hashing_pool.run(hash_password, raw)
+
 # --- JWT ---
 def create_access_token(data: dict, expires_minutes: Optional[int] = None) -> str:
     to_encode = data.copy()
@@ -73,6 +194,30 @@ def create_access_token(data: dict, expires_minutes: Optional[int] = None) -> st
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+# Caché de tokens ya verificados: clave = hash del token, valor = claims
+token_cache = TTLCache(
+    "jwt_claims",
+    maxsize=JWT_CACHE_SIZE,
+    ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+)
+
+def decode_token(token: str) -> dict:
+    """
+    jwt.decode con caché: el mismo token solo se verifica una vez hasta su exp.
+    Lanza JWTError igual que jwt.decode si el token no es válido.
+    """
+    key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    claims = token_cache.get(key)
+    if claims is not None:
+        return claims
+
+    claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    exp = claims.get("exp")
+    ttl = exp - time.time() if isinstance(exp, (int, float)) else None
+    if ttl is None or ttl > 0:
+        token_cache.set(key, claims, ttl)
+    return claims
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
@@ -82,7 +227,7 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
 
 def verificar_token(token: str = Depends(oauth2_scheme)):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         user_id: str = payload.get("sub")
         if not user_id:
             raise HTTPException(
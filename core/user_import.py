@@ -0,0 +1,215 @@
+# core/user_import.py
+# Alta masiva de usuarios + login desde CSV (semana de matrícula):
+#   name,last_name,id_role,birthdate,username,password
+# Las filas se leen por lotes de USER_IMPORT_BATCH_SIZE. Por lote: validación con
+# UserCreate/LoginCreate, un solo SELECT para usernames existentes y otro para roles,
+# bcrypt en paralelo (solo para las filas nuevas) e INSERT de users + login en una
+# transacción. Cada lote confirmado emite una línea de progreso con `resume_from`.
+#
+# Reanudar: volver a enviar el archivo con start_row=<resume_from>. Un username que ya
+# existe se reporta como "exists" y no se vuelve a crear, así que repetir filas es seguro.
+import argparse
+import asyncio
+import csv
+import io
+import uuid
+from itertools import islice
+from typing import AsyncIterator, Iterator, List
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+
+from core.config import USER_IMPORT_BATCH_SIZE
+from core.responses import dumps
+from core.security import hash_password, hashing_pool
+from database.dialect import dialect
+from database.queries import sql
+from deps.db import DBSession, open_db
+from schemas.login import LoginCreate
+from schemas.users import UserCreate
+
+COLUMNS = ["name", "last_name", "id_role", "birthdate", "username", "password"]
+
+# id_user se genera aquí (no con NEWID) para enlazar el login sin leer de vuelta cada fila
+INSERT_USERS = sql(f"""
+    INSERT INTO users (id_user, name, last_name, id_role, birthdate, id_user_create)
+    VALUES (:id_user, :name, :last_name, :id_role, :birthdate, {dialect.new_id})
+""")
+INSERT_LOGINS = sql(f"""
+    INSERT INTO login (username, password_hash, id_user, id_user_create)
+    VALUES (:username, :password_hash, :id_user, {dialect.new_id})
+""")
+EXISTING_USERNAMES = sql("SELECT username FROM login WHERE username IN :names", expanding=("names",))
+EXISTING_ROLES = sql("SELECT id FROM roles WHERE id IN :ids", expanding=("ids",))
+
+
+def _errors(e: ValidationError) -> list:
+    return [{"loc": list(err["loc"]), "msg": err["msg"]} for err in e.errors()]
+
+
+def _read_batch(rows: Iterator[dict], size: int) -> list:
+    return list(islice(rows, size))
+
+
+def _validate(raw: dict):
+    """(user, login) validados o la lista de errores de la fila."""
+    errors = []
+    missing = [c for c in COLUMNS if raw.get(c) in (None, "")]
+    if missing:
+        return [{"loc": [c], "msg": "Campo requerido"} for c in missing]
+    try:
+        user = UserCreate.model_validate({c: raw[c] for c in ("name", "last_name", "id_role", "birthdate")})
+    except ValidationError as e:
+        user = None
+        errors += _errors(e)
+    id_user = str(uuid.uuid4())
+    try:
+        login = LoginCreate.model_validate({"username": raw["username"], "password": raw["password"], "id_user": id_user})
+    except ValidationError as e:
+        login = None
+        errors += _errors(e)
+    return errors or (user, login)
+
+
+async def _import_batch(db: DBSession, first_row: int, raws: List[dict]) -> dict:
+    report = {"first_row": first_row, "last_row": first_row + len(raws) - 1,
+              "created": 0, "exists": 0, "failed": 0, "errors": []}
+
+    def fail(number, errors):
+        report["failed"] += 1
+        report["errors"].append({"row": number, "errors": errors})
+
+    # 1) Validación de esquema y usernames repetidos dentro del lote
+    candidates, seen = [], set()
+    for number, raw in enumerate(raws, start=first_row):
+        result = _validate(raw)
+        if isinstance(result, list):
+            fail(number, result)
+            continue
+        user, login = result
+        key = login.username.lower()  # SQL Server compara sin distinguir mayúsculas
+        if key in seen:
+            fail(number, [{"loc": ["username"], "msg": "Username repetido en el archivo"}])
+            continue
+        seen.add(key)
+        candidates.append((number, user, login))
+
+    # 2) Usernames y roles existentes: una consulta por conjunto
+    existing, roles = set(), set()
+    if candidates:
+        names = [login.username for _, _, login in candidates]
+        existing = {str(u).lower() for u in (await db.execute(EXISTING_USERNAMES, {"names": names})).scalars()}
+        role_ids = sorted({user.id_role for _, user, _ in candidates})
+        roles = set((await db.execute(EXISTING_ROLES, {"ids": role_ids})).scalars())
+    valid = []
+    for number, user, login in candidates:
+        if login.username.lower() in existing:
+            report["exists"] += 1
+        elif user.id_role not in roles:
+            fail(number, [{"loc": ["id_role"], "msg": "Rol no encontrado"}])
+        else:
+            valid.append((user, login))
+
+    # 3) bcrypt en paralelo solo para lo que se va a insertar
+    if valid:
+        hashes = await hashing_pool.map(hash_password, [login.password for _, login in valid])
+        users = [
+            {"id_user": str(login.id_user), "name": user.name, "last_name": user.last_name,
+             "id_role": user.id_role, "birthdate": user.birthdate}
+            for user, login in valid
+        ]
+        logins = [
+            {"username": login.username, "password_hash": password_hash, "id_user": str(login.id_user)}
+            for (_, login), password_hash in zip(valid, hashes)
+        ]
+        # 4) users + login del lote en una transacción (executemany)
+        try:
+            await db.execute(INSERT_USERS, users)
+            await db.execute(INSERT_LOGINS, logins)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        report["created"] = len(valid)
+    report["errors"].sort(key=lambda e: e["row"])
+    return report
+
+
+async def import_users(
+    rows: Iterator[dict], start_row: int = 1, batch_size: int = USER_IMPORT_BATCH_SIZE,
+) -> AsyncIterator[dict]:
+    """
+    Importa `rows` (dicts por columna, p. ej. csv.DictReader) desde la fila `start_row`
+    (1 = primera fila de datos). Emite un dict de progreso por lote confirmado y uno final;
+    si un lote falla en la BD, emite el error y se detiene (resume_from = ese lote).
+    """
+    totals = {"created": 0, "exists": 0, "failed": 0}
+    number = 1
+    # Filas ya importadas en una corrida anterior
+    while number < start_row:
+        skipped = len(await run_in_threadpool(_read_batch, rows, min(batch_size, start_row - number)))
+        if not skipped:
+            break
+        number += skipped
+
+    async with open_db() as db:
+        while True:
+            # La lectura puede tocar disco (archivo subido o CLI): fuera del event loop
+            raws = await run_in_threadpool(_read_batch, rows, batch_size)
+            if not raws:
+                break
+            try:
+                report = await _import_batch(db, number, raws)
+            except Exception as exc:
+                yield {"error": f"{type(exc).__name__}: {(str(exc).splitlines() or [''])[0][:200]}",
+                       "first_row": number, "resume_from": number, **totals}
+                return
+            number += len(raws)
+            for key in totals:
+                totals[key] += report[key]
+            yield {**report, "resume_from": number}
+    yield {"done": True, "rows": number - 1, "resume_from": number, **totals}
+
+
+def _csv_rows(stream) -> Iterator[dict]:
+    # utf-8-sig: Excel guarda el CSV con BOM
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    reader = csv.DictReader(text)
+    missing = [c for c in COLUMNS if c not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f"Faltan columnas en el CSV: {', '.join(missing)}")
+    return iter(reader)
+
+
+def import_response(upload: UploadFile, start_row: int = 1) -> StreamingResponse:
+    """
+    Progreso en NDJSON (una línea por lote). El archivo subido ya está en disco
+    (SpooledTemporaryFile) y se lee por lotes mientras se responde.
+    """
+    try:
+        rows = _csv_rows(upload.file)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def body():
+        async for report in import_users(rows, start_row):
+            yield dumps(report) + b"\n"
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+
+async def _main(path: str, start_row: int, batch_size: int) -> None:
+    with open(path, "rb") as stream:
+        async for report in import_users(_csv_rows(stream), start_row, batch_size):
+            print(dumps(report).decode("utf-8"), flush=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Alta masiva de usuarios + login desde CSV")
+    parser.add_argument("path", help=f"CSV con columnas {','.join(COLUMNS)}")
+    parser.add_argument("--start-row", type=int, default=1, help="resume_from de una corrida anterior")
+    parser.add_argument("--batch-size", type=int, default=USER_IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+    asyncio.run(_main(args.path, args.start_row, args.batch_size))
@@ -1,26 +1,72 @@
 # database/connection.py
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker, declarative_base
-import os
 
-SQLSERVER_URL = os.getenv(
-    "SQLSERVER_URL",
-    "mssql+pyodbc://localhost?driver=ODBC+Driver+17+for+SQL+Server&trusted_connection=yes&database=P1SW"
+from core.config import (
+    ASYNC_REPLICA_URL, ASYNC_SQLSERVER_URL, DB_MODE, DB_QUERY_CACHE_SIZE, METRICS_ENABLED, REPLICA_URL, SQLSERVER_URL,
 )
+from core.instrumentation import instrument_queries
+from database.dialect import dialect
+from database.pool import pool_kwargs, instrument_engine
+from database.queries import instrument_compiled_cache
 
-engine = create_engine(SQLSERVER_URL, future=True)
+def _create_engine(url: str, name: str, is_async: bool = False):
+    """Engine sync/async con pool, dialecto e instrumentación (pool, compiled cache, métricas)."""
+    if is_async:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        new_engine = create_async_engine(
+            url, query_cache_size=DB_QUERY_CACHE_SIZE, **pool_kwargs(url, is_async=True)
+        )
+    else:
+        # fast_executemany: pyodbc manda los executemany (cargas masivas) en un solo viaje
+        engine_kwargs = {"fast_executemany": True} if url.startswith("mssql+pyodbc") else {}
+        new_engine = create_engine(
+            url, future=True, query_cache_size=DB_QUERY_CACHE_SIZE, **engine_kwargs, **pool_kwargs(url)
+        )
+    dialect.configure(new_engine)
+    instrument_engine(new_engine, name)
+    instrument_compiled_cache(new_engine, name)
+    if METRICS_ENABLED:
+        instrument_queries(new_engine)
+    return new_engine
+
+
+engine = _create_engine(SQLSERVER_URL, "primary")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, future=True)
 Base = declarative_base()
 
+# Réplica de solo lectura (opcional): deps/db.py le envía los GET
+replica_engine = None
+ReplicaSessionLocal = None
+if REPLICA_URL:
+    replica_engine = _create_engine(REPLICA_URL, "replica")
+    ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine, future=True)
+
+# Solo creamos el engine async si se pidió (así aioodbc no es obligatorio en modo sync)
+async_engine = None
+AsyncSessionLocal = None
+async_replica_engine = None
+AsyncReplicaSessionLocal = None
+if DB_MODE == "async":
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    async_engine = _create_engine(ASYNC_SQLSERVER_URL, "async", is_async=True)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    if ASYNC_REPLICA_URL:
+        async_replica_engine = _create_engine(ASYNC_REPLICA_URL, "async_replica", is_async=True)
+        AsyncReplicaSessionLocal = async_sessionmaker(async_replica_engine, autoflush=False, expire_on_commit=False)
+
 class DBExecutor:
     def __init__(self, engine):
         self.engine = engine
 
-    def execute_non_query(self, query: str):
+    def execute_non_query(self, *queries: str):
+        # Varias sentencias = una transacción (SQLite no acepta lotes separados por ;)
         with self.engine.connect() as conn:
-            conn.execute(text(query))
+            for query in queries:
+                conn.execute(text(query))
             conn.commit()
 
 # Instancia global para usar en migrate
 db = DBExecutor(engine)
-
@@ -0,0 +1,252 @@
+# database/dialect.py
+# Fragmentos SQL que cambian entre motores. Los routers arman sus sentencias con
+# `dialect` (elegido por el esquema de SQLSERVER_URL) en vez de T-SQL fijo:
+#
+#   INSERT INTO roles (name, id_user_create)
+#   {dialect.output(cols)}              -- SQL Server: OUTPUT INSERTED.x, ...
+#   VALUES (:name, {dialect.new_id})
+#   {dialect.returning(cols)}           -- PostgreSQL/SQLite: RETURNING x, ...
+#
+# Como el texto final pasa por database/queries.py, se arma una sola vez por sentencia.
+from decimal import Decimal
+from typing import Iterable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+from core.config import SQLSERVER_URL
+
+
+def _columns(columns: str) -> list:
+    return [c.strip() for c in columns.split(",") if c.strip()]
+
+
+class Dialect:
+    """SQL Server (T-SQL), el motor de producción."""
+
+    name = "mssql"
+    now = "SYSDATETIME()"
+    new_id = "NEWID()"
+    true = "1"
+    false = "0"
+
+    # Tipos para el DDL de migrate/database.py
+    types = {
+        "identity": "INT IDENTITY(1,1) PRIMARY KEY",
+        "uuid": "UNIQUEIDENTIFIER",
+        "text": "NVARCHAR",
+        "datetime": "DATETIME2",
+        "bool": "BIT",
+    }
+
+    # Momento del último cambio de una fila (feed de cambios): columna calculada e indexada
+    change_date = "change_date"
+
+    def output(self, columns: str) -> str:
+        """Columnas devueltas por INSERT/UPDATE, entre la lista de columnas (o SET) y VALUES (o WHERE)."""
+        return "OUTPUT " + ", ".join(f"INSERTED.{c}" for c in _columns(columns))
+
+    def returning(self, columns: str) -> str:
+        """Columnas devueltas por INSERT/UPDATE, al final de la sentencia."""
+        return ""
+
+    def limit_offset(self, limit: str = ":size", offset: str = ":offset") -> str:
+        # Requiere ORDER BY (siempre lo hay en fetch_page)
+        return f"OFFSET {offset} ROWS FETCH NEXT {limit} ROWS ONLY"
+
+    def exact_datetime(self, column: str) -> Optional[str]:
+        """
+        Texto con la precisión completa de una columna datetime, para cursores keyset
+        (None si el driver ya la devuelve completa). DATETIME2 guarda 100 ns y pyodbc la
+        trae en microsegundos; comparada con la columna, el servidor convierte el texto a DATETIME2.
+        """
+        return f"CONVERT(VARCHAR(27), {column}, 121)"
+
+    def lock_rows(self, table: str, key: str, where: str) -> Optional[str]:
+        """
+        SELECT que bloquea hasta el fin de la transacción las filas de `table` que cumplen
+        `where` frente a otro lock_rows (no frente a lecturas ni a las FK). None si no hace falta.
+        """
+        # UPDLOCK es compatible con los S de lecturas y FK, incompatible con otro UPDLOCK
+        return f"SELECT {key} FROM {table} WITH (UPDLOCK, ROWLOCK) WHERE {where} ORDER BY {key}"
+
+    # --- DDL ---
+    def create_table(self, table: str, body: str) -> str:
+        return f"""
+        IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='{table}' AND xtype='U')
+        BEGIN
+            CREATE TABLE {table} ({body})
+        END
+        """
+
+    def create_index(
+        self, table: str, name: str, columns: str, include: Optional[Iterable[str]] = None, clustered: bool = False,
+    ) -> str:
+        kind = "CLUSTERED" if clustered else "NONCLUSTERED"
+        included = f" INCLUDE ({', '.join(include)})" if include else ""
+        return f"""
+        IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name='{name}' AND object_id = OBJECT_ID('{table}'))
+        BEGIN
+            CREATE {kind} INDEX {name} ON {table} ({columns}){included}
+        END
+        """
+
+    def change_date_column(self, table: str) -> Optional[str]:
+        """DDL que hace indexable `change_date` en `table` (None si basta un índice por expresión)."""
+        return f"""
+        IF COL_LENGTH('{table}', 'change_date') IS NULL
+            ALTER TABLE {table} ADD change_date AS COALESCE(modify_date, create_date) PERSISTED
+        """
+
+    # --- Staging de lotes (UPDATE ... FROM) ---
+    def temp_table(self, name: str) -> str:
+        """Nombre con el que se referencia una tabla temporal de la conexión."""
+        return f"#{name}"
+
+    def create_temp_table(self, name: str, body: str) -> str:
+        return f"CREATE TABLE #{name} ({body})"
+
+    def drop_temp_table(self, name: str) -> str:
+        # Las conexiones vuelven al pool: una tabla de un request fallido puede seguir ahí
+        return f"IF OBJECT_ID('tempdb..#{name}') IS NOT NULL DROP TABLE #{name}"
+
+    def update_from(self, table: str, sets: str, source: str, on: str, returning: str) -> str:
+        """UPDATE de `table` con los valores de `source` (JOIN por `on`) devolviendo `returning`."""
+        return f"""
+        UPDATE {table} SET {sets}
+        {self.output(returning)}
+        FROM {table} INNER JOIN {source} ON {on}
+        """
+
+    def configure(self, engine) -> None:
+        """Ajustes por conexión del motor (nada en SQL Server)."""
+
+
+class PostgresDialect(Dialect):
+    name = "postgresql"
+    # Hora local sin zona, como DATETIME2 + SYSDATETIME()
+    now = "LOCALTIMESTAMP"
+    new_id = "gen_random_uuid()"  # PostgreSQL 13+
+    true = "TRUE"
+    false = "FALSE"
+    # Índice por expresión (la consulta debe usar el mismo texto para aprovecharlo)
+    change_date = "(COALESCE(modify_date, create_date))"
+    types = {
+        "identity": "INT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY",
+        "uuid": "UUID",
+        "text": "VARCHAR",
+        "datetime": "TIMESTAMP",
+        "bool": "BOOLEAN",
+    }
+
+    def output(self, columns: str) -> str:
+        return ""
+
+    def returning(self, columns: str) -> str:
+        return "RETURNING " + ", ".join(_columns(columns))
+
+    def limit_offset(self, limit: str = ":size", offset: str = ":offset") -> str:
+        return f"LIMIT {limit} OFFSET {offset}"
+
+    def exact_datetime(self, column: str) -> Optional[str]:
+        # TIMESTAMP (microsegundos) llega completo; en SQLite es texto
+        return None
+
+    def lock_rows(self, table: str, key: str, where: str) -> Optional[str]:
+        # NO KEY UPDATE: no choca con el KEY SHARE de las FK (INSERT en notes)
+        return f"SELECT {key} FROM {table} WHERE {where} ORDER BY {key} FOR NO KEY UPDATE"
+
+    def create_table(self, table: str, body: str) -> str:
+        return f"CREATE TABLE IF NOT EXISTS {table} ({body})"
+
+    def create_index(
+        self, table: str, name: str, columns: str, include: Optional[Iterable[str]] = None, clustered: bool = False,
+    ) -> str:
+        # Sin índices clustered: un índice normal cubre lo mismo para las búsquedas por id_user
+        included = f" INCLUDE ({', '.join(include)})" if include else ""
+        return f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns}){included}"
+
+    def change_date_column(self, table: str) -> Optional[str]:
+        return None
+
+    def temp_table(self, name: str) -> str:
+        return name
+
+    def create_temp_table(self, name: str, body: str) -> str:
+        return f"CREATE TEMP TABLE {name} ({body})"
+
+    def drop_temp_table(self, name: str) -> str:
+        return f"DROP TABLE IF EXISTS {name}"
+
+    def update_from(self, table: str, sets: str, source: str, on: str, returning: str) -> str:
+        # Columnas calificadas: la tabla de origen tiene los mismos nombres
+        qualified = ", ".join(f"{table}.{c}" for c in _columns(returning))
+        return f"""
+        UPDATE {table} SET {sets}
+        FROM {source} WHERE {on}
+        RETURNING {qualified}
+        """
+
+
+class SQLiteDialect(PostgresDialect):
+    """SQLite 3.35+ (RETURNING): pruebas locales y benchmarks sin servidor."""
+
+    name = "sqlite"
+    # Mismo formato que DATETIME2 con milisegundos (ordena bien como texto)
+    now = "strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')"
+    # UUID v4 en texto (SQLite no tiene tipo ni función para UUID)
+    new_id = (
+        "lower(hex(randomblob(4)) || '-' || hex(randomblob(2)) || '-4' || substr(hex(randomblob(2)), 2) || '-'"
+        " || substr('89ab', 1 + (abs(random()) % 4), 1) || substr(hex(randomblob(2)), 2) || '-' || hex(randomblob(6)))"
+    )
+    true = "1"
+    false = "0"
+    types = {
+        "identity": "INTEGER PRIMARY KEY AUTOINCREMENT",
+        "uuid": "VARCHAR(36)",
+        "text": "VARCHAR",
+        "datetime": "TIMESTAMP",
+        "bool": "BOOLEAN",
+    }
+
+    def lock_rows(self, table: str, key: str, where: str) -> Optional[str]:
+        # Una sola transacción de escritura a la vez en toda la base: ya están serializadas
+        return None
+
+    def create_index(
+        self, table: str, name: str, columns: str, include: Optional[Iterable[str]] = None, clustered: bool = False,
+    ) -> str:
+        # SQLite no tiene INCLUDE: el índice queda solo con las claves
+        return f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"
+
+    def configure(self, engine) -> None:
+        import sqlite3
+
+        # Las notas llegan como Decimal; sqlite3 no sabe enlazarlas
+        sqlite3.register_adapter(Decimal, str)
+        sync_engine = getattr(engine, "sync_engine", engine)
+
+        @event.listens_for(sync_engine, "connect")
+        def _on_connect(dbapi_connection, connection_record):
+            # Las FK se validan como en SQL Server
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA foreign_keys = ON")
+            cursor.close()
+
+
+DIALECTS = {
+    "mssql": Dialect(),
+    "postgresql": PostgresDialect(),
+    "sqlite": SQLiteDialect(),
+}
+
+
+def dialect_for(url: str) -> Dialect:
+    backend = make_url(url).get_backend_name()
+    if backend not in DIALECTS:
+        raise ValueError(f"Motor no soportado: {backend} (soportados: {', '.join(DIALECTS)})")
+    return DIALECTS[backend]
+
+
+# Dialecto de la app (el engine async debe apuntar al mismo motor)
+dialect = dialect_for(SQLSERVER_URL)
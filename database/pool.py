@@ -0,0 +1,134 @@
+# database/pool.py
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+from core.config import (
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING,
+)
+from core.metrics import Histogram
+
+
+class PoolMetrics:
+    """Contadores del pool de un engine (se exponen en /admin/pool)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.wait_time = Histogram()        # tiempo para obtener una conexión del pool
+        self.connect_latency = Histogram()  # tiempo de abrir una conexión ODBC nueva
+        self.checkouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    def incr(self, field: str) -> None:
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+
+class _InstrumentedMixin:
+    metrics: PoolMetrics = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            if self.metrics:
+                self.metrics.incr("timeouts")
+            raise
+        finally:
+            if self.metrics:
+                self.metrics.wait_time.observe(time.perf_counter() - start)
+
+    def recreate(self):
+        # dispose() crea un pool nuevo: conservamos las métricas
+        new_pool = super().recreate()
+        new_pool.metrics = self.metrics
+        return new_pool
+
+
+class InstrumentedQueuePool(_InstrumentedMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_kwargs(url: str, is_async: bool = False) -> dict:
+    """Parámetros de create_engine/create_async_engine según la configuración."""
+    kwargs = {"pool_pre_ping": DB_POOL_PRE_PING, "pool_recycle": DB_POOL_RECYCLE}
+    if url.startswith("sqlite"):
+        # SQLite usa su propio pool (sin tamaño/overflow)
+        return kwargs
+    kwargs.update(
+        poolclass=InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+    )
+    return kwargs
+
+
+# name -> (engine sync, métricas)
+_instrumented = {}
+
+
+def instrument_engine(engine, name: str) -> PoolMetrics:
+    """Engancha los eventos del pool de SQLAlchemy al PoolMetrics del engine."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    metrics = PoolMetrics(name)
+    if isinstance(sync_engine.pool, _InstrumentedMixin):
+        sync_engine.pool.metrics = metrics
+
+    @event.listens_for(sync_engine, "do_connect")
+    def _before_connect(dialect, conn_rec, cargs, cparams):
+        conn_rec.info["connect_start"] = time.perf_counter()
+
+    @event.listens_for(sync_engine, "connect")
+    def _on_connect(dbapi_connection, conn_rec):
+        metrics.incr("connects")
+        start = conn_rec.info.pop("connect_start", None)
+        if start is not None:
+            metrics.connect_latency.observe(time.perf_counter() - start)
+
+    @event.listens_for(sync_engine, "checkout")
+    def _on_checkout(dbapi_connection, conn_rec, conn_proxy):
+        metrics.incr("checkouts")
+
+    @event.listens_for(sync_engine, "invalidate")
+    def _on_invalidate(dbapi_connection, conn_rec, exception):
+        metrics.incr("invalidations")
+
+    _instrumented[name] = (sync_engine, metrics)
+    return metrics
+
+
+def pool_metrics() -> dict:
+    return {name: metrics for name, (_, metrics) in _instrumented.items()}
+
+
+def pool_status() -> dict:
+    """Estado actual + métricas de todos los pools instrumentados."""
+    out = {}
+    for name, (sync_engine, metrics) in _instrumented.items():
+        pool = sync_engine.pool
+        status = {"pool_class": type(pool).__name__}
+        for attr in ("size", "checkedin", "checkedout", "overflow"):
+            fn = getattr(pool, attr, None)
+            if callable(fn):
+                status[attr] = fn()
+        status.update(
+            checkouts=metrics.checkouts,
+            connects=metrics.connects,
+            invalidations=metrics.invalidations,
+            timeouts=metrics.timeouts,
+            wait_time=metrics.wait_time.snapshot(),
+            connect_latency=metrics.connect_latency.snapshot(),
+        )
+        out[name] = status
+    return out
@@ -0,0 +1,143 @@
+# database/queries.py
+import threading
+from collections import OrderedDict
+from typing import Iterable, Tuple
+
+from sqlalchemy import bindparam, event, text
+from sqlalchemy.engine.default import CACHE_HIT, CACHE_MISS
+from sqlalchemy.sql.elements import TextClause
+
+from core.config import DB_QUERY_CACHE_SIZE
+from database.dialect import dialect
+
+
+class QueryRegistry:
+    """
+    Registro central de sentencias text(). Cada texto SQL se construye una sola vez
+    (se parsean sus binds una vez) y luego se reutiliza el mismo objeto, así el
+    compiled cache de SQLAlchemy acierta y SQL Server ve siempre el mismo texto (un plan).
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._statements: "OrderedDict[tuple, TextClause]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def sql(self, statement: str, expanding: Tuple[str, ...] = ()) -> TextClause:
+        """text(statement) registrado; `expanding` = binds de listas (IN :ids)."""
+        key = (statement, expanding)
+        with self._lock:
+            clause = self._statements.get(key)
+            if clause is not None:
+                self._statements.move_to_end(key)
+                self.hits += 1
+                return clause
+            self.misses += 1
+
+        clause = text(statement)
+        if expanding:
+            clause = clause.bindparams(*(bindparam(name, expanding=True) for name in expanding))
+        with self._lock:
+            self._statements[key] = clause
+            while len(self._statements) > self.maxsize:
+                self._statements.popitem(last=False)
+        return clause
+
+    def update(self, table: str, columns: Iterable[str], *, pk: str, returning: str) -> TextClause:
+        """
+        UPDATE canónico de un PUT parcial: todas las columnas en orden fijo con
+        COALESCE(:col, col), así un bind None deja el valor como está. Un solo texto
+        por tabla en lugar de uno por combinación de campos enviados.
+        `returning` son las columnas de la fila actualizada (OUTPUT/RETURNING según el motor).
+        """
+        sets = ", ".join(f"{column} = COALESCE(:{column}, {column})" for column in columns)
+        return self.sql(f"""
+        UPDATE {table} SET {sets}, modify_date = {dialect.now}
+        {dialect.output(returning)}
+        WHERE {pk} = :{pk}
+        {dialect.returning(returning)}
+    """)
+
+    def update_many(self, table: str, columns: Iterable[str], *, pk: str, staging: str, returning: str) -> TextClause:
+        """
+        Versión por lotes de update(): los valores llegan en la tabla temporal `staging`
+        (una fila por pk) y un solo UPDATE ... FROM los aplica con la misma semántica
+        COALESCE (columna NULL en staging = no tocar).
+        """
+        sets = ", ".join(f"{column} = COALESCE(s.{column}, {table}.{column})" for column in columns)
+        return self.sql(dialect.update_from(
+            table, f"{sets}, modify_date = {dialect.now}",
+            f"{dialect.temp_table(staging)} s", f"s.{pk} = {table}.{pk}", returning,
+        ))
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "statements": len(self._statements),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+queries = QueryRegistry(DB_QUERY_CACHE_SIZE)
+sql = queries.sql
+
+
+# --- Compiled cache de SQLAlchemy por engine ---
+class CompiledCacheMetrics:
+    def __init__(self, engine):
+        self.engine = engine
+        self.hits = 0
+        self.misses = 0
+        self.uncached = 0
+        self._lock = threading.Lock()
+
+    def observe(self, cache_hit) -> None:
+        with self._lock:
+            if cache_hit is CACHE_HIT:
+                self.hits += 1
+            elif cache_hit is CACHE_MISS:
+                self.misses += 1
+            else:
+                self.uncached += 1
+
+    def stats(self) -> dict:
+        compiled_cache = self.engine._compiled_cache
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(compiled_cache) if compiled_cache is not None else 0,
+                "hits": self.hits,
+                "misses": self.misses,
+                "uncached": self.uncached,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+_compiled = {}
+
+
+def instrument_compiled_cache(engine, name: str) -> CompiledCacheMetrics:
+    """Cuenta aciertos/fallos del compiled cache (context.cache_hit de cada ejecución)."""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    metrics = CompiledCacheMetrics(sync_engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _on_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            metrics.observe(context.cache_hit)
+
+    _compiled[name] = metrics
+    return metrics
+
+
+def query_stats() -> dict:
+    return {
+        "registry": queries.stats(),
+        "compiled_cache": {name: metrics.stats() for name, metrics in _compiled.items()},
+    }
@@ -0,0 +1,77 @@
+# database/replica.py
+import threading
+import time
+
+from core.cache import TTLCache, shared_backend
+
+
+class ReplicaRouter:
+    """
+    Decide si una lectura puede ir a la réplica:
+    - read-your-writes: un cliente que acaba de escribir lee del primario durante
+      `window` segundos (compartido entre workers con CACHE_BACKEND_URL)
+    - salud: un error de conexión en la réplica la marca caída; pasados `retry` segundos
+      una sonda (SELECT 1) decide si vuelve a recibir lecturas
+    """
+
+    def __init__(self, enabled: bool, window: float, retry: float):
+        self.enabled = enabled
+        self.retry = retry
+        self.recent_writers = TTLCache(
+            "replica_recent_writers", maxsize=100_000, ttl=window, backend=shared_backend()
+        ) if window > 0 else None
+        self._down_until = 0.0
+        self._healthy = True
+        self._lock = threading.Lock()
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self.failures = 0
+        self.last_error = None
+
+    async def mark_write(self, client: str) -> None:
+        if self.enabled and self.recent_writers is not None:
+            await self.recent_writers.aset(client, 1)
+
+    async def wrote_recently(self, client: str) -> bool:
+        return self.recent_writers is not None and await self.recent_writers.aget(client) is not None
+
+    def needs_probe(self) -> bool:
+        """Caída y ya pasó el tiempo de reintento: hay que sondear antes de usarla."""
+        with self._lock:
+            return not self._healthy and time.monotonic() >= self._down_until
+
+    def healthy(self) -> bool:
+        with self._lock:
+            return self._healthy
+
+    def mark_down(self, error: BaseException) -> None:
+        with self._lock:
+            self._healthy = False
+            self._down_until = time.monotonic() + self.retry
+            self.failures += 1
+            message = (str(error).splitlines() or [""])[0]
+            self.last_error = f"{type(error).__name__}: {message[:200]}"
+
+    def mark_up(self) -> None:
+        with self._lock:
+            self._healthy = True
+
+    def count(self, replica: bool) -> None:
+        with self._lock:
+            if replica:
+                self.replica_reads += 1
+            else:
+                self.primary_reads += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "healthy": self._healthy,
+                "retry_in": round(max(0.0, self._down_until - time.monotonic()), 1) if not self._healthy else 0.0,
+                "replica_reads": self.replica_reads,
+                "primary_reads": self.primary_reads,
+                "failures": self.failures,
+                "last_error": self.last_error,
+            }
+
@@ -1,20 +1,38 @@
 # deps/auth.py
-from fastapi import Depends, HTTPException, status, Security
+from fastapi import HTTPException, status, Security
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from sqlalchemy import text
-from jose import jwt, JWTError
+from jose import JWTError
 
-from deps.db import get_db
-from core.config import SECRET_KEY, ALGORITHM
+from database.queries import sql
+from deps.db import open_db
+from core.cache import TTLCache, shared_backend
+from core.config import USER_CACHE_TTL, USER_CACHE_SIZE
+from core.security import decode_token
 from schemas.auth import CurrentUser
 
 # Esquema Bearer para Swagger
 bearer_scheme = HTTPBearer()
 
-def get_current_user(
+# Caché de usuarios autenticados (clave = sub del JWT)
+user_cache = TTLCache(
+    "current_user",
+    maxsize=USER_CACHE_SIZE,
+    ttl=USER_CACHE_TTL,
+    backend=shared_backend(),
+    dumps=lambda user: user.model_dump_json(),
+    loads=CurrentUser.model_validate_json,
+)
+
+def _user_key(id_user) -> str:
+    # SQL Server devuelve los GUID en mayúsculas y UUID los formatea en minúsculas
+    return str(id_user).lower()
+
+async def invalidate_current_user(id_user) -> None:
+    """Llamar cuando cambian datos del usuario (is_active, id_role, nombre...)."""
+    await user_cache.ainvalidate(_user_key(id_user))
+
+async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Security(bearer_scheme),
-    db: Session = Depends(get_db),
 ) -> CurrentUser:
     token = credentials.credentials
     credentials_exc = HTTPException(
@@ -25,21 +43,30 @@ def get_current_user(
 
     # Decodificar JWT
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         user_id = payload.get("sub")
         if not user_id:
             raise credentials_exc
     except JWTError:
         raise credentials_exc
 
+    cached = await user_cache.aget(_user_key(user_id))
+    if cached is not None:
+        return cached
+
     # Consultar usuario activo
-    query = text("""
+    query = sql("""
         SELECT id_user, name, last_name, id_role, is_active
         FROM users
         WHERE id_user = :uid
     """)
-    row = db.execute(query, {"uid": user_id}).mappings().first()
+    # Sesión propia solo en un fallo de caché, siempre el primario (is_active no puede llegar
+    # atrasado de la réplica a la caché); se cierra aquí y la conexión vuelve al pool ya
+    async with open_db() as db:
+        row = (await db.execute(query, {"uid": user_id})).mappings().first()
     if not row or not row["is_active"]:
         raise credentials_exc
 
-    return CurrentUser(**row)
+    user = CurrentUser(**row)
+    await user_cache.aset(_user_key(user_id), user)
+    return user
@@ -1,11 +1,249 @@
 # deps/db.py
-from typing import Generator
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, Optional, Union
+
+from fastapi import Request
+from jose import JWTError
+from sqlalchemy.exc import InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from sqlalchemy.orm import Session
-from database.connection import SessionLocal
+from starlette.concurrency import run_in_threadpool
+
+from core.config import DB_MODE, REPLICA_READ_YOUR_WRITES_SECONDS, REPLICA_RETRY_SECONDS
+from core.security import decode_token
+from database.connection import (
+    AsyncReplicaSessionLocal, AsyncSessionLocal, ReplicaSessionLocal, SessionLocal,
+    async_engine, async_replica_engine, engine, replica_engine,
+)
+from database.queries import sql
+from database.replica import ReplicaRouter
+
+
+class ThreadedSession:
+    """
+    Envuelve una Session sync con la misma API que AsyncSession
+    (await db.execute / commit / rollback). Cada llamada corre en el threadpool,
+    así los routers son iguales en modo sync y async.
+    """
+
+    def __init__(self, session: Session):
+        self.sync_session = session
+
+    @property
+    def info(self) -> dict:
+        return self.sync_session.info
+
+    def _execute(self, statement, params=None, **kw):
+        result = self.sync_session.execute(statement, params, **kw)
+        # Igual que AsyncSession: devolvemos el resultado ya bufferizado
+        if result.returns_rows:
+            return result.freeze()()
+        return result
+
+    async def execute(self, statement, params=None, **kw):
+        try:
+            return await run_in_threadpool(self._execute, statement, params, **kw)
+        except _REPLICA_ERRORS as exc:
+            if not is_replica(self):
+                raise
+            await _fall_back_to_primary(self, exc)
+            return await run_in_threadpool(self._execute, statement, params, **kw)
+
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def close(self):
+        await run_in_threadpool(self.sync_session.close)
+
+
+# Tipo que reciben los routers en Depends(get_db)
+DBSession = Union[AsyncSession, ThreadedSession]
+
 
-def get_db() -> Generator[Session, None, None]:
-    db = SessionLocal()
+async def stream_partitions(db: DBSession, statement, params=None, size: int = 1000):
+    """
+    Recorre un SELECT grande por bloques de `size` filas (RowMapping) con cursor
+    del lado servidor, sin cargar todo el resultado en memoria.
+    """
+    statement = statement.execution_options(stream_results=True, yield_per=size)
+    if isinstance(db, AsyncSession):
+        result = await db.stream(statement, params)
+        async for partition in result.mappings().partitions(size):
+            yield partition
+        return
+
+    # Sync: cada fetch va al threadpool (ThreadedSession.execute bufferiza, aquí no)
+    result = await run_in_threadpool(db.sync_session.execute, statement, params)
+    partitions = result.mappings().partitions(size)
+    try:
+        while True:
+            partition = await run_in_threadpool(next, partitions, None)
+            if partition is None:
+                break
+            yield partition
+    finally:
+        await run_in_threadpool(result.close)
+
+
+# --- Sesiones: primario o réplica de lectura ---
+replica_router = ReplicaRouter(
+    enabled=(AsyncReplicaSessionLocal if DB_MODE == "async" else ReplicaSessionLocal) is not None,
+    window=REPLICA_READ_YOUR_WRITES_SECONDS,
+    retry=REPLICA_RETRY_SECONDS,
+)
+
+# Errores de conexión/servidor (no de la consulta): marcan la réplica como caída
+_REPLICA_ERRORS = (OperationalError, InterfaceError)
+
+
+async def _fall_back_to_primary(db: DBSession, exc: BaseException) -> None:
+    """
+    La réplica falló a mitad del request: se marca caída y la misma sesión sigue en el
+    primario (solo lecturas, nada que deshacer), así el request no termina en 500.
+    """
+    replica_router.mark_down(exc)
+    try:
+        await db.rollback()
+    except _REPLICA_ERRORS:
+        pass  # la conexión ya estaba rota: SQLAlchemy la descarta igual
+    db.sync_session.bind = async_engine.sync_engine if DB_MODE == "async" else engine
+    db.info["replica"] = False
+
+
+class ReplicaAsyncSession(AsyncSession):
+    """AsyncSession de réplica: un error de conexión repite la sentencia una vez en el primario."""
+
+    async def execute(self, statement, params=None, **kw):
+        try:
+            return await super().execute(statement, params, **kw)
+        except _REPLICA_ERRORS as exc:
+            if not is_replica(self):
+                raise
+            await _fall_back_to_primary(self, exc)
+            return await super().execute(statement, params, **kw)
+
+
+AsyncReplicaSession = (
+    async_sessionmaker(class_=ReplicaAsyncSession, **AsyncReplicaSessionLocal.kw)
+    if AsyncReplicaSessionLocal is not None else None
+)
+
+
+def _session(replica: bool) -> DBSession:
+    # El modo se elige al arrancar (DB_MODE=sync|async)
+    if DB_MODE == "async":
+        db = (AsyncReplicaSession if replica else AsyncSessionLocal)()
+    else:
+        db = ThreadedSession((ReplicaSessionLocal if replica else SessionLocal)())
+    db.info["replica"] = replica
+    return db
+
+
+def is_replica(db: DBSession) -> bool:
+    """La sesión lee de la réplica (sus filas pueden venir con retraso: no llenar cachés compartidas)."""
+    return bool(db.info.get("replica"))
+
+
+async def _probe_replica() -> bool:
+    def probe():
+        with replica_engine.connect() as conn:
+            conn.execute(sql("SELECT 1"))
+
+    try:
+        if DB_MODE == "async":
+            async with async_replica_engine.connect() as conn:
+                await conn.execute(sql("SELECT 1"))
+        else:
+            await run_in_threadpool(probe)
+    except Exception as exc:
+        replica_router.mark_down(exc)
+        return False
+    replica_router.mark_up()
+    return True
+
+
+async def _use_replica(client: Optional[str] = None) -> bool:
+    if not replica_router.enabled:
+        return False
+    if client is not None and await replica_router.wrote_recently(client):
+        return False
+    if replica_router.needs_probe():
+        return await _probe_replica()
+    return replica_router.healthy()
+
+
+@asynccontextmanager
+async def open_db(replica: bool = False) -> AsyncGenerator[DBSession, None]:
+    """
+    Sesión fuera de un request (tareas en segundo plano, scripts, streaming).
+    replica=True: lecturas largas a la réplica si hay y está sana.
+    """
+    replica = replica and await _use_replica()
+    db = _session(replica)
     try:
         yield db
+    except _REPLICA_ERRORS as exc:
+        if replica:
+            replica_router.mark_down(exc)
+        raise
     finally:
-        db.close()
\ No newline at end of file
+        await db.close()
+
+
+def client_key(request: Request) -> str:
+    # Cliente del request (read-your-writes, idempotencia): sub del JWT; sin token, IP
+    auth = request.headers.get("authorization", "")
+    if auth[:7].lower() == "bearer ":
+        try:
+            sub = decode_token(auth[7:]).get("sub")
+        except JWTError:
+            sub = None
+        if sub:
+            return f"user:{str(sub).lower()}"
+    return f"ip:{request.client.host if request.client else ''}"
+
+
+async def mark_write(request: Request) -> None:
+    """Read-your-writes para escrituras con sesión propia (open_db), fuera de get_db."""
+    if replica_router.enabled:
+        await replica_router.mark_write(client_key(request))
+
+
+async def get_db(request: Request) -> AsyncGenerator[DBSession, None]:
+    """
+    Sesión del request. GET/HEAD van a la réplica (si hay, está sana y el cliente
+    no escribió en los últimos REPLICA_READ_YOUR_WRITES_SECONDS); el resto va al
+    primario y marca al cliente para read-your-writes.
+    """
+    if not replica_router.enabled:
+        async with open_db() as db:
+            yield db
+        return
+
+    client = client_key(request)
+    read = request.method in ("GET", "HEAD")
+    if read:
+        replica = await _use_replica(client)
+        replica_router.count(replica)
+    else:
+        # Antes de responder: el GET que siga a esta escritura ya debe ir al primario
+        replica = False
+        await replica_router.mark_write(client)
+    db = _session(replica)
+    try:
+        yield db
+    except _REPLICA_ERRORS as exc:
+        if replica:
+            replica_router.mark_down(exc)
+        raise
+    finally:
+        await db.close()
+
+
+async def get_primary_db() -> AsyncGenerator[DBSession, None]:
+    """Siempre el primario (autenticación y datos que llenan cachés compartidas)."""
+    async with open_db() as db:
+        yield db
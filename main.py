@@ -1,13 +1,28 @@
-from fastapi import FastAPI
-from routers import auth_r, roles, users, area, subjects, notes, login
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
+from routers import auth_r, roles, users, area, subjects, notes, login, admin, reports, changes
 from fastapi.openapi.utils import get_openapi
 from fastapi.middleware.cors import CORSMiddleware
+from core.security import hashing_pool
+from core.events import broker
+from core.config import COMPRESSION_ENABLED, METRICS_ENABLED, RATE_LIMIT_ENABLED
+from core.compression import CompressionMiddleware, PrecompressedDocument
+from core.instrumentation import MetricsMiddleware, render_metrics
+from core.ratelimit import RateLimitMiddleware, rate_limiter
+from core.responses import dumps
 
 app = FastAPI(
     title="P1SW APIs",
     version="1.0.0",
 )
 
+# =============================
+#   🚦 Rate limit por cliente + tope de requests en curso
+#   (el más interno: los 429/503 llevan CORS y cuentan en las métricas)
+# =============================
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
+
 # =============================
 #   🔐 CORS SOLO PARA TU FRONT
 # =============================
@@ -17,8 +32,25 @@ app.add_middleware(
     allow_credentials=True,                    # Ahora SÍ puede ser True
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Last-Modified", "Retry-After"],  # Cursor keyset + caché HTTP + límites
 )
 
+# =============================
+#   🗜️ Compresión gzip/br (dentro de métricas: su CPU cuenta en la latencia)
+# =============================
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+# =============================
+#   📈 Métricas (GET /metrics, formato Prometheus)
+# =============================
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 # =============================
 #   📌 Routers del proyecto
 # =============================
@@ -29,6 +61,19 @@ app.include_router(area.router)
 app.include_router(subjects.router)
 app.include_router(notes.router)
 app.include_router(login.router)
+app.include_router(reports.router)
+app.include_router(admin.router)
+app.include_router(changes.router)
+
+@app.on_event("startup")
+async def start_events():
+    await broker.start()
+
+@app.on_event("shutdown")
+async def shutdown_pools():
+    hashing_pool.shutdown()
+    await broker.close()
+    await rate_limiter.backend.close()
 
 # =============================
 #   🔑 JWT en Swagger
@@ -60,3 +105,27 @@ def custom_openapi():
     return app.openapi_schema
 
 app.openapi = custom_openapi
+
+# =============================
+#   📄 /openapi.json serializado y comprimido una sola vez
+# =============================
+# Reemplaza la ruta de FastAPI (que serializa el esquema en cada request); /docs la sigue usando
+app.router.routes = [r for r in app.router.routes if getattr(r, "path", None) != app.openapi_url]
+openapi_document: PrecompressedDocument = None
+
+
+def build_openapi_document() -> PrecompressedDocument:
+    global openapi_document
+    if openapi_document is None:
+        openapi_document = PrecompressedDocument(dumps(app.openapi()))
+    return openapi_document
+
+
+@app.on_event("startup")
+def precompress_openapi():
+    build_openapi_document()
+
+
+@app.get(app.openapi_url, include_in_schema=False)
+async def openapi_json(request: Request):
+    return build_openapi_document().response(request)
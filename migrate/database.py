@@ -1,192 +1,215 @@
 # migrate/database.py
-import uuid
-from database.connection import db
+import hashlib
+from typing import List
 
-def migrate_database():
-    # Roles
-    create_roles = """
-    IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='roles' AND xtype='U')
-    BEGIN
-        CREATE TABLE roles (
-            id INT IDENTITY(1,1) PRIMARY KEY,
-            name NVARCHAR(100) NOT NULL,
-            id_user_create UNIQUEIDENTIFIER NOT NULL,
-            id_user_modify UNIQUEIDENTIFIER NULL,
-            create_date DATETIME2 DEFAULT GETDATE(),
-            modify_date DATETIME2 NULL,
-            is_active BIT DEFAULT 1
-        )
-    END
-    """
-
-    # Users
-    create_users = """
-    IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='users' AND xtype='U')
-    BEGIN
-        CREATE TABLE users (
-            id_user UNIQUEIDENTIFIER PRIMARY KEY DEFAULT NEWID(),
-            name NVARCHAR(50) NOT NULL,
-            last_name NVARCHAR(50) NOT NULL,
-            id_role INT NOT NULL,
-            birthdate DATE NOT NULL,
-            id_user_create UNIQUEIDENTIFIER NOT NULL,
-            id_user_modify UNIQUEIDENTIFIER NULL,
-            create_date DATETIME2 DEFAULT GETDATE(),
-            modify_date DATETIME2 NULL,
-            is_active BIT DEFAULT 1,
-            CONSTRAINT FK_users_roles FOREIGN KEY (id_role) REFERENCES roles(id)
-        )
-    END
-    """
-
-    # Login
-    create_login = """
-    IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='login' AND xtype='U')
-    BEGIN
-        CREATE TABLE login (
-            id INT IDENTITY(1,1) PRIMARY KEY,
-            username NVARCHAR(100) NOT NULL UNIQUE,
-            password_hash NVARCHAR(300) NOT NULL,
-            id_user UNIQUEIDENTIFIER NOT NULL,
-            id_user_create UNIQUEIDENTIFIER NOT NULL,
-            id_user_modify UNIQUEIDENTIFIER NULL,
-            create_date DATETIME2 DEFAULT GETDATE(),
-            modify_date DATETIME2 NULL,
-            is_active BIT DEFAULT 1,
-            CONSTRAINT FK_login_users FOREIGN KEY (id_user) REFERENCES users(id_user)
-        )
-    END
-    """
-
-    # Area
-    create_area = """
-    IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='area' AND xtype='U')
-    BEGIN
-        CREATE TABLE area (
-            id_area INT IDENTITY(1,1) PRIMARY KEY,
-            name NVARCHAR(100) NOT NULL,
-            id_user_create UNIQUEIDENTIFIER NOT NULL,
-            id_user_modify UNIQUEIDENTIFIER NULL,
-            create_date DATETIME2 DEFAULT GETDATE(),
-            modify_date DATETIME2 NULL,
-            is_active BIT DEFAULT 1
-        )
-    END
-    """
-
-    # Subjects
-    create_subjects = """
-    IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='subjects' AND xtype='U')
-    BEGIN
-        CREATE TABLE subjects (
-            id_subj UNIQUEIDENTIFIER PRIMARY KEY DEFAULT NEWID(),
-            name NVARCHAR(100) NOT NULL,
-            credits INT NOT NULL,
-            id_area INT NULL,
-            id_user_create UNIQUEIDENTIFIER NOT NULL,
-            id_user_modify UNIQUEIDENTIFIER NULL,
-            create_date DATETIME2 DEFAULT GETDATE(),
-            modify_date DATETIME2 NULL,
-            is_active BIT DEFAULT 1,
-            CONSTRAINT FK_subjects_area FOREIGN KEY (id_area) REFERENCES area(id_area)
-        )
-    END
-    """
-
-    # Notes
-    create_notes = """
-    IF NOT EXISTS (SELECT * FROM sysobjects WHERE name='notes' AND xtype='U')
-    BEGIN
-        CREATE TABLE notes (
-            id INT IDENTITY(1,1) PRIMARY KEY,
-            id_user UNIQUEIDENTIFIER NOT NULL,
-            id_subj UNIQUEIDENTIFIER NOT NULL,
-            id_user_create UNIQUEIDENTIFIER NOT NULL,
-            id_user_modify UNIQUEIDENTIFIER NULL,
-            grade DECIMAL(4,2) NOT NULL,
-            create_date DATETIME2 DEFAULT GETDATE(),
-            modify_date DATETIME2 NULL,
-            is_active BIT DEFAULT 1,
-            CONSTRAINT FK_notes_users FOREIGN KEY (id_user) REFERENCES users(id_user),
-            CONSTRAINT FK_notes_subjects FOREIGN KEY (id_subj) REFERENCES subjects(id_subj)
+from core.grades import GRADE_AGGREGATE, SUMMARY_COLUMNS
+from database.connection import db
+from database.dialect import Dialect, dialect
+
+# Tablas en el orden de sus FK. {identity}, {uuid}, {text}, {datetime} y {bool} son los
+# tipos del dialecto; {now}, {new_id} y {true} sus expresiones (database/dialect.py)
+TABLES = [
+    ("roles", """
+        id {identity},
+        name {text}(100) NOT NULL,
+        id_user_create {uuid} NOT NULL,
+        id_user_modify {uuid} NULL,
+        create_date {datetime} DEFAULT ({now}),
+        modify_date {datetime} NULL,
+        is_active {bool} DEFAULT {true}
+    """),
+    ("users", """
+        id_user {uuid} PRIMARY KEY DEFAULT ({new_id}),
+        name {text}(50) NOT NULL,
+        last_name {text}(50) NOT NULL,
+        id_role INT NOT NULL,
+        birthdate DATE NOT NULL,
+        id_user_create {uuid} NOT NULL,
+        id_user_modify {uuid} NULL,
+        create_date {datetime} DEFAULT ({now}),
+        modify_date {datetime} NULL,
+        is_active {bool} DEFAULT {true},
+        CONSTRAINT FK_users_roles FOREIGN KEY (id_role) REFERENCES roles(id)
+    """),
+    ("login", """
+        id {identity},
+        username {text}(100) NOT NULL UNIQUE,
+        password_hash {text}(300) NOT NULL,
+        id_user {uuid} NOT NULL,
+        id_user_create {uuid} NOT NULL,
+        id_user_modify {uuid} NULL,
+        create_date {datetime} DEFAULT ({now}),
+        modify_date {datetime} NULL,
+        is_active {bool} DEFAULT {true},
+        CONSTRAINT FK_login_users FOREIGN KEY (id_user) REFERENCES users(id_user)
+    """),
+    ("area", """
+        id_area {identity},
+        name {text}(100) NOT NULL,
+        id_user_create {uuid} NOT NULL,
+        id_user_modify {uuid} NULL,
+        create_date {datetime} DEFAULT ({now}),
+        modify_date {datetime} NULL,
+        is_active {bool} DEFAULT {true}
+    """),
+    ("subjects", """
+        id_subj {uuid} PRIMARY KEY DEFAULT ({new_id}),
+        name {text}(100) NOT NULL,
+        credits INT NOT NULL,
+        id_area INT NULL,
+        id_user_create {uuid} NOT NULL,
+        id_user_modify {uuid} NULL,
+        create_date {datetime} DEFAULT ({now}),
+        modify_date {datetime} NULL,
+        is_active {bool} DEFAULT {true},
+        CONSTRAINT FK_subjects_area FOREIGN KEY (id_area) REFERENCES area(id_area)
+    """),
+    ("notes", """
+        id {identity},
+        id_user {uuid} NOT NULL,
+        id_subj {uuid} NOT NULL,
+        id_user_create {uuid} NOT NULL,
+        id_user_modify {uuid} NULL,
+        grade DECIMAL(4,2) NOT NULL,
+        create_date {datetime} DEFAULT ({now}),
+        modify_date {datetime} NULL,
+        is_active {bool} DEFAULT {true},
+        CONSTRAINT FK_notes_users FOREIGN KEY (id_user) REFERENCES users(id_user),
+        CONSTRAINT FK_notes_subjects FOREIGN KEY (id_subj) REFERENCES subjects(id_subj)
+    """),
+    # Resumen de promedios por (estudiante, área); lo mantienen los routers de notas
+    ("grade_summary", """
+        id_user {uuid} NOT NULL,
+        id_area INT NULL,
+        notes_count INT NOT NULL,
+        credits INT NOT NULL,
+        grade_sum DECIMAL(18,2) NOT NULL,
+        weighted_sum DECIMAL(18,2) NOT NULL,
+        modify_date {datetime} DEFAULT ({now})
+    """),
+]
+
+# Índices para los filtros/órdenes de los listados (seek en vez de scan).
+# En SQL Server el PK (clave del índice clustered) se agrega solo a cada índice, así
+# (create_date, pk) también sirve para la paginación por cursor.
+# (tabla, nombre, columnas, INCLUDE, clustered); SQLite ignora INCLUDE
+INDEXES = [
+    ("notes", "IX_notes_create_date", "create_date DESC", ("id_user", "id_subj", "grade", "is_active", "modify_date"), False),
+    ("notes", "IX_notes_id_user_create_date", "id_user, create_date DESC", ("id_subj", "grade", "is_active", "modify_date"), False),
+    ("notes", "IX_notes_id_subj_create_date", "id_subj, create_date DESC", ("id_user", "grade", "is_active", "modify_date"), False),
+    ("subjects", "IX_subjects_id_area", "id_area", None, False),
+    ("subjects", "IX_subjects_create_date", "create_date DESC", None, False),
+    ("users", "IX_users_create_date", "create_date DESC", None, False),
+    ("users", "IX_users_id_role", "id_role", None, False),
+    ("login", "IX_login_id_user", "id_user", None, False),
+    ("login", "IX_login_create_date", "create_date DESC", None, False),
+    ("area", "IX_area_create_date", "create_date DESC", None, False),
+    ("roles", "IX_roles_create_date", "create_date DESC", None, False),
+    ("grade_summary", "IX_grade_summary_id_user", "id_user, id_area", None, True),
+    # Feed de cambios (GET /changes): orden (COALESCE(modify_date, create_date), pk)
+    ("roles", "IX_roles_change_date", "{change_date}, id", None, False),
+    ("users", "IX_users_change_date", "{change_date}, id_user", None, False),
+    ("area", "IX_area_change_date", "{change_date}, id_area", None, False),
+    ("subjects", "IX_subjects_change_date", "{change_date}, id_subj", None, False),
+    ("notes", "IX_notes_change_date", "{change_date}, id", None, False),
+]
+
+# Tablas del feed de cambios: en SQL Server necesitan la columna calculada change_date
+CHANGE_FEED_TABLES = ["roles", "users", "area", "subjects", "notes"]
+
+
+def table_statements(dialect: Dialect = dialect) -> List[str]:
+    """CREATE TABLE idempotentes para `dialect`."""
+    values = {**dialect.types, "now": dialect.now, "new_id": dialect.new_id, "true": dialect.true}
+    return [dialect.create_table(name, body.format(**values)) for name, body in TABLES]
+
+
+def index_statements(dialect: Dialect = dialect) -> List[str]:
+    """CREATE INDEX idempotentes para `dialect` (antes, las columnas calculadas que indexan)."""
+    columns_ddl = [dialect.change_date_column(table) for table in CHANGE_FEED_TABLES]
+    return [s for s in columns_ddl if s] + [
+        dialect.create_index(
+            table, name, columns.format(change_date=dialect.change_date), include=include, clustered=clustered,
         )
-    END
-    """
-
-    scripts = [
-        create_roles,
-        create_users,
-        create_login,
-        create_area,
-        create_subjects,
-        create_notes
+        for table, name, columns, include, clustered in INDEXES
     ]
 
-    for s in scripts:
+
+def migrate_database():
+    for s in table_statements():
         db.execute_non_query(s)
 
-    print("Migración completada ✅")
+    print(f"Migración completada ({dialect.name}) ✅")
+    create_indexes()
     insert_initial_data()
+    rebuild_grade_summary()
+
+
+def create_indexes():
+    for s in index_statements():
+        db.execute_non_query(s)
+
+    print("Índices creados ✅")
+
+
+def _insert_missing(table: str, condition: str, insert: str):
+    # INSERT ... SELECT ... WHERE NOT EXISTS: idempotente en los tres motores (sin IF/BEGIN)
+    db.execute_non_query(f"""
+        {insert}
+        WHERE NOT EXISTS (SELECT 1 FROM {table} WHERE {condition})
+    """)
 
 
 def insert_initial_data():
     # Roles
-    db.execute_non_query("""
-        IF NOT EXISTS (SELECT 1 FROM roles WHERE name = 'Administrador')
-        BEGIN
-            INSERT INTO roles (name, id_user_create) VALUES ('Administrador', NEWID())
-        END
+    _insert_missing("roles", "name = 'Administrador'", f"""
+        INSERT INTO roles (name, id_user_create) SELECT 'Administrador', {dialect.new_id}
     """)
-
-    db.execute_non_query("""
-        IF NOT EXISTS (SELECT 1 FROM roles WHERE name = 'Estudiante')
-        BEGIN
-            INSERT INTO roles (name, id_user_create) VALUES ('Estudiante', NEWID())
-        END
+    _insert_missing("roles", "name = 'Estudiante'", f"""
+        INSERT INTO roles (name, id_user_create) SELECT 'Estudiante', {dialect.new_id}
     """)
 
     # Usuario admin
-    db.execute_non_query("""
-        IF NOT EXISTS (SELECT 1 FROM users WHERE name = 'Admin')
-        BEGIN
-            INSERT INTO users (id_user, name, last_name, id_role, birthdate, id_user_create)
-            VALUES (NEWID(), 'Admin', 'Root', 1, '1990-01-01', NEWID())
-        END
+    _insert_missing("users", "name = 'Admin'", f"""
+        INSERT INTO users (id_user, name, last_name, id_role, birthdate, id_user_create)
+        SELECT {dialect.new_id}, 'Admin', 'Root', 1, '1990-01-01', {dialect.new_id}
     """)
 
-    db.execute_non_query("""
-        IF NOT EXISTS (SELECT 1 FROM login WHERE username = 'admin')
-        BEGIN
-            INSERT INTO login (username, password_hash, id_user, id_user_create)
-            SELECT 
-                'admin',
-                CONVERT(VARCHAR(64), HASHBYTES('SHA2_256', '123456'), 2), -- HEX
-                id_user,
-                NEWID()
-            FROM users WHERE name = 'Admin'
-        END
+    # SHA-256 legacy en HEX (mismo valor que HASHBYTES + CONVERT); se migra a bcrypt al primer login
+    admin_hash = hashlib.sha256(b"123456").hexdigest().upper()
+    db.execute_non_query(f"""
+        INSERT INTO login (username, password_hash, id_user, id_user_create)
+        SELECT 'admin', '{admin_hash}', id_user, {dialect.new_id}
+        FROM users WHERE name = 'Admin'
+        AND NOT EXISTS (SELECT 1 FROM login WHERE username = 'admin')
     """)
 
     # Área inicial
-    db.execute_non_query("""
-        IF NOT EXISTS (SELECT 1 FROM area WHERE name = 'Ciencias Básicas')
-        BEGIN
-            INSERT INTO area (name, id_user_create)
-            VALUES ('Ciencias Básicas', NEWID())
-        END
+    _insert_missing("area", "name = 'Ciencias Básicas'", f"""
+        INSERT INTO area (name, id_user_create) SELECT 'Ciencias Básicas', {dialect.new_id}
     """)
 
     # Materia inicial
-    db.execute_non_query("""
-        IF NOT EXISTS (SELECT 1 FROM subjects WHERE name = 'Matemáticas I')
-        BEGIN
-            INSERT INTO subjects (id_subj, name, credits, id_area, id_user_create)
-            SELECT NEWID(), 'Matemáticas I', 4, id_area, NEWID() FROM area WHERE name = 'Ciencias Básicas'
-        END
+    db.execute_non_query(f"""
+        INSERT INTO subjects (id_subj, name, credits, id_area, id_user_create)
+        SELECT {dialect.new_id}, 'Matemáticas I', 4, id_area, {dialect.new_id}
+        FROM area WHERE name = 'Ciencias Básicas'
+        AND NOT EXISTS (SELECT 1 FROM subjects WHERE name = 'Matemáticas I')
     """)
 
     print("Datos de prueba insertados ✅")
 
 
+def rebuild_grade_summary():
+    # Recalcula todo el resumen (las escrituras lo mantienen luego por estudiante)
+    # (una sola transacción: execute_non_query hace commit al final)
+    db.execute_non_query(
+        "DELETE FROM grade_summary",
+        f"INSERT INTO grade_summary ({SUMMARY_COLUMNS}) {GRADE_AGGREGATE.format(where='')}",
+    )
+
+    print("Resumen de promedios reconstruido ✅")
+
+
 if __name__ == "__main__":
     migrate_database()
@@ -0,0 +1,46 @@
+# routers/admin.py
+from fastapi import APIRouter, Depends
+
+from core.cache import cache_stats
+from core.events import broker
+from core.idempotency import idempotency
+from core.ratelimit import rate_limiter
+from core.instrumentation import TimedRoute
+from core.security import verificar_token, hashing_pool
+from database.pool import pool_status
+from database.queries import query_stats
+from deps.db import replica_router
+
+router = APIRouter(prefix="/admin", tags=["Admin"], route_class=TimedRoute)
+
+@router.get("/pool", summary="Estado y métricas del pool de conexiones")
+async def get_pool_status(token_data: dict = Depends(verificar_token)):
+    return pool_status()
+
+@router.get("/cache", summary="Estadísticas de las cachés en proceso")
+async def get_cache_stats(token_data: dict = Depends(verificar_token)):
+    return cache_stats()
+
+@router.get("/hashing", summary="Cola y concurrencia del pool de bcrypt")
+async def get_hashing_stats(token_data: dict = Depends(verificar_token)):
+    return hashing_pool.stats()
+
+@router.get("/queries", summary="Registro de sentencias y aciertos del compiled cache")
+async def get_query_stats(token_data: dict = Depends(verificar_token)):
+    return query_stats()
+
+@router.get("/replica", summary="Salud de la réplica de lectura y lecturas enrutadas")
+async def get_replica_stats(token_data: dict = Depends(verificar_token)):
+    return replica_router.stats()
+
+@router.get("/idempotency", summary="Respuestas guardadas y repetidas por Idempotency-Key")
+async def get_idempotency_stats(token_data: dict = Depends(verificar_token)):
+    return idempotency.stats()
+
+@router.get("/events", summary="Conexiones y eventos de GET /notes/events")
+async def get_events_stats(token_data: dict = Depends(verificar_token)):
+    return broker.stats()
+
+@router.get("/ratelimit", summary="Peticiones limitadas (429) y rechazadas por concurrencia (503)")
+async def get_ratelimit_stats(token_data: dict = Depends(verificar_token)):
+    return rate_limiter.stats()
@@ -1,105 +1,170 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
-from sqlalchemy import text
-from deps.db import get_db
-from schemas.area import AreaCreate, AreaUpdate, AreaOut
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from database.dialect import dialect
+from database.queries import queries, sql
+from deps.db import get_db, get_primary_db, DBSession
+from core.instrumentation import TimedRoute
+from core.cache import VersionedCache, shared_backend
+from core.config import BATCH_GET_MAX_IDS, REFERENCE_CACHE_TTL, REFERENCE_CACHE_SIZE
+from core.conditional import check_row
+from core.batch import fetch_many
+from core.export import export_response
+from core.pagination import fetch_page
+from schemas.area import AreaCreate, AreaUpdate, AreaBatchGet, AreaOut
+from typing import Dict, List, Optional
+from datetime import datetime
 from fastapi import Depends, APIRouter, HTTPException, status
 from core.security import verificar_token  # ✅ Importación correcta
 
-router = APIRouter(prefix="/areas", tags=["Areas"])
+router = APIRouter(prefix="/areas", tags=["Areas"], route_class=TimedRoute)
+
+# Columnas que devuelven los INSERT/UPDATE (OUTPUT o RETURNING según el motor)
+AREA_COLUMNS = "id_area, name, is_active, create_date, modify_date"
+
+# Datos de referencia: caché con invalidación al escribir. Sus GET leen del
+# primario (no de la réplica) para no cachear filas atrasadas
+areas_cache = VersionedCache(
+    "area", maxsize=REFERENCE_CACHE_SIZE, ttl=REFERENCE_CACHE_TTL, backend=shared_backend()
+)
 
 @router.get("/", response_model=List[AreaOut])
-def list_areas(
+async def list_areas(
+    request: Request,
+    response: Response,
     page: int = Query(1, ge=1),
     size: int = Query(20, ge=1, le=200),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="Cursor de X-Next-Cursor (paginación keyset)"),
+    is_active: Optional[bool] = Query(None),
+    date_from: Optional[datetime] = Query(None, description="create_date >= date_from"),
+    date_to: Optional[datetime] = Query(None, description="create_date < date_to"),
+    sort: str = Query("-create_date", pattern="^-?(create_date|name)$", description="Campo de orden; prefijo - = descendente"),
+    db: DBSession = Depends(get_primary_db),
     token_data: dict = Depends(verificar_token)  # ✅ Token requerido
 ):
-    offset = (page - 1) * size
-    q = text("""
-        SELECT id_area, name, is_active, create_date, modify_date
-        FROM area
-        ORDER BY create_date DESC
-        OFFSET :offset ROWS FETCH NEXT :size ROWS ONLY
-    """)
-    rows = db.execute(q, {"offset": offset, "size": size}).mappings().all()
-    return rows
+    return await fetch_page(
+        db, response, request=request,
+        table="area",
+        columns="id_area, name, is_active, create_date, modify_date",
+        pk="id_area",
+        page=page, size=size, cursor=cursor,
+        filters={"is_active": is_active},
+        date_from=date_from, date_to=date_to,
+        sort=sort, sort_keys=("create_date", "name"),
+        cache=areas_cache,
+    )
+
+@router.get("/export", summary="Exportar áreas (NDJSON o CSV, streaming)")
+async def export_areas(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    date_from: Optional[datetime] = Query(None, description="create_date >= date_from"),
+    date_to: Optional[datetime] = Query(None, description="create_date < date_to"),
+    token_data: dict = Depends(verificar_token)  # ✅ Token requerido
+):
+    return export_response(
+        table="area",
+        columns=["id_area", "name", "is_active", "create_date", "modify_date"],
+        pk="id_area",
+        fmt=format, date_from=date_from, date_to=date_to,
+    )
+
+@router.post("/batch-get", response_model=Dict[str, AreaOut])
+async def batch_get_areas(
+    payload: AreaBatchGet,
+    db: DBSession = Depends(get_db),
+    token_data: dict = Depends(verificar_token)  # ✅ Token requerido
+):
+    # Una consulta IN (...) en vez de un GET por id; respuesta {id: objeto}
+    if len(payload.ids) > BATCH_GET_MAX_IDS:
+        raise HTTPException(status_code=413, detail=f"Máximo {BATCH_GET_MAX_IDS} ids por petición")
+    return await fetch_many(
+        db,
+        table="area",
+        columns="id_area, name, is_active, create_date, modify_date",
+        pk="id_area",
+        ids=payload.ids,
+        cache=areas_cache,
+    )
 
 @router.get("/{id_area}", response_model=AreaOut)
-def get_area(
+async def get_area(
+    request: Request,
+    response: Response,
     id_area: int,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_primary_db),
     token_data: dict = Depends(verificar_token)  # ✅ Token requerido
 ):
-    q = text("""
+    version = await areas_cache.version()
+    cached = await areas_cache.get(str(id_area), version)
+    if cached is not None:
+        return check_row(request, response, "area", "id_area", cached) or cached
+    q = sql("""
         SELECT id_area, name, is_active, create_date, modify_date
         FROM area WHERE id_area = :id_area
     """)
-    row = db.execute(q, {"id_area": id_area}).mappings().first()
+    row = (await db.execute(q, {"id_area": id_area})).mappings().first()
     if not row:
         raise HTTPException(status_code=404, detail="Área no encontrada")
-    return row
+    await areas_cache.set(str(id_area), dict(row), version)
+    return check_row(request, response, "area", "id_area", row) or row
 
 @router.post("/", response_model=AreaOut, status_code=status.HTTP_201_CREATED)
-def create_area(
+async def create_area(
     payload: AreaCreate,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_db),
     token_data: dict = Depends(verificar_token)  # ✅ Token requerido
 ):
-    q = text("""
+    q = sql(f"""
         INSERT INTO area (name, id_user_create)
-        OUTPUT INSERTED.id_area, INSERTED.name, INSERTED.is_active, INSERTED.create_date, INSERTED.modify_date
-        VALUES (:name, NEWID())
+        {dialect.output(AREA_COLUMNS)}
+        VALUES (:name, {dialect.new_id})
+        {dialect.returning(AREA_COLUMNS)}
     """)
-    row = db.execute(q, {"name": payload.name}).mappings().first()
-    db.commit()
+    row = (await db.execute(q, {"name": payload.name})).mappings().first()
+    await db.commit()
+    await areas_cache.invalidate()
     return row
 
 @router.put("/{id_area}", response_model=AreaOut)
-def update_area(
+async def update_area(
     id_area: int,
     payload: AreaUpdate,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_db),
     token_data: dict = Depends(verificar_token)  # ✅ Token requerido
 ):
-    sets = []
-    params = {"id_area": id_area}
-    if payload.name is not None:
-        sets.append("name = :name")
-        params["name"] = payload.name
-    if payload.is_active is not None:
-        sets.append("is_active = :is_active")
-        params["is_active"] = payload.is_active
-    if not sets:
+    if not payload.model_dump(exclude_none=True):
         raise HTTPException(status_code=400, detail="Nada para actualizar")
-    sets.append("modify_date = SYSDATETIME()")
-    q = text(f"""
-        UPDATE area SET {", ".join(sets)}
-        OUTPUT INSERTED.id_area, INSERTED.name, INSERTED.is_active, INSERTED.create_date, INSERTED.modify_date
-        WHERE id_area = :id_area
-    """)
-    row = db.execute(q, params).mappings().first()
+    q = queries.update(
+        "area", ("name", "is_active"), pk="id_area",
+        returning=AREA_COLUMNS,
+    )
+    params = {
+        "id_area": id_area,
+        "name": payload.name,
+        "is_active": payload.is_active,
+    }
+    row = (await db.execute(q, params)).mappings().first()
     if not row:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=404, detail="Área no encontrada")
-    db.commit()
+    await db.commit()
+    await areas_cache.invalidate()
     return row
 
 @router.delete("/{id_area}", response_model=AreaOut)
-def delete_area(
+async def delete_area(
     id_area: int,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_db),
     token_data: dict = Depends(verificar_token)  # ✅ Token requerido
 ):
-    q = text("""
-        UPDATE area SET is_active = 0, modify_date = SYSDATETIME()
-        OUTPUT INSERTED.id_area, INSERTED.name, INSERTED.is_active, INSERTED.create_date, INSERTED.modify_date
+    q = sql(f"""
+        UPDATE area SET is_active = {dialect.false}, modify_date = {dialect.now}
+        {dialect.output(AREA_COLUMNS)}
         WHERE id_area = :id_area
+        {dialect.returning(AREA_COLUMNS)}
     """)
-    row = db.execute(q, {"id_area": id_area}).mappings().first()
+    row = (await db.execute(q, {"id_area": id_area})).mappings().first()
     if not row:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=404, detail="Área no encontrada")
-    db.commit()
+    await db.commit()
+    await areas_cache.invalidate()
     return row
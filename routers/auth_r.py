@@ -1,26 +1,42 @@
 # routers/auth.py
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import text
-from deps.db import get_db
-from core.security import verify_password, create_access_token, needs_rehash, hash_password
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+from database.queries import sql
+from deps.db import get_db, open_db, DBSession
+from core.instrumentation import TimedRoute
+from core.security import verify_password_async, create_access_token, needs_rehash, hash_password_async
 from schemas.auth import Token, LoginRequest
 
-router = APIRouter(prefix="/auth", tags=["Auth"])
+router = APIRouter(prefix="/auth", tags=["Auth"], route_class=TimedRoute)
+
+async def rehash_password(login_id: int, raw: str):
+    # Upgrade silencioso de hash, después de responder (no bloqueamos login si falla)
+    try:
+        new_hash = await hash_password_async(raw)
+        async with open_db() as db:
+            await db.execute(
+                sql("UPDATE login SET password_hash = :ph WHERE id = :id"),
+                {"ph": new_hash, "id": login_id}
+            )
+            await db.commit()
+    except Exception:
+        pass
 
 @router.post("/token", response_model=Token)
-def login_for_access_token(
+async def login_for_access_token(
     payload: LoginRequest,
-    db: Session = Depends(get_db),
+    background_tasks: BackgroundTasks,
+    db: DBSession = Depends(get_db),
 ):
     # Traemos login y usuario activo
-    q = text("""
+    q = sql("""
         SELECT l.id, l.username, l.password_hash, l.id_user, l.is_active, u.is_active AS user_active
         FROM login l
         INNER JOIN users u ON u.id_user = l.id_user
         WHERE l.username = :username
     """)
-    row = db.execute(q, {"username": payload.username}).mappings().first()
+    row = (await db.execute(q, {"username": payload.username})).mappings().first()
+    # Devolvemos la conexión al pool antes de bcrypt (no la retenemos ~250 ms)
+    await db.rollback()
 
     if not row or not row["is_active"] or not row["user_active"]:
         raise HTTPException(
@@ -29,23 +45,16 @@ def login_for_access_token(
         )
 
     # Verifica contraseña (bcrypt primero; fallback SHA-256 legacy)
-    if not verify_password(payload.password, row["password_hash"]):
+    # bcrypt va al pool dedicado (429 si está saturado)
+    if not await verify_password_async(payload.password, row["password_hash"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, 
             detail="Credenciales inválidas"
         )
 
-    # Upgrade silencioso de hash si es necesario
-    try:
-        if needs_rehash(row["password_hash"]):
-            new_hash = hash_password(payload.password)
-            db.execute(
-                text("UPDATE login SET password_hash = :ph WHERE id = :id"),
-                {"ph": new_hash, "id": row["id"]}
-            )
-            db.commit()
-    except Exception:
-        pass  # no bloqueamos login si falla
+    # Upgrade silencioso de hash si es necesario (fuera del camino crítico)
+    if needs_rehash(row["password_hash"]):
+        background_tasks.add_task(rehash_password, row["id"], payload.password)
 
     # Emitimos JWT con id_user como 'sub'
     access_token = create_access_token({"sub": str(row["id_user"])})
@@ -0,0 +1,41 @@
+# routers/changes.py
+from fastapi import APIRouter, Depends, Query
+from typing import Optional
+
+from core.changes import fetch_changes
+from core.config import CHANGES_MAX_LIMIT
+from core.instrumentation import TimedRoute
+from core.security import verificar_token
+from deps.db import get_primary_db, DBSession
+from routers.area import AREA_COLUMNS
+from routers.notes import NOTE_COLUMNS
+from routers.roles import ROLE_COLUMNS
+from routers.subjects import SUBJECT_COLUMNS
+from routers.users import USER_COLUMNS
+from schemas.changes import ChangesOut
+
+router = APIRouter(prefix="/changes", tags=["Changes"], route_class=TimedRoute)
+
+# (tabla, pk, columnas) en el orden de desempate del feed
+FEEDS = [
+    ("roles", "id", ROLE_COLUMNS),
+    ("users", "id_user", USER_COLUMNS),
+    ("area", "id_area", AREA_COLUMNS),
+    ("subjects", "id_subj", SUBJECT_COLUMNS),
+    ("notes", "id", NOTE_COLUMNS),
+]
+TABLES_PATTERN = "^(roles|users|area|subjects|notes)(,(roles|users|area|subjects|notes))*$"
+
+@router.get("", response_model=ChangesOut, summary="Cambios (altas, ediciones y bajas) desde un token")
+@router.get("/", response_model=ChangesOut, include_in_schema=False)  # sin redirect 307 por la barra
+async def list_changes(
+    since: Optional[str] = Query(None, description="Token `next` de la respuesta anterior o fecha ISO; vacío = desde el inicio"),
+    limit: int = Query(500, ge=1, le=CHANGES_MAX_LIMIT),
+    tables: Optional[str] = Query(None, pattern=TABLES_PATTERN, description="Subconjunto de tablas (el token queda ligado a él)"),
+    # Primario: en la réplica una fila atrasada quedaría detrás del cursor y se perdería
+    db: DBSession = Depends(get_primary_db),
+    token_data: dict = Depends(verificar_token),
+):
+    selected = set(tables.split(",")) if tables else None
+    feeds = [feed for feed in FEEDS if selected is None or feed[0] in selected]
+    return await fetch_changes(db, feeds, since=since, limit=limit)
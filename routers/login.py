@@ -1,110 +1,122 @@
 # routers/login.py
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
-from sqlalchemy import text
-from deps.db import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from database.dialect import dialect
+from database.queries import queries, sql
+from deps.db import get_db, DBSession
+from core.instrumentation import TimedRoute
+from core.conditional import check_row
+from core.pagination import fetch_page
 from schemas.login import LoginCreate, LoginUpdate, LoginOut
-from typing import List
+from typing import List, Optional
+from datetime import datetime
 from uuid import UUID
 import hashlib
 
-router = APIRouter(prefix="/login", tags=["Login"])
+router = APIRouter(prefix="/login", tags=["Login"], route_class=TimedRoute)
+
+# Columnas que devuelven los INSERT/UPDATE (OUTPUT o RETURNING según el motor)
+LOGIN_COLUMNS = "id, username, id_user, is_active, create_date, modify_date"
 
 def hash_password(raw: str) -> str:
     # Reemplaza por passlib[bcrypt] si está disponible
     return hashlib.sha256(raw.encode("utf-8")).hexdigest().upper()
 
 @router.get("/", response_model=List[LoginOut])
-def list_logins(
+async def list_logins(
+    request: Request,
+    response: Response,
     page: int = Query(1, ge=1),
     size: int = Query(20, ge=1, le=200),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="Cursor de X-Next-Cursor (paginación keyset)"),
+    id_user: Optional[UUID] = Query(None),
+    is_active: Optional[bool] = Query(None),
+    date_from: Optional[datetime] = Query(None, description="create_date >= date_from"),
+    date_to: Optional[datetime] = Query(None, description="create_date < date_to"),
+    sort: str = Query("-create_date", pattern="^-?(create_date|username)$", description="Campo de orden; prefijo - = descendente"),
+    db: DBSession = Depends(get_db),
 ):
-    offset = (page - 1) * size
-    q = text("""
-        SELECT id, username, id_user, is_active, create_date, modify_date
-        FROM login
-        ORDER BY create_date DESC
-        OFFSET :offset ROWS FETCH NEXT :size ROWS ONLY
-    """)
-    rows = db.execute(q, {"offset": offset, "size": size}).mappings().all()
-    return rows
+    return await fetch_page(
+        db, response, request=request,
+        table="login",
+        columns="id, username, id_user, is_active, create_date, modify_date",
+        pk="id",
+        page=page, size=size, cursor=cursor,
+        filters={"id_user": str(id_user) if id_user else None, "is_active": is_active},
+        date_from=date_from, date_to=date_to,
+        sort=sort, sort_keys=("create_date", "username"),
+    )
 
 @router.get("/{id}", response_model=LoginOut)
-def get_login(id: int, db: Session = Depends(get_db)):
-    q = text("""
+async def get_login(id: int, request: Request, response: Response, db: DBSession = Depends(get_db)):
+    q = sql("""
         SELECT id, username, id_user, is_active, create_date, modify_date
         FROM login WHERE id = :id
     """)
-    row = db.execute(q, {"id": id}).mappings().first()
+    row = (await db.execute(q, {"id": id})).mappings().first()
     if not row:
         raise HTTPException(status_code=404, detail="Registro de login no encontrado")
-    return row
+    return check_row(request, response, "login", "id", row) or row
 
 @router.post("/", response_model=LoginOut, status_code=status.HTTP_201_CREATED)
-def create_login(payload: LoginCreate, db: Session = Depends(get_db)):
+async def create_login(payload: LoginCreate, db: DBSession = Depends(get_db)):
     # Enforce unique username (db también tiene UNIQUE)
-    exists_q = text("SELECT 1 FROM login WHERE username = :u")
-    if db.execute(exists_q, {"u": payload.username}).first():
+    exists_q = sql("SELECT 1 FROM login WHERE username = :u")
+    if (await db.execute(exists_q, {"u": payload.username})).first():
         raise HTTPException(status_code=409, detail="El username ya existe")
 
-    q = text("""
+    q = sql(f"""
         INSERT INTO login (username, password_hash, id_user, id_user_create)
-        OUTPUT INSERTED.id, INSERTED.username, INSERTED.id_user, INSERTED.is_active, INSERTED.create_date, INSERTED.modify_date
-        SELECT :username, :password_hash, :id_user, NEWID()
+        {dialect.output(LOGIN_COLUMNS)}
+        SELECT :username, :password_hash, :id_user, {dialect.new_id}
+        {dialect.returning(LOGIN_COLUMNS)}
     """)
     params = {
         "username": payload.username,
         "password_hash": hash_password(payload.password),
         "id_user": str(payload.id_user),
     }
-    row = db.execute(q, params).mappings().first()
-    db.commit()
+    row = (await db.execute(q, params)).mappings().first()
+    await db.commit()
     return row
 
 @router.put("/{id}", response_model=LoginOut)
-def update_login(id: int, payload: LoginUpdate, db: Session = Depends(get_db)):
-    sets = []
-    params = {"id": id}
+async def update_login(id: int, payload: LoginUpdate, db: DBSession = Depends(get_db)):
+    if not payload.model_dump(exclude_none=True):
+        raise HTTPException(status_code=400, detail="Nada para actualizar")
     if payload.username is not None:
         # check uniqueness
-        exists_q = text("SELECT 1 FROM login WHERE username = :u AND id <> :id")
-        if db.execute(exists_q, {"u": payload.username, "id": id}).first():
+        exists_q = sql("SELECT 1 FROM login WHERE username = :u AND id <> :id")
+        if (await db.execute(exists_q, {"u": payload.username, "id": id})).first():
             raise HTTPException(status_code=409, detail="El username ya está en uso")
-        sets.append("username = :username")
-        params["username"] = payload.username
-    if payload.password is not None:
-        sets.append("password_hash = :password_hash")
-        params["password_hash"] = hash_password(payload.password)
-    if payload.is_active is not None:
-        sets.append("is_active = :is_active")
-        params["is_active"] = payload.is_active
-    if not sets:
-        raise HTTPException(status_code=400, detail="Nada para actualizar")
 
-    sets.append("modify_date = SYSDATETIME()")
-    q = text(f"""
-        UPDATE login SET {", ".join(sets)}
-        OUTPUT INSERTED.id, INSERTED.username, INSERTED.id_user, INSERTED.is_active, INSERTED.create_date, INSERTED.modify_date
-        WHERE id = :id
-    """)
-    row = db.execute(q, params).mappings().first()
+    q = queries.update(
+        "login", ("username", "password_hash", "is_active"), pk="id",
+        returning=LOGIN_COLUMNS,
+    )
+    params = {
+        "id": id,
+        "username": payload.username,
+        "password_hash": hash_password(payload.password) if payload.password is not None else None,
+        "is_active": payload.is_active,
+    }
+    row = (await db.execute(q, params)).mappings().first()
     if not row:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=404, detail="Registro de login no encontrado")
-    db.commit()
+    await db.commit()
     return row
 
 @router.delete("/{id}", response_model=LoginOut)
-def delete_login(id: int, db: Session = Depends(get_db)):
-    q = text("""
-        UPDATE login SET is_active = 0, modify_date = SYSDATETIME()
-        OUTPUT INSERTED.id, INSERTED.username, INSERTED.id_user, INSERTED.is_active, INSERTED.create_date, INSERTED.modify_date
+async def delete_login(id: int, db: DBSession = Depends(get_db)):
+    q = sql(f"""
+        UPDATE login SET is_active = {dialect.false}, modify_date = {dialect.now}
+        {dialect.output(LOGIN_COLUMNS)}
         WHERE id = :id
+        {dialect.returning(LOGIN_COLUMNS)}
     """)
-    row = db.execute(q, {"id": id}).mappings().first()
+    row = (await db.execute(q, {"id": id})).mappings().first()
     if not row:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=404, detail="Registro de login no encontrado")
-    db.commit()
+    await db.commit()
     return row
\ No newline at end of file
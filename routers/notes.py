@@ -1,91 +1,306 @@
 # routers/notes.py
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
-from sqlalchemy import text
-from deps.db import get_db
-from schemas.notes import NoteCreate, NoteUpdate, NoteOut
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from database.dialect import dialect
+from database.queries import queries, sql
+from deps.auth import get_current_user
+from deps.db import get_db, open_db, DBSession
+from core.instrumentation import TimedRoute
+from core.config import (
+    NOTES_BULK_MAX_ROWS, NOTES_BULK_BATCH_SIZE,
+    EVENTS_HEARTBEAT_SECONDS, EVENTS_MAX_CONNECTIONS, EVENTS_STUDENT_ROLE,
+)
+from core.conditional import check_row
+from core.batch import batch_key, batch_result, fetch_many, patch_rows, update_many
+from core.events import broker, publish_notes, resync_notes, stream, subject_topic, user_topic
+from core.export import export_response
+from core.grades import refresh_grade_summary
+from core.idempotency import idempotency
+from core.pagination import fetch_page
+from routers.subjects import subjects_cache
+from schemas.auth import CurrentUser
+from schemas.notes import (
+    NoteCreate, NoteUpdate, NoteOut, NoteExpandedOut, NoteBulkCreate, NoteBulkRow, NoteBulkOut,
+    NoteBatchPatch, NoteBatchOut,
+)
+from typing import List, Optional
+from datetime import datetime
+from uuid import UUID
 
-router = APIRouter(prefix="/notes", tags=["Notes"])
+router = APIRouter(prefix="/notes", tags=["Notes"], route_class=TimedRoute)
 
-@router.get("/", response_model=List[NoteOut])
-def list_notes(
+# Columnas que devuelven los INSERT/UPDATE (OUTPUT o RETURNING según el motor)
+NOTE_COLUMNS = "id, id_user, id_subj, grade, is_active, create_date, modify_date"
+
+async def _expand_notes(db: DBSession, rows, expand: set) -> list:
+    # Un IN (...) por entidad para toda la página (no un GET por fila); materias desde caché
+    users, subjects = {}, {}
+    if "user" in expand:
+        users = await fetch_many(
+            db, table="users",
+            columns="id_user, name, last_name, id_role, birthdate, is_active, create_date, modify_date",
+            pk="id_user", ids=[str(row["id_user"]) for row in rows],
+        )
+    if "subject" in expand:
+        subjects = await fetch_many(
+            db, table="subjects",
+            columns="id_subj, name, credits, id_area, is_active, create_date, modify_date",
+            pk="id_subj", ids=[str(row["id_subj"]) for row in rows], cache=subjects_cache,
+        )
+    expanded = []
+    for row in rows:
+        item = dict(row)
+        if "user" in expand:
+            item["user"] = users.get(batch_key(row["id_user"]))
+        if "subject" in expand:
+            item["subject"] = subjects.get(batch_key(row["id_subj"]))
+        expanded.append(item)
+    return expanded
+
+@router.get("/", response_model=List[NoteExpandedOut], response_model_exclude_unset=True)
+async def list_notes(
+    request: Request,
+    response: Response,
     page: int = Query(1, ge=1),
     size: int = Query(20, ge=1, le=200),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="Cursor de X-Next-Cursor (paginación keyset)"),
+    id_user: Optional[UUID] = Query(None),
+    id_subj: Optional[UUID] = Query(None),
+    is_active: Optional[bool] = Query(None),
+    date_from: Optional[datetime] = Query(None, description="create_date >= date_from"),
+    date_to: Optional[datetime] = Query(None, description="create_date < date_to"),
+    sort: str = Query("-create_date", pattern="^-?(create_date|grade)$", description="Campo de orden; prefijo - = descendente"),
+    expand: Optional[str] = Query(None, pattern="^(user|subject)(,(user|subject))*$", description="Embebe user y/o subject en cada nota"),
+    db: DBSession = Depends(get_db),
 ):
-    offset = (page - 1) * size
-    q = text("""
-        SELECT id, id_user, id_subj, grade, is_active, create_date, modify_date
-        FROM notes
-        ORDER BY create_date DESC
-        OFFSET :offset ROWS FETCH NEXT :size ROWS ONLY
-    """)
-    rows = db.execute(q, {"offset": offset, "size": size}).mappings().all()
-    return rows
+    expand_set = set(expand.split(",")) if expand else set()
+    return await fetch_page(
+        db, response, request=request,
+        table="notes",
+        columns="id, id_user, id_subj, grade, is_active, create_date, modify_date",
+        pk="id",
+        page=page, size=size, cursor=cursor,
+        filters={
+            "id_user": str(id_user) if id_user else None,
+            "id_subj": str(id_subj) if id_subj else None,
+            "is_active": is_active,
+        },
+        date_from=date_from, date_to=date_to,
+        sort=sort, sort_keys=("create_date", "grade"),
+        expand=(lambda rows: _expand_notes(db, rows, expand_set)) if expand_set else None,
+    )
+
+@router.get("/export", summary="Exportar notas (NDJSON o CSV, streaming)")
+async def export_notes(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    date_from: Optional[datetime] = Query(None, description="create_date >= date_from"),
+    date_to: Optional[datetime] = Query(None, description="create_date < date_to"),
+):
+    return export_response(
+        table="notes",
+        columns=["id", "id_user", "id_subj", "grade", "is_active", "create_date", "modify_date"],
+        pk="id",
+        fmt=format, date_from=date_from, date_to=date_to,
+    )
+
+@router.get("/events", summary="Notas en vivo (Server-Sent Events)")
+async def note_events(
+    id_subj: Optional[UUID] = Query(None, description="Seguir una materia en vez de las notas propias (no para estudiantes)"),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    """
+    Un evento "note" ({"op": insert|update|delete, "note": {...}}) por cada nota creada,
+    modificada o desactivada del usuario del token (o de la materia `id_subj`).
+    Un evento "resync" indica que se perdieron eventos: volver a leer GET /notes/.
+    """
+    if broker.connections >= EVENTS_MAX_CONNECTIONS:
+        raise HTTPException(status_code=503, detail="Demasiadas conexiones abiertas", headers={"Retry-After": "5"})
+    if id_subj is None:
+        topic = user_topic(current_user.id_user)
+    else:
+        async with open_db() as db:
+            role = (await db.execute(sql("SELECT name FROM roles WHERE id = :id"), {"id": current_user.id_role})).scalar()
+        if role == EVENTS_STUDENT_ROLE:
+            raise HTTPException(status_code=403, detail="Solo puedes seguir tus propias notas")
+        topic = subject_topic(id_subj)
+    return StreamingResponse(
+        stream([topic], EVENTS_HEARTBEAT_SECONDS),
+        media_type="text/event-stream",
+        # Sin caché ni buffering de proxies (nginx) entre el evento y el cliente
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @router.get("/{id}", response_model=NoteOut)
-def get_note(id: int, db: Session = Depends(get_db)):
-    q = text("""
+async def get_note(id: int, request: Request, response: Response, db: DBSession = Depends(get_db)):
+    q = sql("""
         SELECT id, id_user, id_subj, grade, is_active, create_date, modify_date
         FROM notes WHERE id = :id
     """)
-    row = db.execute(q, {"id": id}).mappings().first()
+    row = (await db.execute(q, {"id": id})).mappings().first()
     if not row:
         raise HTTPException(status_code=404, detail="Nota no encontrada")
-    return row
+    return check_row(request, response, "notes", "id", row) or row
 
 @router.post("/", response_model=NoteOut, status_code=status.HTTP_201_CREATED)
-def create_note(payload: NoteCreate, db: Session = Depends(get_db)):
-    q = text("""
+async def create_note(payload: NoteCreate, db: DBSession = Depends(get_db)):
+    q = sql(f"""
         INSERT INTO notes (id_user, id_subj, grade, id_user_create)
-        OUTPUT INSERTED.id, INSERTED.id_user, INSERTED.id_subj, INSERTED.grade, INSERTED.is_active, INSERTED.create_date, INSERTED.modify_date
-        VALUES (:id_user, :id_subj, :grade, NEWID())
+        {dialect.output(NOTE_COLUMNS)}
+        VALUES (:id_user, :id_subj, :grade, {dialect.new_id})
+        {dialect.returning(NOTE_COLUMNS)}
     """)
     params = {
         "id_user": str(payload.id_user),
         "id_subj": str(payload.id_subj),
         "grade": payload.grade
     }
-    row = db.execute(q, params).mappings().first()
-    db.commit()
+    row = (await db.execute(q, params)).mappings().first()
+    await refresh_grade_summary(db, id_users=[params["id_user"]])
+    await db.commit()
+    await publish_notes([row])
     return row
 
+def _chunks(seq, n):
+    for i in range(0, len(seq), n):
+        yield seq[i:i + n]
+
+async def _existing_ids(db: DBSession, table: str, column: str, ids) -> set:
+    q = sql(f"SELECT {column} FROM {table} WHERE {column} IN :ids", expanding=("ids",))
+    found = set()
+    # SQL Server admite como máximo 2100 parámetros por sentencia
+    for chunk in _chunks(sorted(ids), 1000):
+        found.update(str(v).lower() for v in (await db.execute(q, {"ids": chunk})).scalars())
+    return found
+
+@router.post("/bulk", response_model=NoteBulkOut, status_code=status.HTTP_201_CREATED)
+async def create_notes_bulk(
+    payload: NoteBulkCreate,
+    response: Response,
+    all_or_nothing: bool = Query(False, description="Si alguna fila falla, no se inserta ninguna"),
+    db: DBSession = Depends(get_db),
+):
+    if len(payload.items) > NOTES_BULK_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"Máximo {NOTES_BULK_MAX_ROWS} filas por carga")
+
+    # 1) Validación de todas las filas en una pasada
+    results = []
+    candidates = []
+    for i, item in enumerate(payload.items):
+        try:
+            note = NoteCreate.model_validate(item)
+        except ValidationError as e:
+            errors = [{"loc": list(err["loc"]), "msg": err["msg"]} for err in e.errors()]
+            results.append(NoteBulkRow(index=i, status="error", errors=errors))
+            continue
+        candidates.append((i, {"id_user": str(note.id_user), "id_subj": str(note.id_subj), "grade": note.grade}))
+
+    # 2) FKs comprobadas por conjunto (un FK inválido abortaría toda la transacción)
+    users = await _existing_ids(db, "users", "id_user", {p["id_user"] for _, p in candidates})
+    subjects = await _existing_ids(db, "subjects", "id_subj", {p["id_subj"] for _, p in candidates})
+    valid = []
+    for i, params in candidates:
+        errors = []
+        if params["id_user"] not in users:
+            errors.append({"loc": ["id_user"], "msg": "Usuario no encontrado"})
+        if params["id_subj"] not in subjects:
+            errors.append({"loc": ["id_subj"], "msg": "Materia no encontrada"})
+        if errors:
+            results.append(NoteBulkRow(index=i, status="error", errors=errors))
+        else:
+            valid.append((i, params))
+
+    failed = len(results)
+    if failed and all_or_nothing:
+        results += [NoteBulkRow(index=i, status="skipped") for i, _ in valid]
+        valid = []
+
+    # 3) Inserción por lotes (executemany / fast_executemany) en una sola transacción
+    if valid:
+        q = sql(f"""
+            INSERT INTO notes (id_user, id_subj, grade, id_user_create)
+            VALUES (:id_user, :id_subj, :grade, {dialect.new_id})
+        """)
+        try:
+            for chunk in _chunks([params for _, params in valid], NOTES_BULK_BATCH_SIZE):
+                await db.execute(q, chunk)
+            await refresh_grade_summary(db, id_users={params["id_user"] for _, params in valid})
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        await resync_notes(params for _, params in valid)
+        results += [NoteBulkRow(index=i, status="created") for i, _ in valid]
+
+    if failed and not valid:
+        response.status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    results.sort(key=lambda r: r.index)
+    return NoteBulkOut(inserted=len(valid), failed=failed, results=results)
+
+@router.patch("/batch", response_model=NoteBatchOut, summary="Actualizar o desactivar varias notas")
+async def patch_notes_batch(
+    payload: NoteBatchPatch,
+    request: Request,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=200, description="Reintentos seguros: misma clave = misma respuesta"),
+    db: DBSession = Depends(get_db),
+):
+    rows = patch_rows(payload.items, "id")
+
+    async def write():
+        # Un UPDATE ... FROM sobre una tabla temporal, en una sola transacción
+        try:
+            updated = await update_many(
+                db, table="notes", pk="id", pk_type="INT",
+                columns={"grade": "DECIMAL(4,2)", "is_active": "{bool}"},
+                rows=rows, returning=NOTE_COLUMNS,
+            )
+            await refresh_grade_summary(db, id_users={row["id_user"] for row in updated})
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        await publish_notes(updated)
+        ordered, not_found = batch_result(rows, "id", updated)
+        return NoteBatchOut(updated=len(ordered), not_found=not_found, rows=ordered)
+
+    return await idempotency.run(request, response, idempotency_key, payload, write)
+
 @router.put("/{id}", response_model=NoteOut)
-def update_note(id: int, payload: NoteUpdate, db: Session = Depends(get_db)):
-    sets = []
-    params = {"id": id}
-    if payload.grade is not None:
-        sets.append("grade = :grade")
-        params["grade"] = payload.grade
-    if payload.is_active is not None:
-        sets.append("is_active = :is_active")
-        params["is_active"] = payload.is_active
-    if not sets:
+async def update_note(id: int, payload: NoteUpdate, db: DBSession = Depends(get_db)):
+    if not payload.model_dump(exclude_none=True):
         raise HTTPException(status_code=400, detail="Nada para actualizar")
-    sets.append("modify_date = SYSDATETIME()")
-    q = text(f"""
-        UPDATE notes SET {", ".join(sets)}
-        OUTPUT INSERTED.id, INSERTED.id_user, INSERTED.id_subj, INSERTED.grade, INSERTED.is_active, INSERTED.create_date, INSERTED.modify_date
-        WHERE id = :id
-    """)
-    row = db.execute(q, params).mappings().first()
+    q = queries.update(
+        "notes", ("grade", "is_active"), pk="id",
+        returning=NOTE_COLUMNS,
+    )
+    params = {
+        "id": id,
+        "grade": payload.grade,
+        "is_active": payload.is_active,
+    }
+    row = (await db.execute(q, params)).mappings().first()
     if not row:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=404, detail="Nota no encontrada")
-    db.commit()
+    await refresh_grade_summary(db, id_users=[row["id_user"]])
+    await db.commit()
+    await publish_notes([row])
     return row
 
 @router.delete("/{id}", response_model=NoteOut)
-def delete_note(id: int, db: Session = Depends(get_db)):
-    q = text("""
-        UPDATE notes SET is_active = 0, modify_date = SYSDATETIME()
-        OUTPUT INSERTED.id, INSERTED.id_user, INSERTED.id_subj, INSERTED.grade, INSERTED.is_active, INSERTED.create_date, INSERTED.modify_date
+async def delete_note(id: int, db: DBSession = Depends(get_db)):
+    q = sql(f"""
+        UPDATE notes SET is_active = {dialect.false}, modify_date = {dialect.now}
+        {dialect.output(NOTE_COLUMNS)}
         WHERE id = :id
+        {dialect.returning(NOTE_COLUMNS)}
     """)
-    row = db.execute(q, {"id": id}).mappings().first()
+    row = (await db.execute(q, {"id": id})).mappings().first()
     if not row:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=404, detail="Nota no encontrada")
-    db.commit()
+    await refresh_grade_summary(db, id_users=[row["id_user"]])
+    await db.commit()
+    await publish_notes([row])
     return row
@@ -0,0 +1,24 @@
+# routers/reports.py
+from fastapi import APIRouter, Depends, Query
+from typing import Optional
+from datetime import datetime
+
+from deps.db import get_db, DBSession
+from core.instrumentation import TimedRoute
+from deps.auth import get_current_user
+from core.grades import grade_report
+from schemas.auth import CurrentUser
+from schemas.reports import GradeReportOut
+
+router = APIRouter(prefix="/reports", tags=["Reports"], route_class=TimedRoute)
+
+@router.get("/grades", response_model=GradeReportOut, summary="Promedios de la cohorte por área")
+async def get_grade_report(
+    id_area: Optional[int] = Query(None),
+    id_role: Optional[int] = Query(None, description="Solo usuarios de este rol"),
+    date_from: Optional[datetime] = Query(None, description="Notas con create_date >= date_from"),
+    date_to: Optional[datetime] = Query(None, description="Notas con create_date < date_to"),
+    db: DBSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    return await grade_report(db, id_area=id_area, id_role=id_role, date_from=date_from, date_to=date_to)
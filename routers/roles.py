@@ -1,84 +1,144 @@
 # routers/roles.py
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
-from sqlalchemy import text
-from deps.db import get_db
-from schemas.roles import RoleCreate, RoleUpdate, RoleOut
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from database.dialect import dialect
+from database.queries import queries, sql
+from deps.db import get_db, get_primary_db, DBSession
+from core.instrumentation import TimedRoute
+from core.cache import VersionedCache, shared_backend
+from core.config import BATCH_GET_MAX_IDS, REFERENCE_CACHE_TTL, REFERENCE_CACHE_SIZE
+from core.conditional import check_row
+from core.batch import fetch_many
+from core.export import export_response
+from core.pagination import fetch_page
+from schemas.roles import RoleCreate, RoleUpdate, RoleBatchGet, RoleOut
+from typing import Dict, List, Optional
+from datetime import datetime
 
-router = APIRouter(prefix="/roles", tags=["Roles"])
+router = APIRouter(prefix="/roles", tags=["Roles"], route_class=TimedRoute)
+
+# Columnas que devuelven los INSERT/UPDATE (OUTPUT o RETURNING según el motor)
+ROLE_COLUMNS = "id, name, is_active, create_date, modify_date"
+
+# Datos de referencia: caché con invalidación al escribir. Sus GET leen del
+# primario (no de la réplica) para no cachear filas atrasadas
+roles_cache = VersionedCache(
+    "roles", maxsize=REFERENCE_CACHE_SIZE, ttl=REFERENCE_CACHE_TTL, backend=shared_backend()
+)
 
 @router.get("/", response_model=List[RoleOut])
-def list_roles(
+async def list_roles(
+    request: Request,
+    response: Response,
     page: int = Query(1, ge=1),
     size: int = Query(20, ge=1, le=200),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="Cursor de X-Next-Cursor (paginación keyset)"),
+    is_active: Optional[bool] = Query(None),
+    date_from: Optional[datetime] = Query(None, description="create_date >= date_from"),
+    date_to: Optional[datetime] = Query(None, description="create_date < date_to"),
+    sort: str = Query("-create_date", pattern="^-?(create_date|name)$", description="Campo de orden; prefijo - = descendente"),
+    db: DBSession = Depends(get_primary_db),
 ):
-    offset = (page - 1) * size
-    q = text("""
-        SELECT id, name, is_active, create_date, modify_date
-        FROM roles
-        ORDER BY create_date DESC
-        OFFSET :offset ROWS FETCH NEXT :size ROWS ONLY
-    """)
-    rows = db.execute(q, {"offset": offset, "size": size}).mappings().all()
-    return rows
+    return await fetch_page(
+        db, response, request=request,
+        table="roles",
+        columns="id, name, is_active, create_date, modify_date",
+        pk="id",
+        page=page, size=size, cursor=cursor,
+        filters={"is_active": is_active},
+        date_from=date_from, date_to=date_to,
+        sort=sort, sort_keys=("create_date", "name"),
+        cache=roles_cache,
+    )
+
+@router.get("/export", summary="Exportar roles (NDJSON o CSV, streaming)")
+async def export_roles(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    date_from: Optional[datetime] = Query(None, description="create_date >= date_from"),
+    date_to: Optional[datetime] = Query(None, description="create_date < date_to"),
+):
+    return export_response(
+        table="roles",
+        columns=["id", "name", "is_active", "create_date", "modify_date"],
+        pk="id",
+        fmt=format, date_from=date_from, date_to=date_to,
+    )
+
+@router.post("/batch-get", response_model=Dict[str, RoleOut])
+async def batch_get_roles(
+    payload: RoleBatchGet,
+    db: DBSession = Depends(get_db)
+):
+    # Una consulta IN (...) en vez de un GET por id; respuesta {id: objeto}
+    if len(payload.ids) > BATCH_GET_MAX_IDS:
+        raise HTTPException(status_code=413, detail=f"Máximo {BATCH_GET_MAX_IDS} ids por petición")
+    return await fetch_many(
+        db,
+        table="roles",
+        columns="id, name, is_active, create_date, modify_date",
+        pk="id",
+        ids=payload.ids,
+        cache=roles_cache,
+    )
 
 @router.get("/{role_id}", response_model=RoleOut)
-def get_role(role_id: int, db: Session = Depends(get_db)):
-    q = text("SELECT id, name, is_active, create_date, modify_date FROM roles WHERE id = :id")
-    row = db.execute(q, {"id": role_id}).mappings().first()
+async def get_role(role_id: int, request: Request, response: Response, db: DBSession = Depends(get_primary_db)):
+    version = await roles_cache.version()
+    cached = await roles_cache.get(str(role_id), version)
+    if cached is not None:
+        return check_row(request, response, "roles", "id", cached) or cached
+    q = sql("SELECT id, name, is_active, create_date, modify_date FROM roles WHERE id = :id")
+    row = (await db.execute(q, {"id": role_id})).mappings().first()
     if not row:
         raise HTTPException(status_code=404, detail="Rol no encontrado")
-    return row
+    await roles_cache.set(str(role_id), dict(row), version)
+    return check_row(request, response, "roles", "id", row) or row
 
 @router.post("/", response_model=RoleOut, status_code=status.HTTP_201_CREATED)
-def create_role(payload: RoleCreate, db: Session = Depends(get_db)):
-    q = text("""
+async def create_role(payload: RoleCreate, db: DBSession = Depends(get_db)):
+    q = sql(f"""
         INSERT INTO roles (name, id_user_create)
-        OUTPUT INSERTED.id, INSERTED.name, INSERTED.is_active, INSERTED.create_date, INSERTED.modify_date
-        VALUES (:name, NEWID())
+        {dialect.output(ROLE_COLUMNS)}
+        VALUES (:name, {dialect.new_id})
+        {dialect.returning(ROLE_COLUMNS)}
     """)
-    row = db.execute(q, {"name": payload.name}).mappings().first()
-    db.commit()
+    row = (await db.execute(q, {"name": payload.name})).mappings().first()
+    await db.commit()
+    await roles_cache.invalidate()
     return row
 
 @router.put("/{role_id}", response_model=RoleOut)
-def update_role(role_id: int, payload: RoleUpdate, db: Session = Depends(get_db)):
-    # Build dynamic set
-    sets = []
-    params = {"id": role_id}
-    if payload.name is not None:
-        sets.append("name = :name")
-        params["name"] = payload.name
-    if payload.is_active is not None:
-        sets.append("is_active = :is_active")
-        params["is_active"] = payload.is_active
-    if not sets:
+async def update_role(role_id: int, payload: RoleUpdate, db: DBSession = Depends(get_db)):
+    if not payload.model_dump(exclude_none=True):
         raise HTTPException(status_code=400, detail="Nada para actualizar")
-
-    sets.append("modify_date = SYSDATETIME()")
-    q = text(f"""
-        UPDATE roles SET {", ".join(sets)}
-        OUTPUT INSERTED.id, INSERTED.name, INSERTED.is_active, INSERTED.create_date, INSERTED.modify_date
-        WHERE id = :id
-    """)
-    row = db.execute(q, params).mappings().first()
+    q = queries.update(
+        "roles", ("name", "is_active"), pk="id",
+        returning=ROLE_COLUMNS,
+    )
+    params = {
+        "id": role_id,
+        "name": payload.name,
+        "is_active": payload.is_active,
+    }
+    row = (await db.execute(q, params)).mappings().first()
     if not row:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=404, detail="Rol no encontrado")
-    db.commit()
+    await db.commit()
+    await roles_cache.invalidate()
     return row
 
 @router.delete("/{role_id}", response_model=RoleOut)
-def delete_role(role_id: int, db: Session = Depends(get_db)):
-    q = text("""
-        UPDATE roles SET is_active = 0, modify_date = SYSDATETIME()
-        OUTPUT INSERTED.id, INSERTED.name, INSERTED.is_active, INSERTED.create_date, INSERTED.modify_date
+async def delete_role(role_id: int, db: DBSession = Depends(get_db)):
+    q = sql(f"""
+        UPDATE roles SET is_active = {dialect.false}, modify_date = {dialect.now}
+        {dialect.output(ROLE_COLUMNS)}
         WHERE id = :id
+        {dialect.returning(ROLE_COLUMNS)}
     """)
-    row = db.execute(q, {"id": role_id}).mappings().first()
+    row = (await db.execute(q, {"id": role_id})).mappings().first()
     if not row:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=404, detail="Rol no encontrado")
-    db.commit()
+    await db.commit()
+    await roles_cache.invalidate()
+    return row
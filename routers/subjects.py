@@ -1,98 +1,193 @@
 # routers/subjects.py
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
-from sqlalchemy import text
-from deps.db import get_db
-from schemas.subjects import SubjectCreate, SubjectUpdate, SubjectOut
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from database.dialect import dialect
+from database.queries import queries, sql
+from deps.db import get_db, get_primary_db, DBSession
+from core.instrumentation import TimedRoute
+from core.cache import VersionedCache, shared_backend
+from core.config import BATCH_GET_MAX_IDS, REFERENCE_CACHE_TTL, REFERENCE_CACHE_SIZE
+from core.conditional import check_row
+from core.batch import batch_result, fetch_many, patch_rows, update_many
+from core.export import export_response
+from core.grades import refresh_grade_summary
+from core.idempotency import idempotency
+from core.pagination import fetch_page
+from schemas.subjects import SubjectCreate, SubjectUpdate, SubjectBatchGet, SubjectBatchPatch, SubjectBatchOut, SubjectOut
+from typing import Dict, List, Optional
+from datetime import datetime
 from uuid import UUID
 
-router = APIRouter(prefix="/subjects", tags=["Subjects"])
+router = APIRouter(prefix="/subjects", tags=["Subjects"], route_class=TimedRoute)
+
+# Columnas que devuelven los INSERT/UPDATE (OUTPUT o RETURNING según el motor)
+SUBJECT_COLUMNS = "id_subj, name, credits, id_area, is_active, create_date, modify_date"
+
+# Datos de referencia: caché con invalidación al escribir. Sus GET leen del
+# primario (no de la réplica) para no cachear filas atrasadas
+subjects_cache = VersionedCache(
+    "subjects", maxsize=REFERENCE_CACHE_SIZE, ttl=REFERENCE_CACHE_TTL, backend=shared_backend()
+)
 
 @router.get("/", response_model=List[SubjectOut])
-def list_subjects(
+async def list_subjects(
+    request: Request,
+    response: Response,
     page: int = Query(1, ge=1),
     size: int = Query(20, ge=1, le=200),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="Cursor de X-Next-Cursor (paginación keyset)"),
+    id_area: Optional[int] = Query(None),
+    is_active: Optional[bool] = Query(None),
+    date_from: Optional[datetime] = Query(None, description="create_date >= date_from"),
+    date_to: Optional[datetime] = Query(None, description="create_date < date_to"),
+    sort: str = Query("-create_date", pattern="^-?(create_date|name|credits)$", description="Campo de orden; prefijo - = descendente"),
+    db: DBSession = Depends(get_primary_db),
 ):
-    offset = (page - 1) * size
-    q = text("""
-        SELECT id_subj, name, credits, id_area, is_active, create_date, modify_date
-        FROM subjects
-        ORDER BY create_date DESC
-        OFFSET :offset ROWS FETCH NEXT :size ROWS ONLY
-    """)
-    rows = db.execute(q, {"offset": offset, "size": size}).mappings().all()
-    return rows
+    return await fetch_page(
+        db, response, request=request,
+        table="subjects",
+        columns="id_subj, name, credits, id_area, is_active, create_date, modify_date",
+        pk="id_subj",
+        page=page, size=size, cursor=cursor,
+        filters={"id_area": id_area, "is_active": is_active},
+        date_from=date_from, date_to=date_to,
+        sort=sort, sort_keys=("create_date", "name", "credits"),
+        cache=subjects_cache,
+    )
+
+@router.get("/export", summary="Exportar materias (NDJSON o CSV, streaming)")
+async def export_subjects(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    date_from: Optional[datetime] = Query(None, description="create_date >= date_from"),
+    date_to: Optional[datetime] = Query(None, description="create_date < date_to"),
+):
+    return export_response(
+        table="subjects",
+        columns=["id_subj", "name", "credits", "id_area", "is_active", "create_date", "modify_date"],
+        pk="id_subj",
+        fmt=format, date_from=date_from, date_to=date_to,
+    )
+
+@router.post("/batch-get", response_model=Dict[str, SubjectOut])
+async def batch_get_subjects(
+    payload: SubjectBatchGet,
+    db: DBSession = Depends(get_db)
+):
+    # Una consulta IN (...) en vez de un GET por id; respuesta {id: objeto}
+    if len(payload.ids) > BATCH_GET_MAX_IDS:
+        raise HTTPException(status_code=413, detail=f"Máximo {BATCH_GET_MAX_IDS} ids por petición")
+    return await fetch_many(
+        db,
+        table="subjects",
+        columns="id_subj, name, credits, id_area, is_active, create_date, modify_date",
+        pk="id_subj",
+        ids=[str(i) for i in payload.ids],
+        cache=subjects_cache,
+    )
 
 @router.get("/{id_subj}", response_model=SubjectOut)
-def get_subject(id_subj: UUID, db: Session = Depends(get_db)):
-    q = text("""
+async def get_subject(id_subj: UUID, request: Request, response: Response, db: DBSession = Depends(get_primary_db)):
+    version = await subjects_cache.version()
+    cached = await subjects_cache.get(str(id_subj), version)
+    if cached is not None:
+        return check_row(request, response, "subjects", "id_subj", cached) or cached
+    q = sql("""
         SELECT id_subj, name, credits, id_area, is_active, create_date, modify_date
         FROM subjects WHERE id_subj = :id_subj
     """)
-    row = db.execute(q, {"id_subj": str(id_subj)}).mappings().first()
+    row = (await db.execute(q, {"id_subj": str(id_subj)})).mappings().first()
     if not row:
         raise HTTPException(status_code=404, detail="Materia no encontrada")
-    return row
+    await subjects_cache.set(str(id_subj), dict(row), version)
+    return check_row(request, response, "subjects", "id_subj", row) or row
 
 @router.post("/", response_model=SubjectOut, status_code=status.HTTP_201_CREATED)
-def create_subject(payload: SubjectCreate, db: Session = Depends(get_db)):
-    q = text("""
+async def create_subject(payload: SubjectCreate, db: DBSession = Depends(get_db)):
+    q = sql(f"""
         INSERT INTO subjects (id_subj, name, credits, id_area, id_user_create)
-        OUTPUT INSERTED.id_subj, INSERTED.name, INSERTED.credits, INSERTED.id_area, INSERTED.is_active, INSERTED.create_date, INSERTED.modify_date
-        VALUES (NEWID(), :name, :credits, :id_area, NEWID())
+        {dialect.output(SUBJECT_COLUMNS)}
+        VALUES ({dialect.new_id}, :name, :credits, :id_area, {dialect.new_id})
+        {dialect.returning(SUBJECT_COLUMNS)}
     """)
     params = {
         "name": payload.name,
         "credits": payload.credits,
         "id_area": payload.id_area
     }
-    row = db.execute(q, params).mappings().first()
-    db.commit()
+    row = (await db.execute(q, params)).mappings().first()
+    await db.commit()
+    await subjects_cache.invalidate()
     return row
 
 @router.put("/{id_subj}", response_model=SubjectOut)
-def update_subject(id_subj: UUID, payload: SubjectUpdate, db: Session = Depends(get_db)):
-    sets = []
-    params = {"id_subj": str(id_subj)}
-    if payload.name is not None:
-        sets.append("name = :name")
-        params["name"] = payload.name
-    if payload.credits is not None:
-        sets.append("credits = :credits")
-        params["credits"] = payload.credits
-    if payload.id_area is not None:
-        sets.append("id_area = :id_area")
-        params["id_area"] = payload.id_area
-    if payload.is_active is not None:
-        sets.append("is_active = :is_active")
-        params["is_active"] = payload.is_active
-    if not sets:
+async def update_subject(id_subj: UUID, payload: SubjectUpdate, db: DBSession = Depends(get_db)):
+    if not payload.model_dump(exclude_none=True):
         raise HTTPException(status_code=400, detail="Nada para actualizar")
-    sets.append("modify_date = SYSDATETIME()")
-    q = text(f"""
-        UPDATE subjects SET {", ".join(sets)}
-        OUTPUT INSERTED.id_subj, INSERTED.name, INSERTED.credits, INSERTED.id_area, INSERTED.is_active, INSERTED.create_date, INSERTED.modify_date
-        WHERE id_subj = :id_subj
-    """)
-    row = db.execute(q, params).mappings().first()
+    q = queries.update(
+        "subjects", ("name", "credits", "id_area", "is_active"), pk="id_subj",
+        returning=SUBJECT_COLUMNS,
+    )
+    params = {
+        "id_subj": str(id_subj),
+        "name": payload.name,
+        "credits": payload.credits,
+        "id_area": payload.id_area,
+        "is_active": payload.is_active,
+    }
+    row = (await db.execute(q, params)).mappings().first()
     if not row:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=404, detail="Materia no encontrada")
-    db.commit()
+    if payload.credits is not None or payload.id_area is not None:
+        # Cambian los pesos/áreas de todos los estudiantes con notas en la materia
+        await refresh_grade_summary(db, id_subj=str(id_subj))
+    await db.commit()
+    await subjects_cache.invalidate()
     return row
 
+@router.patch("/batch", response_model=SubjectBatchOut, summary="Actualizar o desactivar varias materias")
+async def patch_subjects_batch(
+    payload: SubjectBatchPatch,
+    request: Request,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=200, description="Reintentos seguros: misma clave = misma respuesta"),
+    db: DBSession = Depends(get_db),
+):
+    rows = patch_rows(payload.items, "id_subj")
+
+    async def write():
+        # Un UPDATE ... FROM sobre una tabla temporal, en una sola transacción
+        try:
+            updated = await update_many(
+                db, table="subjects", pk="id_subj", pk_type="{uuid}",
+                columns={"name": "{text}(100)", "credits": "INT", "id_area": "INT", "is_active": "{bool}"},
+                rows=rows, returning=SUBJECT_COLUMNS,
+            )
+            # Cambian los pesos/áreas de todos los estudiantes con notas en esas materias
+            for row in rows:
+                if row["credits"] is not None or row["id_area"] is not None:
+                    await refresh_grade_summary(db, id_subj=row["id_subj"])
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        await subjects_cache.invalidate()
+        ordered, not_found = batch_result(rows, "id_subj", updated)
+        return SubjectBatchOut(updated=len(ordered), not_found=not_found, rows=ordered)
+
+    return await idempotency.run(request, response, idempotency_key, payload, write)
+
 @router.delete("/{id_subj}", response_model=SubjectOut)
-def delete_subject(id_subj: UUID, db: Session = Depends(get_db)):
-    q = text("""
-        UPDATE subjects SET is_active = 0, modify_date = SYSDATETIME()
-        OUTPUT INSERTED.id_subj, INSERTED.name, INSERTED.credits, INSERTED.id_area, INSERTED.is_active, INSERTED.create_date, INSERTED.modify_date
+async def delete_subject(id_subj: UUID, db: DBSession = Depends(get_db)):
+    q = sql(f"""
+        UPDATE subjects SET is_active = {dialect.false}, modify_date = {dialect.now}
+        {dialect.output(SUBJECT_COLUMNS)}
         WHERE id_subj = :id_subj
+        {dialect.returning(SUBJECT_COLUMNS)}
     """)
-    row = db.execute(q, {"id_subj": str(id_subj)}).mappings().first()
+    row = (await db.execute(q, {"id_subj": str(id_subj)})).mappings().first()
     if not row:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=404, detail="Materia no encontrada")
-    db.commit()
+    await db.commit()
+    await subjects_cache.invalidate()
     return row
\ No newline at end of file
@@ -1,61 +1,140 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.orm import Session
-from sqlalchemy import text
-from typing import List
+from fastapi import APIRouter, Depends, File, Header, HTTPException, Query, Request, Response, UploadFile, status
+from database.dialect import dialect
+from database.queries import queries, sql
+from typing import Dict, List, Optional
+from datetime import datetime
 from uuid import UUID
 from fastapi.security import HTTPAuthorizationCredentials
 
-from deps.db import get_db
-from deps.auth import get_current_user  # Ahora usa Security
-from schemas.users import UserCreate, UserUpdate, UserOut
+from deps.db import get_db, mark_write, DBSession
+from core.instrumentation import TimedRoute
+from core.conditional import check_row
+from core.batch import batch_result, fetch_many, patch_rows, update_many
+from core.config import BATCH_GET_MAX_IDS
+from core.export import export_response
+from core.grades import transcript
+from core.idempotency import idempotency
+from core.user_import import import_response
+from core.pagination import fetch_page
+from deps.auth import get_current_user, invalidate_current_user  # Ahora usa Security
+from schemas.users import UserCreate, UserUpdate, UserBatchGet, UserBatchPatch, UserBatchOut, UserOut
 from schemas.auth import CurrentUser
+from schemas.reports import TranscriptOut
 
-router = APIRouter(prefix="/users", tags=["Users"])
+router = APIRouter(prefix="/users", tags=["Users"], route_class=TimedRoute)
+
+# Columnas que devuelven los INSERT/UPDATE (OUTPUT o RETURNING según el motor)
+USER_COLUMNS = "id_user, name, last_name, id_role, birthdate, is_active, create_date, modify_date"
 
 @router.get("/", response_model=List[UserOut], summary="Listar usuarios")
-def list_users(
+async def list_users(
+    request: Request,
+    response: Response,
     page: int = Query(1, ge=1),
     size: int = Query(20, ge=1, le=200),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="Cursor de X-Next-Cursor (paginación keyset)"),
+    id_role: Optional[int] = Query(None),
+    is_active: Optional[bool] = Query(None),
+    date_from: Optional[datetime] = Query(None, description="create_date >= date_from"),
+    date_to: Optional[datetime] = Query(None, description="create_date < date_to"),
+    sort: str = Query("-create_date", pattern="^-?(create_date|name|last_name|birthdate)$", description="Campo de orden; prefijo - = descendente"),
+    db: DBSession = Depends(get_db),
     current_user: CurrentUser = Depends(get_current_user)
 ):
-    offset = (page - 1) * size
-    q = text("""
-        SELECT id_user, name, last_name, id_role, birthdate, is_active, create_date, modify_date
-        FROM users
-        ORDER BY create_date DESC
-        OFFSET :offset ROWS FETCH NEXT :size ROWS ONLY
-    """)
-    rows = db.execute(q, {"offset": offset, "size": size}).mappings().all()
-    return rows
+    return await fetch_page(
+        db, response, request=request,
+        table="users",
+        columns="id_user, name, last_name, id_role, birthdate, is_active, create_date, modify_date",
+        pk="id_user",
+        page=page, size=size, cursor=cursor,
+        filters={"id_role": id_role, "is_active": is_active},
+        date_from=date_from, date_to=date_to,
+        sort=sort, sort_keys=("create_date", "name", "last_name", "birthdate"),
+    )
+
+@router.get("/export", summary="Exportar usuarios (NDJSON o CSV, streaming)")
+async def export_users(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    date_from: Optional[datetime] = Query(None, description="create_date >= date_from"),
+    date_to: Optional[datetime] = Query(None, description="create_date < date_to"),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    return export_response(
+        table="users",
+        columns=["id_user", "name", "last_name", "id_role", "birthdate", "is_active", "create_date", "modify_date"],
+        pk="id_user",
+        fmt=format, date_from=date_from, date_to=date_to,
+    )
+
+@router.post("/import", summary="Alta masiva de usuarios + login desde CSV (progreso en NDJSON)")
+async def import_users(
+    request: Request,
+    file: UploadFile = File(..., description="CSV: name,last_name,id_role,birthdate,username,password"),
+    start_row: int = Query(1, ge=1, description="Fila de datos desde la que seguir (resume_from de una corrida anterior)"),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    # Un lote por transacción; cada línea de la respuesta es un lote confirmado
+    await mark_write(request)
+    return import_response(file, start_row)
+
+@router.post("/batch-get", response_model=Dict[str, UserOut], summary="Obtener varios usuarios por id")
+async def batch_get_users(
+    payload: UserBatchGet,
+    db: DBSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    # Una consulta IN (...) en vez de un GET por id; respuesta {id: objeto}
+    if len(payload.ids) > BATCH_GET_MAX_IDS:
+        raise HTTPException(status_code=413, detail=f"Máximo {BATCH_GET_MAX_IDS} ids por petición")
+    return await fetch_many(
+        db,
+        table="users",
+        columns="id_user, name, last_name, id_role, birthdate, is_active, create_date, modify_date",
+        pk="id_user",
+        ids=[str(i) for i in payload.ids],
+    )
 
 @router.get("/{id_user}", response_model=UserOut, summary="Obtener usuario")
-def get_user(
+async def get_user(
+    request: Request,
+    response: Response,
     id_user: UUID,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_db),
     current_user: CurrentUser = Depends(get_current_user)
 ):
-    q = text("""
+    q = sql("""
         SELECT id_user, name, last_name, id_role, birthdate, is_active, create_date, modify_date
         FROM users
         WHERE id_user = :id_user
     """)
-    row = db.execute(q, {"id_user": str(id_user)}).mappings().first()
+    row = (await db.execute(q, {"id_user": str(id_user)})).mappings().first()
     if not row:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
-    return row
+    return check_row(request, response, "users", "id_user", row) or row
+
+@router.get("/{id_user}/transcript", response_model=TranscriptOut, summary="Promedios del estudiante")
+async def get_transcript(
+    id_user: UUID,
+    db: DBSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    # Promedio simple y ponderado por créditos, total y por área (calculado en SQL)
+    result = await transcript(db, str(id_user))
+    if result is None:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
+    return result
 
 @router.post("/", response_model=UserOut, status_code=status.HTTP_201_CREATED, summary="Crear usuario")
-def create_user(
+async def create_user(
     payload: UserCreate,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_db),
     current_user: CurrentUser = Depends(get_current_user)
 ):
-    q = text("""
+    q = sql(f"""
         INSERT INTO users (id_user, name, last_name, id_role, birthdate, id_user_create)
-        OUTPUT INSERTED.id_user, INSERTED.name, INSERTED.last_name, INSERTED.id_role, INSERTED.birthdate,
-               INSERTED.is_active, INSERTED.create_date, INSERTED.modify_date
-        VALUES (NEWID(), :name, :last_name, :id_role, :birthdate, NEWID())
+        {dialect.output(USER_COLUMNS)}
+        VALUES ({dialect.new_id}, :name, :last_name, :id_role, :birthdate, {dialect.new_id})
+        {dialect.returning(USER_COLUMNS)}
     """)
     params = {
         "name": payload.name,
@@ -63,66 +142,88 @@ def create_user(
         "id_role": payload.id_role,
         "birthdate": payload.birthdate
     }
-    row = db.execute(q, params).mappings().first()
-    db.commit()
+    row = (await db.execute(q, params)).mappings().first()
+    await db.commit()
     return row
 
 @router.put("/{id_user}", response_model=UserOut, summary="Actualizar usuario")
-def update_user(
+async def update_user(
     id_user: UUID,
     payload: UserUpdate,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_db),
     current_user: CurrentUser = Depends(get_current_user)
 ):
-    sets = []
-    params = {"id_user": str(id_user)}
-    if payload.name is not None:
-        sets.append("name = :name")
-        params["name"] = payload.name
-    if payload.last_name is not None:
-        sets.append("last_name = :last_name")
-        params["last_name"] = payload.last_name
-    if payload.id_role is not None:
-        sets.append("id_role = :id_role")
-        params["id_role"] = payload.id_role
-    if payload.birthdate is not None:
-        sets.append("birthdate = :birthdate")
-        params["birthdate"] = payload.birthdate
-    if payload.is_active is not None:
-        sets.append("is_active = :is_active")
-        params["is_active"] = payload.is_active
-    if not sets:
+    if not payload.model_dump(exclude_none=True):
         raise HTTPException(status_code=400, detail="Nada para actualizar")
-
-    sets.append("modify_date = SYSDATETIME()")
-    q = text(f"""
-        UPDATE users SET {", ".join(sets)}
-        OUTPUT INSERTED.id_user, INSERTED.name, INSERTED.last_name, INSERTED.id_role, INSERTED.birthdate,
-               INSERTED.is_active, INSERTED.create_date, INSERTED.modify_date
-        WHERE id_user = :id_user
-    """)
-    row = db.execute(q, params).mappings().first()
+    q = queries.update(
+        "users", ("name", "last_name", "id_role", "birthdate", "is_active"), pk="id_user",
+        returning=USER_COLUMNS,
+    )
+    params = {
+        "id_user": str(id_user),
+        "name": payload.name,
+        "last_name": payload.last_name,
+        "id_role": payload.id_role,
+        "birthdate": payload.birthdate,
+        "is_active": payload.is_active,
+    }
+    row = (await db.execute(q, params)).mappings().first()
     if not row:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
-    db.commit()
+    await db.commit()
+    await invalidate_current_user(id_user)
     return row
 
+@router.patch("/batch", response_model=UserBatchOut, summary="Actualizar o desactivar varios usuarios")
+async def patch_users_batch(
+    payload: UserBatchPatch,
+    request: Request,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=200, description="Reintentos seguros: misma clave = misma respuesta"),
+    db: DBSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    rows = patch_rows(payload.items, "id_user")
+
+    async def write():
+        # Un UPDATE ... FROM sobre una tabla temporal, en una sola transacción
+        try:
+            updated = await update_many(
+                db, table="users", pk="id_user", pk_type="{uuid}",
+                columns={
+                    "name": "{text}(50)", "last_name": "{text}(50)", "id_role": "INT",
+                    "birthdate": "DATE", "is_active": "{bool}",
+                },
+                rows=rows, returning=USER_COLUMNS,
+            )
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        for row in updated:
+            await invalidate_current_user(row["id_user"])
+        ordered, not_found = batch_result(rows, "id_user", updated)
+        return UserBatchOut(updated=len(ordered), not_found=not_found, rows=ordered)
+
+    return await idempotency.run(request, response, idempotency_key, payload, write)
+
 @router.delete("/{id_user}", response_model=UserOut, summary="Eliminar usuario")
-def delete_user(
+async def delete_user(
     id_user: UUID,
-    db: Session = Depends(get_db),
+    db: DBSession = Depends(get_db),
     current_user: CurrentUser = Depends(get_current_user)
 ):
-    q = text("""
-        UPDATE users SET is_active = 0, modify_date = SYSDATETIME()
-        OUTPUT INSERTED.id_user, INSERTED.name, INSERTED.last_name, INSERTED.id_role, INSERTED.birthdate,
-               INSERTED.is_active, INSERTED.create_date, INSERTED.modify_date
+    q = sql(f"""
+        UPDATE users SET is_active = {dialect.false}, modify_date = {dialect.now}
+        {dialect.output(USER_COLUMNS)}
         WHERE id_user = :id_user
+        {dialect.returning(USER_COLUMNS)}
     """)
-    row = db.execute(q, {"id_user": str(id_user)}).mappings().first()
+    row = (await db.execute(q, {"id_user": str(id_user)})).mappings().first()
     if not row:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
-    db.commit()
+    await db.commit()
+    await invalidate_current_user(id_user)
     return row
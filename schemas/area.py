@@ -1,6 +1,6 @@
 # schemas/area.py
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from pydantic import ConfigDict
 from pydantic import BaseModel, constr
 
@@ -14,6 +14,10 @@ class AreaUpdate(BaseModel):
     name: Optional[constr(strip_whitespace=True, max_length=100)] = None
     is_active: Optional[bool] = None
 
+class AreaBatchGet(BaseModel):
+    # Lectura por lote: respuesta {id: objeto}
+    ids: List[int]
+
 class AreaOut(BaseModel):
     id_area: int
     name: str
@@ -0,0 +1,17 @@
+# schemas/changes.py
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel
+
+class ChangeOut(BaseModel):
+    table: str
+    op: str  # "insert" | "update" | "delete" (soft delete)
+    id: str
+    changed_at: datetime
+    row: Dict[str, Any]
+
+class ChangesOut(BaseModel):
+    changes: List[ChangeOut]
+    # Token para la siguiente llamada (?since=); con has_more=false ya no hay más por ahora
+    next: Optional[str] = None
+    has_more: bool
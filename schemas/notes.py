@@ -1,10 +1,12 @@
 # schemas/notes.py
 from datetime import datetime
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from uuid import UUID
 from decimal import Decimal
 from pydantic import ConfigDict
 from pydantic import BaseModel, condecimal
+from schemas.subjects import SubjectOut
+from schemas.users import UserOut
 
 class NoteBase(BaseModel):
     id_user: UUID
@@ -27,6 +29,40 @@ class NoteOut(BaseModel):
     create_date: Optional[datetime] = None
     modify_date: Optional[datetime] = None
 
+class NoteExpandedOut(NoteOut):
+    # Solo presentes con ?expand=user,subject
+    user: Optional[UserOut] = None
+    subject: Optional[SubjectOut] = None
+
+# --- Carga masiva ---
+class NoteBulkCreate(BaseModel):
+    # Filas sin validar: cada una se valida con NoteCreate y los errores se reportan por índice
+    items: List[Dict[str, Any]]
+
+class NoteBulkRow(BaseModel):
+    index: int
+    status: str  # "created" | "error" | "skipped"
+    errors: Optional[List[Dict[str, Any]]] = None
+
+class NoteBulkOut(BaseModel):
+    inserted: int
+    failed: int
+    results: List[NoteBulkRow]
+
+
+# --- Actualización por lote (PATCH /notes/batch) ---
+class NoteBatchItem(NoteUpdate):
+    id: int
+    delete: bool = False  # soft delete (is_active = false), como DELETE /notes/{id}
+
+class NoteBatchPatch(BaseModel):
+    items: List[NoteBatchItem]
+
+class NoteBatchOut(BaseModel):
+    updated: int
+    not_found: List[int]
+    rows: List[NoteOut]
+
 
 class TuSchema(BaseModel):
     ...
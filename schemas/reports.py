@@ -0,0 +1,32 @@
+# schemas/reports.py
+from decimal import Decimal
+from typing import List, Optional
+from uuid import UUID
+from pydantic import BaseModel
+
+class GradeBreakdown(BaseModel):
+    id_area: Optional[int] = None
+    area_name: Optional[str] = None
+    notes_count: int
+    credits: int
+    average: Optional[Decimal] = None           # promedio simple
+    weighted_average: Optional[Decimal] = None  # ponderado por créditos
+
+class AreaGrades(GradeBreakdown):
+    students: int
+
+class TranscriptOut(BaseModel):
+    id_user: UUID
+    notes_count: int
+    credits: int
+    average: Optional[Decimal] = None
+    weighted_average: Optional[Decimal] = None
+    areas: List[GradeBreakdown]
+
+class GradeReportOut(BaseModel):
+    students: int
+    notes_count: int
+    credits: int
+    average: Optional[Decimal] = None
+    weighted_average: Optional[Decimal] = None
+    areas: List[AreaGrades]
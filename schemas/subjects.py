@@ -1,6 +1,6 @@
 # schemas/subjects.py
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from uuid import UUID
 from pydantic import ConfigDict
 from pydantic import BaseModel, constr, conint
@@ -19,6 +19,18 @@ class SubjectUpdate(BaseModel):
     id_area: Optional[int] = None
     is_active: Optional[bool] = None
 
+class SubjectBatchGet(BaseModel):
+    # Lectura por lote: respuesta {id: objeto}
+    ids: List[UUID]
+
+class SubjectBatchItem(SubjectUpdate):
+    id_subj: UUID
+    delete: bool = False  # soft delete (is_active = false), como DELETE /subjects/{id_subj}
+
+class SubjectBatchPatch(BaseModel):
+    # Actualización por lote (PATCH /subjects/batch)
+    items: List[SubjectBatchItem]
+
 class SubjectOut(BaseModel):
     id_subj: UUID
     name: str
@@ -28,6 +40,11 @@ class SubjectOut(BaseModel):
     create_date: Optional[datetime] = None
     modify_date: Optional[datetime] = None
 
+class SubjectBatchOut(BaseModel):
+    updated: int
+    not_found: List[UUID]
+    rows: List[SubjectOut]
+
 
 class TuSchema(BaseModel):
     ...
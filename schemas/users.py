@@ -1,6 +1,6 @@
 # schemas/users.py
 from datetime import date, datetime
-from typing import Optional
+from typing import List, Optional
 from uuid import UUID
 from pydantic import ConfigDict
 from pydantic import BaseModel, constr, conint
@@ -21,6 +21,18 @@ class UserUpdate(BaseModel):
     birthdate: Optional[date] = None
     is_active: Optional[bool] = None
 
+class UserBatchGet(BaseModel):
+    # Lectura por lote: respuesta {id: objeto}
+    ids: List[UUID]
+
+class UserBatchItem(UserUpdate):
+    id_user: UUID
+    delete: bool = False  # soft delete (is_active = false), como DELETE /users/{id_user}
+
+class UserBatchPatch(BaseModel):
+    # Actualización por lote (PATCH /users/batch)
+    items: List[UserBatchItem]
+
 class UserOut(BaseModel):
     id_user: UUID
     name: str
@@ -31,6 +43,11 @@ class UserOut(BaseModel):
     create_date: Optional[datetime] = None
     modify_date: Optional[datetime] = None
 
+class UserBatchOut(BaseModel):
+    updated: int
+    not_found: List[UUID]
+    rows: List[UserOut]
+
 class TuSchema(BaseModel):
     ...
     model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
@@ -0,0 +1,89 @@
+# Réplica que se cae a mitad de un GET: el request termina bien en el primario.
+# Usa una base SQLite temporal como primario y como réplica; la réplica falla (OperationalError)
+# desde su segunda sentencia, después de haber servido la primera del mismo request.
+# Uso: python test_replica_fallback.py  (o pytest test_replica_fallback.py, en un proceso propio)
+import os
+import shutil
+import sqlite3
+import tempfile
+
+_DIR = tempfile.mkdtemp(prefix="p1sw_replica_")
+_PATH = os.path.join(_DIR, "p1sw.db")
+
+# Antes de importar la app: el engine (y la réplica) salen de las URLs al importar
+os.environ["SQLSERVER_URL"] = f"sqlite:///{_PATH}"
+os.environ["REPLICA_URL"] = f"sqlite:///{_PATH}"
+os.environ["ASYNC_SQLSERVER_URL"] = f"sqlite+aiosqlite:///{_PATH}"
+os.environ["ASYNC_REPLICA_URL"] = f"sqlite+aiosqlite:///{_PATH}"
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+
+def _seed():
+    from database.dialect import DIALECTS
+    from migrate.database import table_statements
+
+    conn = sqlite3.connect(_PATH)
+    with conn:
+        for statement in table_statements(DIALECTS["sqlite"]):
+            conn.execute(statement)
+        conn.execute("INSERT INTO roles (name, id_user_create) VALUES ('Estudiante', 'x')")
+        conn.execute("INSERT INTO area (name, id_user_create) VALUES ('Área', 'x')")
+        conn.execute(
+            "INSERT INTO users (id_user, name, last_name, id_role, birthdate, id_user_create) "
+            "VALUES ('11111111-1111-4111-8111-111111111111', 'Ana', 'Ruiz', 1, '2000-01-01', 'x')"
+        )
+        conn.execute(
+            "INSERT INTO subjects (id_subj, name, credits, id_area, id_user_create) "
+            "VALUES ('22222222-2222-4222-8222-222222222222', 'Materia', 3, 1, 'x')"
+        )
+        conn.execute(
+            "INSERT INTO notes (id_user, id_subj, grade, id_user_create) VALUES "
+            "('11111111-1111-4111-8111-111111111111', '22222222-2222-4222-8222-222222222222', '4.50', 'x')"
+        )
+    conn.close()
+
+
+def test_replica_fallback():
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+    from sqlalchemy.exc import OperationalError
+
+    from core.config import DB_MODE
+    from database import connection
+    from deps.db import replica_router
+    from main import app
+
+    _seed()
+    replica = connection.async_replica_engine.sync_engine if DB_MODE == "async" else connection.replica_engine
+    statements = []
+
+    def fail_after_first(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+        if len(statements) > 1:
+            raise OperationalError(statement, parameters, Exception("réplica caída"))
+
+    event.listen(replica, "before_cursor_execute", fail_after_first)
+    try:
+        client = TestClient(app)
+        # Página de notas + un IN (...) por users y subjects: la réplica cae en la segunda sentencia
+        response = client.get("/notes/?expand=user,subject")
+        assert response.status_code == 200, response.text
+        notes = response.json()
+        assert len(notes) == 1
+        assert notes[0]["user"]["name"] == "Ana" and notes[0]["subject"]["name"] == "Materia"
+        assert len(statements) == 2  # la primera en la réplica, la segunda falló y se repitió en el primario
+        stats = replica_router.stats()
+        assert stats["failures"] == 1 and not stats["healthy"]
+
+        # Los siguientes GET ya van al primario sin tocar la réplica
+        assert client.get("/notes/").status_code == 200
+        assert len(statements) == 2
+        print("✅ La réplica cayó a mitad del request y el GET respondió 200 desde el primario")
+    finally:
+        event.remove(replica, "before_cursor_execute", fail_after_first)
+        connection.engine.dispose()
+        shutil.rmtree(_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_replica_fallback()